@@ -14,6 +14,7 @@ from app.models.search import RecentSearch
 from app.models.request import Request
 from app.models.routing_policy import RoutingPolicy
 from app.models.subscription_record import SubscriptionRecord
+from app.models.conversation import Conversation, ConversationTurn
 from app.core.database import Base
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from ..core.database import get_db
+from ..models.user import User
+from ..api.auth import get_current_user
+from ..services.conversation_store import conversation_store
+from ..schemas.conversation import ConversationResponse, ConversationSummary
+
+router = APIRouter(prefix="/conversations", tags=["conversations"])
+
+
+@router.get("/", response_model=List[ConversationSummary])
+async def list_conversations(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    limit: int = 100
+):
+    """List the current user's server-side conversations, newest first"""
+    return await conversation_store.list_for_user(db, current_user.id, limit)
+
+
+@router.get("/{session_id}", response_model=ConversationResponse)
+async def get_conversation(
+    session_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    limit: int = 200
+):
+    """Get a conversation's rolling summary and its newest ``limit`` turns"""
+    conversation = await conversation_store.get(db, current_user.id, session_id)
+    if conversation is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
+    turns = await conversation_store.turns(db, conversation, limit)
+    return ConversationResponse(
+        session_id=conversation.session_id,
+        turn_count=conversation.turn_count,
+        summarized_turns=conversation.summarized_turns,
+        created_at=conversation.created_at,
+        updated_at=conversation.updated_at,
+        summary=conversation.summary,
+        turns=turns
+    )
+
+
+@router.delete("/{session_id}")
+async def delete_conversation(
+    session_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Delete a conversation and all of its turns"""
+    conversation = await conversation_store.get(db, current_user.id, session_id)
+    if conversation is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
+    await conversation_store.delete(db, conversation)
+    return {"message": "Conversation deleted"}
@@ -1,26 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+import asyncio
+import json
+import time
+import anyio
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Header
+from fastapi import Request as HTTPRequest
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from ..core.database import get_db
+from ..core.database import get_db, AsyncSessionLocal
 from ..models.user import User
 from ..models.request import Request
-from ..schemas.llm import GenerateRequest, GenerateResponse, ModelsResponse, ModelInfo, ImageGenerateRequest, ImageGenerateResponse, TitleGenerateRequest, TitleGenerateResponse, ImageSummaryResponse
+from ..schemas.llm import GenerateRequest, GenerateResponse, ModelsResponse, ModelInfo, ImageGenerateRequest, ImageGenerateResponse, TitleGenerateRequest, TitleGenerateResponse, ImageSummaryResponse, BatchGenerateRequest, BatchGenerateResponse, BatchItemResult
 from ..services.router import RouterService
 from ..services.image_generator import ImageGeneratorService
 from ..services.image_summarizer import ImageSummarizerService
 from ..api.auth import get_current_user
+from ..core.config import settings
+from ..core.http_clients import http_clients
+from ..core.disconnect import ClientDisconnected, cancel_on_disconnect
+from ..services.rate_limiter import rate_limits
+from ..services.deadline import Deadline, DeadlineExceeded, resolve_budget_ms
+from ..services.subscription_record import plan_cache
+from ..services.routing_policy import CompiledPolicy, policy_cache
+from ..services.routing_config import routing_config
+from ..services.title_generator import title_generator
+from ..services.title_batcher import TitleBatcher
+from ..services.conversation_store import conversation_store
 
 router = APIRouter(prefix="/llm", tags=["llm"])
 router_service = RouterService()
+title_batcher = TitleBatcher(router_service)
+conversation_store.bind_router(router_service)
 image_service = ImageGeneratorService()
 image_summarizer = ImageSummarizerService()
+router_service.prober.register("image_generation", image_service.health_check)
+
+
+def _failure_status(error: Exception) -> tuple[str, int]:
+    """Request log status and HTTP status code for a failed generation"""
+    if isinstance(error, ClientDisconnected):
+        return "cancelled", 499  # Client Closed Request
+    if isinstance(error, DeadlineExceeded):
+        return "timeout", status.HTTP_504_GATEWAY_TIMEOUT
+    return "failed", status.HTTP_500_INTERNAL_SERVER_ERROR
 
 
 @router.post("/generate")
 async def generate_content(
     request_data: GenerateRequest,
+    http_request: HTTPRequest,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    deadline_ms: Optional[str] = Header(None, alias="X-Request-Deadline-Ms")
 ):
     """Generate content using intelligent routing (text or image)"""
     
@@ -42,7 +74,7 @@ async def generate_content(
             )
             
             # Generate image
-            image_response = await image_service.generate_image(image_request)
+            image_response = await cancel_on_disconnect(http_request, image_service.generate_image(image_request))
             
             # Save request to database
             db_request = Request(
@@ -68,8 +100,15 @@ async def generate_content(
             )
         
         else:
-            # Regular text generation
-            response = await router_service.route_request(request_data)
+            # Regular text generation, bounded by the request's overall deadline
+            plan = await plan_cache.get_plan(db, current_user.id)
+            policy = await policy_cache.get_policy(db, current_user.id)
+            deadline = Deadline(resolve_budget_ms(deadline_ms, plan))
+            # With a session_id, earlier turns come from the server-side conversation (bounded window)
+            routed_request = await conversation_store.prepare(db, current_user.id, request_data)
+            response = await cancel_on_disconnect(
+                http_request, router_service.route_request(routed_request, policy, deadline, tenant=current_user.id)
+            )
             
             # Save request to database
             db_request = Request(
@@ -79,22 +118,30 @@ async def generate_content(
                 model=response.model,
                 provider=response.provider,
                 latency_ms=response.latency_ms,
-                status="success"
+                status="success",
+                cached=response.cached
             )
             
             db.add(db_request)
             await db.commit()
             
+            if request_data.session_id:
+                await conversation_store.append(
+                    db, current_user.id, request_data.session_id, request_data.prompt, response.response, policy
+                )
+            
             return response
         
     except Exception as e:
+        request_status, status_code = _failure_status(e)
+        
         # Save failed request
         db_request = Request(
             user_id=current_user.id,
             prompt=request_data.prompt,
             model=request_data.model or "auto",
             provider="unknown",
-            status="failed",
+            status=request_status,
             error_message=str(e)
         )
         
@@ -102,11 +149,187 @@ async def generate_content(
         await db.commit()
         
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            status_code=status_code,
             detail=f"Generation failed: {str(e)}"
         )
 
 
+def _sse(event: dict) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+
+@router.post("/generate/stream")
+async def generate_content_stream(
+    request_data: GenerateRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    deadline_ms: Optional[str] = Header(None, alias="X-Request-Deadline-Ms")
+):
+    """Stream generated content as Server-Sent Events (start, token, done, error)"""
+    
+    user_id = current_user.id
+    # The deadline bounds the time to first token; the clock starts now
+    plan = await plan_cache.get_plan(db, user_id)
+    policy = await policy_cache.get_policy(db, user_id)
+    deadline = Deadline(resolve_budget_ms(deadline_ms, plan))
+    routed_request = await conversation_store.prepare(db, user_id, request_data)
+    
+    async def event_stream():
+        start_time = time.time()
+        chunks = []
+        meta = {"provider": "unknown", "model": request_data.model or "auto"}
+        error = None
+        request_status = "success"
+        
+        try:
+            if router_service.is_image_generation_request(request_data.prompt):
+                # Images can't be streamed - send the finished markdown as a single token
+                image_request = ImageGenerateRequest(
+                    prompt=request_data.prompt,
+                    model="stable-diffusion-xl",
+                    width=1024,
+                    height=1024,
+                    num_images=1,
+                    guidance_scale=7.5,
+                    num_inference_steps=50
+                )
+                image_response = await image_service.generate_image(image_request)
+                content = f"I've generated an image based on your prompt: \"{request_data.prompt}\"\n\n![Generated Image]({image_response.images[0]})"
+                meta = {"provider": image_response.provider, "model": image_response.model}
+                chunks.append(content)
+                yield _sse({"type": "start", **meta, "ttft_ms": image_response.latency_ms})
+                yield _sse({"type": "token", "content": content})
+                yield _sse({"type": "done", **meta, "latency_ms": image_response.latency_ms})
+            else:
+                async for event in router_service.route_stream(routed_request, policy, deadline, tenant=current_user.id):
+                    if event["type"] == "start":
+                        meta = {"provider": event["provider"], "model": event["model"]}
+                    elif event["type"] == "token":
+                        chunks.append(event["content"])
+                    yield _sse(event)
+                    
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client disconnected - Starlette cancels the stream, which closes the upstream call
+            error = "Client disconnected during streaming"
+            request_status = "cancelled"
+            raise
+        
+        except Exception as e:
+            error = str(e)
+            request_status = _failure_status(e)[0]
+            yield _sse({"type": "error", "detail": f"Generation failed: {error}", "timeout": request_status == "timeout"})
+        
+        finally:
+            # Save request to database once the stream has finished (even if it was cancelled)
+            with anyio.CancelScope(shield=True):
+                async with AsyncSessionLocal() as db:
+                    db.add(Request(
+                        user_id=user_id,
+                        prompt=request_data.prompt,
+                        response="".join(chunks) if chunks else None,
+                        model=meta["model"],
+                        provider=meta["provider"],
+                        latency_ms=(time.time() - start_time) * 1000 if error is None else None,
+                        status=request_status,
+                        error_message=error
+                    ))
+                    await db.commit()
+                    # Only finished answers become part of the conversation
+                    if request_data.session_id and request_status == "success" and chunks:
+                        await conversation_store.append(
+                            db, user_id, request_data.session_id, request_data.prompt, "".join(chunks), policy
+                        )
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _batch_result(index: int, outcome) -> BatchItemResult:
+    if isinstance(outcome, GenerateResponse):
+        return BatchItemResult(index=index, status="success", response=outcome)
+    return BatchItemResult(index=index, status=_failure_status(outcome)[0], error=str(outcome))
+
+
+def _batch_log_rows(user_id: int, batch: BatchGenerateRequest, results: dict) -> list:
+    """One Request row per prompt; prompts that never finished are logged as cancelled"""
+    rows = []
+    for index, request in enumerate(batch.requests):
+        result = results.get(index)
+        response = result.response if result is not None else None
+        rows.append(Request(
+            user_id=user_id,
+            prompt=request.prompt,
+            response=response.response if response else None,
+            model=response.model if response else (request.model or "auto"),
+            provider=response.provider if response else "unknown",
+            latency_ms=response.latency_ms if response else None,
+            status=result.status if result is not None else "cancelled",
+            error_message=result.error if result is not None else "Batch cancelled before this prompt finished",
+            cached=response.cached if response else False
+        ))
+    return rows
+
+
+@router.post("/generate/batch")
+async def generate_batch(
+    batch: BatchGenerateRequest,
+    http_request: HTTPRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    deadline_ms: Optional[str] = Header(None, alias="X-Request-Deadline-Ms")
+):
+    """Generate many independent prompts in one call.
+    
+    Returns results in input order, or with ``stream`` an NDJSON line per prompt
+    as soon as it completes. ``X-Request-Deadline-Ms`` applies to each prompt.
+    """
+    if not batch.requests:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Batch is empty")
+    if len(batch.requests) > settings.batch_max_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch too large ({len(batch.requests)} > {settings.batch_max_size} prompts)"
+        )
+    
+    user_id = current_user.id
+    plan = await plan_cache.get_plan(db, user_id)
+    policy = await policy_cache.get_policy(db, user_id)
+    budget_ms = resolve_budget_ms(deadline_ms, plan)
+    results = {}
+    
+    if batch.stream:
+        async def result_lines():
+            try:
+                async for index, outcome in router_service.route_batch(batch.requests, budget_ms, policy, tenant=user_id):
+                    results[index] = _batch_result(index, outcome)
+                    yield results[index].model_dump_json() + "\n"
+            finally:
+                # Single bulk insert once the batch is done (or the client went away)
+                with anyio.CancelScope(shield=True):
+                    async with AsyncSessionLocal() as log_db:
+                        log_db.add_all(_batch_log_rows(user_id, batch, results))
+                        await log_db.commit()
+        
+        return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+    
+    async def collect():
+        async for index, outcome in router_service.route_batch(batch.requests, budget_ms, policy, tenant=user_id):
+            results[index] = _batch_result(index, outcome)
+    
+    try:
+        await cancel_on_disconnect(http_request, collect())
+    except ClientDisconnected as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    finally:
+        db.add_all(_batch_log_rows(user_id, batch, results))
+        await db.commit()
+    
+    return BatchGenerateResponse(results=[results[index] for index in range(len(batch.requests))])
+
+
 @router.get("/models", response_model=ModelsResponse)
 async def get_models():
     """Get list of available models"""
@@ -149,6 +372,7 @@ async def get_models():
 @router.post("/generate-image", response_model=ImageGenerateResponse)
 async def generate_image(
     request_data: ImageGenerateRequest,
+    http_request: HTTPRequest,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -156,7 +380,7 @@ async def generate_image(
     
     try:
         # Generate image
-        response = await image_service.generate_image(request_data)
+        response = await cancel_on_disconnect(http_request, image_service.generate_image(request_data))
         
         # Save request to database
         db_request = Request(
@@ -181,7 +405,7 @@ async def generate_image(
             prompt=request_data.prompt,
             model=request_data.model or "stable-diffusion-xl",
             provider="huggingface",
-            status="failed",
+            status=_failure_status(e)[0],
             error_message=str(e)
         )
         
@@ -189,7 +413,7 @@ async def generate_image(
         await db.commit()
         
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            status_code=_failure_status(e)[1],
             detail=f"Image generation failed: {str(e)}"
         )
 
@@ -231,6 +455,7 @@ async def test_image_detection(request_data: dict):
 
 @router.post("/summarize-image", response_model=ImageSummaryResponse)
 async def summarize_image(
+    http_request: HTTPRequest,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user)
 ):
@@ -240,10 +465,12 @@ async def summarize_image(
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only jpg, jpeg, and png are supported")
 
         image_bytes = await file.read()
-        summary, used_model = await image_summarizer.summarize_image(image_bytes)
+        summary, used_model = await cancel_on_disconnect(http_request, image_summarizer.summarize_image(image_bytes))
         return ImageSummaryResponse(summary=summary, model=used_model)
     except HTTPException:
         raise
+    except ClientDisconnected as e:
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         # Provide clearer error for common HF failures
         detail = str(e)
@@ -254,82 +481,69 @@ async def summarize_image(
 @router.post("/generate-title", response_model=TitleGenerateResponse)
 async def generate_chat_title(
     request_data: TitleGenerateRequest,
+    http_request: HTTPRequest,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Generate a concise title for a chat session based on the conversation"""
+    """Generate a concise title for a chat session based on the conversation.
+    
+    The title is extracted locally from the opening exchange. An LLM rewrites
+    it in the low-priority batch lane only when the user asks for
+    ``high_quality`` or, with ``title_llm_when_idle``, while the first-choice
+    model has spare capacity. With ``background`` the extracted title is
+    returned at once (``pending``) and the LLM title is collected later from
+    ``GET /llm/generate-title/{session_id}``.
+    """
+    start_time = time.perf_counter()
+    local_response = TitleGenerateResponse(
+        title=title_generator.generate(request_data.messages) or "New Chat",
+        model=title_generator.name,
+        provider="local",
+        latency_ms=(time.perf_counter() - start_time) * 1000
+    )
+    if not (request_data.high_quality or settings.title_llm_when_idle):
+        return local_response
+    
+    # Titles always take the fastest path the user's enabled providers allow
+    policy = await policy_cache.get_policy(db, current_user.id)
+    title_policy = CompiledPolicy("speed", policy.disabled_providers)
+    if not request_data.high_quality and not router_service.has_spare_capacity(
+        "summarization", title_policy, settings.title_llm_spare_ratio
+    ):
+        return local_response
+    
+    background = request_data.background and request_data.session_id is not None
+    future = title_batcher.submit(
+        current_user.id,
+        request_data.messages,
+        local_response,
+        title_policy,
+        session_id=request_data.session_id,
+        required=request_data.high_quality,
+        background=background
+    )
+    if background:
+        return local_response.model_copy(update={"pending": True})
     
     try:
-        # Create a prompt to generate a title based on the conversation
-        conversation_text = ""
-        for msg in request_data.messages[:6]:  # Use first 6 messages to avoid token limits
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            conversation_text += f"{role.capitalize()}: {content}\n"
-        
-        title_prompt = f"""Based on the following conversation, generate a concise, descriptive title (3-6 words) that captures the main topic or question. Do not use quotes or special characters. Just return the title.
+        return await cancel_on_disconnect(http_request, future)
+    except ClientDisconnected as e:
+        raise HTTPException(status_code=499, detail=str(e))
 
-Conversation:
-{conversation_text}
 
-Title:"""
-        
-        # Use a fast, efficient model for title generation
-        title_request = GenerateRequest(
-            prompt=title_prompt,
-            model=None,  # Use auto-routing to pick the best available model
-            max_tokens=20,  # Keep it short
-            temperature=0.3  # Lower temperature for more consistent titles
-        )
-        
-        response = await router_service.route_request(title_request)
-        
-        # Clean up the title
-        title = response.response.strip()
-        # Remove common prefixes and clean up
-        title = title.replace("Title:", "").strip()
-        title = title.replace('"', '').replace("'", "").strip()
-        
-        # Fallback if title is too long or empty
-        if len(title) > 50 or len(title) < 3:
-            # Extract key words from first user message
-            first_user_msg = next((msg["content"] for msg in request_data.messages if msg.get("role") == "user"), "")
-            words = first_user_msg.split()[:4]
-            title = " ".join(words) if words else "New Chat"
-        
-        # Save the title generation request (optional, for analytics)
-        db_request = Request(
-            user_id=current_user.id,
-            prompt=title_prompt,
-            response=title,
-            model=response.model,
-            provider=response.provider,
-            latency_ms=response.latency_ms,
-            status="success"
-        )
-        
-        db.add(db_request)
-        await db.commit()
-        
-        return TitleGenerateResponse(
-            title=title,
-            model=response.model,
-            provider=response.provider,
-            latency_ms=response.latency_ms
-        )
-        
-    except Exception as e:
-        # Fallback title generation
-        first_user_msg = next((msg["content"] for msg in request_data.messages if msg.get("role") == "user"), "")
-        words = first_user_msg.split()[:4]
-        fallback_title = " ".join(words) if words else "New Chat"
-        
-        return TitleGenerateResponse(
-            title=fallback_title,
-            model="fallback",
-            provider="local",
-            latency_ms=0.0
-        )
+@router.get("/generate-title/{session_id}", response_model=TitleGenerateResponse)
+async def get_chat_title(
+    session_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Collect a title requested with ``background``; it is handed out once"""
+    
+    result = title_batcher.take_result(current_user.id, session_id)
+    if result is not None:
+        return result
+    if title_batcher.status(current_user.id, session_id) == "pending":
+        raise HTTPException(status_code=status.HTTP_202_ACCEPTED, detail="Title is still being generated")
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No pending title for this session")
 
 
 @router.get("/health")
@@ -338,10 +552,9 @@ async def health_check():
     
     try:
         health_status = await router_service.health_check()
-        image_health = await image_service.health_check()
         
         health_status["image_generation"] = {
-            "status": "healthy" if image_health else "unhealthy",
+            **router_service.prober.status("image_generation").snapshot(),
             "is_local": False,
             "models": [model["name"] for model in image_service.get_available_models()]
         }
@@ -358,5 +571,23 @@ async def health_check():
         }
 
 
-
-
+@router.get("/stats")
+async def get_stats(current_user: User = Depends(get_current_user)):
+    """Runtime statistics for sizing and tuning the routing layer"""
+    return {
+        "http_pools": http_clients.stats(),
+        "hedging": router_service.get_hedge_stats(),
+        "concurrency": router_service.limiters.snapshot(),
+        "rate_limits": rate_limits.snapshot(),
+        "ollama_inventory": router_service.providers["ollama"].inventory.snapshot(),
+        "ollama_warm_pool": router_service.providers["ollama"].warm_pool.snapshot(),
+        "latency": router_service.latency_tracker.snapshot(),
+        "model_stats": router_service.model_stats.snapshot(),
+        "routing_config": routing_config.snapshot(),
+        "response_cache": router_service.response_cache.snapshot(),
+        "semantic_cache": router_service.semantic_cache.snapshot(),
+        "coalescing": router_service.coalescer.snapshot(),
+        "title_batches": title_batcher.snapshot(),
+        "conversations": conversation_store.snapshot(),
+        "ollama_context": router_service.providers["ollama"].contexts.snapshot()
+    }
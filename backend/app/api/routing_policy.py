@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.database import get_db
+from ..models.user import User
+from ..api.auth import get_current_user
+from ..services.routing_policy import RoutingPolicyService
+from ..schemas.routing_policy import RoutingPolicyResponse, RoutingPolicyUpdate
+
+router = APIRouter(prefix="/routing-policy", tags=["routing-policy"])
+
+
+@router.get("/", response_model=RoutingPolicyResponse)
+async def get_routing_policy(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the current user's routing policy (balanced, every provider enabled, if never set)"""
+    policy = await RoutingPolicyService.get_policy_for_user(db, current_user.id)
+    if policy is None:
+        return RoutingPolicyResponse(user_id=current_user.id)
+    return policy
+
+
+@router.put("/", response_model=RoutingPolicyResponse)
+async def update_routing_policy(
+    update_data: RoutingPolicyUpdate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Set the routing preference (speed, balanced, accuracy) and enabled providers"""
+    return await RoutingPolicyService.upsert_policy(db, current_user.id, update_data)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -19,8 +19,163 @@ class Settings(BaseSettings):
     groq_api_key: str = ""
     huggingface_api_key: str = ""
     
+    # Rate limits per API key (seeds only - re-synced from x-ratelimit-* headers, 0 = unknown)
+    groq_requests_per_minute: float = 30
+    groq_tokens_per_minute: float = 6000
+    huggingface_requests_per_minute: float = 0
+    huggingface_tokens_per_minute: float = 0
+    
     # Ollama
     ollama_base_url: str = "http://localhost:11434"
+    ollama_inventory_ttl: float = 60.0
+    ollama_ps_interval: float = 10.0
+    # Sent with every call so models stay resident between requests ("-1" = forever)
+    ollama_keep_alive: str = "30m"
+    # Loaded models within this many quality tiers of the best candidate are tried first
+    ollama_resident_quality_slack: int = 0
+    # Warm pool: keep the models recent traffic needed loaded (size 0 disables it)
+    ollama_warm_pool_size: int = 2
+    ollama_warm_pool_models: List[str] = []
+    ollama_warm_pool_window: float = 900.0
+    ollama_warm_pool_interval: float = 60.0
+    # Reuse the KV context Ollama returns, so conversation turns skip re-prefilling the history
+    ollama_context_reuse: bool = True
+    ollama_context_max_tokens: int = 4_000_000  # Context tokens kept in memory (4 bytes each)
+    ollama_context_spill_dir: str = ""  # Evicted contexts go to disk here instead of being dropped ("" = off)
+    ollama_context_spill_max_entries: int = 10000
+    
+    # Pooled upstream HTTP clients
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http2_enabled: bool = False
+    http_connect_timeout: float = 5.0
+    http_pool_timeout: float = 10.0
+    
+    # Per-provider read timeouts (seconds)
+    groq_timeout: float = 30.0
+    huggingface_timeout: float = 60.0
+    ollama_timeout: float = 60.0
+    image_generation_timeout: float = 120.0
+    image_summary_timeout: float = 90.0
+    
+    # Hedged requests across the fallback chain
+    hedging_enabled: bool = False
+    hedge_latency_percentile: float = 0.95
+    hedge_default_delay_ms: float = 2000.0
+    hedge_min_delay_ms: float = 150.0
+    hedge_max_per_request: int = 1
+    hedge_max_outstanding: int = 20
+    
+    # Circuit breakers per (provider, model)
+    breaker_window_size: int = 20
+    breaker_min_calls: int = 5
+    breaker_failure_rate_threshold: float = 0.5
+    breaker_slow_call_ms: float = 20000.0
+    breaker_slow_call_rate_threshold: float = 0.8
+    breaker_open_seconds: float = 30.0
+    breaker_half_open_max_calls: int = 1
+    
+    # Adaptive concurrency limits per upstream (per model for Ollama)
+    limiter_initial_limit: int = 8
+    limiter_max_limit: int = 64
+    limiter_local_initial_limit: int = 1
+    limiter_local_max_limit: int = 4
+    limiter_min_limit: int = 1
+    limiter_latency_tolerance: float = 2.0
+    limiter_backoff_ratio: float = 0.5
+    limiter_max_queue_wait_ms: float = 2000.0
+    limiter_last_candidate_wait_ms: float = 30000.0
+    limiter_default_latency_ms: float = 2000.0
+    
+    # Overall request deadline (X-Request-Deadline-Ms header, else per-plan default)
+    deadline_default_ms: float = 30000.0
+    deadline_max_ms: float = 120000.0
+    deadline_plan_defaults_ms: Dict[str, float] = {"free": 30000.0, "basic": 45000.0, "pro": 60000.0, "enterprise": 90000.0}
+    plan_cache_ttl: float = 300.0
+    # Extra passes over candidates that failed transiently, with jittered exponential backoff
+    retry_max_rounds: int = 1
+    retry_backoff_base_ms: float = 250.0
+    retry_backoff_max_ms: float = 4000.0
+    
+    # Task classification: only the head of huge prompts is scored, long ones off the event loop
+    classifier_max_chars: int = 20000
+    classifier_thread_threshold: int = 4000
+    
+    # Live per-(provider, model, task) statistics used to order candidates
+    stats_ewma_alpha: float = 0.2
+    stats_min_samples: int = 3
+    stats_min_success: float = 0.1
+    stats_seed_hours: float = 24.0
+    stats_seed_limit: int = 5000
+    # Expected latency for models without enough samples yet
+    stats_prior_ms: Dict[str, float] = {"groq": 1000.0, "huggingface": 4000.0, "ollama": 6000.0}
+    
+    # Batch generation: max prompts per call and in-flight prompts per provider
+    batch_max_size: int = 500
+    batch_provider_concurrency: Dict[str, int] = {"groq": 8, "huggingface": 4, "ollama": 1}
+    
+    # How often long-running endpoints check whether the client is still connected
+    disconnect_poll_interval: float = 0.25
+    
+    # Background health probing (cached for /health, demotes unhealthy providers)
+    health_probe_interval: float = 30.0
+    health_probe_timeout: float = 5.0
+    health_ewma_alpha: float = 0.3
+    health_unhealthy_threshold: int = 2
+    health_healthy_threshold: int = 1
+    
+    # Routing policies
+    routing_policy_cache_ttl: float = 300.0
+    # The routing decision table is re-ranked in the background from live latency statistics this often (seconds), if they changed
+    routing_table_rerank_interval: float = 5.0
+    
+    # Declarative routing file (models, tiers, task rules); empty = app/core/routing.toml
+    routing_config_path: str = ""
+    routing_config_poll_interval: float = 2.0
+    
+    # Exact-match response cache in front of routing
+    response_cache_enabled: bool = True
+    response_cache_max_bytes: int = 64 * 1024 * 1024
+    response_cache_ttl: float = 3600.0
+    # Requests at or below this temperature are cached unless they opt out
+    response_cache_max_temperature: float = 0.3
+    
+    # Identical concurrent requests share one upstream call
+    coalescing_enabled: bool = True
+    
+    # Opt-in semantic (near-duplicate) cache, partitioned per user
+    semantic_cache_enabled: bool = True
+    semantic_cache_threshold: float = 0.9
+    semantic_cache_dim: int = 512
+    semantic_cache_max_entries: int = 1000  # Per partition
+    semantic_cache_max_tenants: int = 1000  # Partitions kept before the least recently used is dropped
+    semantic_cache_ttl: float = 3600.0
+    semantic_cache_max_chars: int = 4000
+    # Ollama embedding model (e.g. "nomic-embed-text"); empty = hashed n-gram vectors only
+    semantic_cache_embedding_model: str = ""
+    semantic_cache_embed_timeout: float = 2.0
+    
+    # Chat titles are extracted locally; an LLM only rewrites them when the user asks for
+    # higher quality, or automatically while the first-choice model's limiter has headroom
+    title_llm_when_idle: bool = True
+    title_llm_spare_ratio: float = 0.5  # Fraction of the concurrency limit that must be free
+    # LLM titles are batched: a batch is sent after this many sessions or this long after the first
+    title_batch_max_sessions: int = 8
+    title_batch_max_wait_ms: float = 500.0
+    # How long high-quality batches wait for spare capacity before going anyway
+    title_batch_max_defer_ms: float = 10000.0
+    title_batch_max_messages: int = 4  # Per session, and characters per message below
+    title_batch_max_chars: int = 500
+    title_results_max: int = 10000  # Background titles kept until their session is fetched
+    
+    # Server-side conversations: each turn sends the rolling summary plus the newest turns in this budget
+    conversation_window_tokens: int = 3000
+    conversation_window_max_turns: int = 50  # Turns read per request
+    # Older turns are folded into the summary in the background once the unsummarized ones pass this
+    conversation_summary_trigger_tokens: int = 2400
+    conversation_summary_max_tokens: int = 300
+    conversation_summary_spare_ratio: float = 0.5
     
     # CORS
     cors_origins: List[str] = ["http://localhost:5173", "http://localhost:3000"]
@@ -0,0 +1,36 @@
+import asyncio
+from typing import Awaitable, TypeVar
+from fastapi import Request
+from .config import settings
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """The client went away before the response was ready"""
+    pass
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """Await ``awaitable``, cancelling it as soon as the client disconnects.
+
+    Uvicorn keeps running a handler after its client is gone, so without this
+    upstream calls (and their cost) continue for a response nobody will read.
+    Cancellation reaches the in-flight httpx calls, which closes their connections.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.disconnect_poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+                raise ClientDisconnected("Client disconnected before the response was ready")
+    finally:
+        if not task.done():
+            task.cancel()
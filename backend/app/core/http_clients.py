@@ -0,0 +1,103 @@
+import httpx
+from typing import Dict
+from .config import settings
+
+
+class HTTPClientManager:
+    """Long-lived, pooled httpx clients - one per upstream host"""
+
+    # Upstream hosts that get their own connection pool
+    UPSTREAMS = ("groq", "huggingface", "ollama")
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self.http2_enabled = settings.http2_enabled and self._h2_installed()
+
+    @staticmethod
+    def _h2_installed() -> bool:
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            print("DEBUG: HTTP/2 requested but 'h2' is not installed, falling back to HTTP/1.1")
+            return False
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry
+        )
+
+    def timeout(self, profile: str) -> httpx.Timeout:
+        """Timeout profile for a provider or service (read timeout varies, connect is shared)"""
+        read_timeouts = {
+            "groq": settings.groq_timeout,
+            "huggingface": settings.huggingface_timeout,
+            "ollama": settings.ollama_timeout,
+            "image_generation": settings.image_generation_timeout,
+            "image_summary": settings.image_summary_timeout,
+        }
+        read = read_timeouts.get(profile, settings.groq_timeout)
+        return httpx.Timeout(read, connect=settings.http_connect_timeout, pool=settings.http_pool_timeout)
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        # Ollama is plain HTTP on a local box, HTTP/2 only helps the TLS upstreams
+        use_http2 = self.http2_enabled and name != "ollama"
+        return httpx.AsyncClient(
+            limits=self._limits(),
+            timeout=self.timeout(name),
+            http2=use_http2
+        )
+
+    async def startup(self):
+        """Open one client per upstream host"""
+        for name in self.UPSTREAMS:
+            if name not in self._clients:
+                self._clients[name] = self._create(name)
+        print(f"DEBUG: HTTP client pools ready: {list(self._clients)} (http2={self.http2_enabled})")
+
+    async def shutdown(self):
+        """Close all pooled connections"""
+        for name, client in list(self._clients.items()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                print(f"DEBUG: Failed to close HTTP client {name}: {e}")
+        self._clients.clear()
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Get the pooled client for an upstream, creating it lazily outside the app lifespan"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create(name)
+            self._clients[name] = client
+        return client
+
+    @staticmethod
+    def _pool_usage(client: httpx.AsyncClient) -> dict:
+        """Connection counts from the client's pool, or None values if this httpx/httpcore doesn't expose them"""
+        try:
+            # Not public API: read defensively so an httpx/httpcore upgrade only blanks these fields
+            pool = client._transport._pool
+            connections = list(pool.connections)
+            idle = sum(1 for c in connections if c.is_idle())
+            queued = sum(1 for r in getattr(pool, "_requests", []) if getattr(r, "connection", None) is None)
+            return {"connections": len(connections), "active": len(connections) - idle, "idle": idle, "queued_requests": queued}
+        except Exception:
+            return {"connections": None, "active": None, "idle": None, "queued_requests": None}
+
+    def stats(self) -> dict:
+        """Connection pool utilisation per upstream"""
+        stats = {}
+        for name, client in self._clients.items():
+            stats[name] = {
+                **self._pool_usage(client),
+                "max_connections": settings.http_max_connections,
+                "max_keepalive_connections": settings.http_max_keepalive_connections,
+                "http2": self.http2_enabled and name != "ollama",
+                "closed": client.is_closed
+            }
+        return stats
+
+http_clients = HTTPClientManager()
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, UniqueConstraint
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from ..core.database import Base
+
+
+class Conversation(Base):
+    __tablename__ = "conversations"
+    __table_args__ = (UniqueConstraint("user_id", "session_id", name="uq_conversations_user_session"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    session_id = Column(String, nullable=False)  # Chosen by the client, unique per user
+    summary = Column(Text, nullable=True)  # Rolling summary of the turns before summarized_turns
+    summarized_turns = Column(Integer, nullable=False, default=0)
+    turn_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relationships
+    user = relationship("User", back_populates="conversations")
+    turns = relationship("ConversationTurn", back_populates="conversation", cascade="all, delete-orphan")
+
+
+class ConversationTurn(Base):
+    __tablename__ = "conversation_turns"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)  # 0-based order within the conversation
+    role = Column(String, nullable=False)  # user, assistant
+    content = Column(Text, nullable=False)
+    tokens = Column(Integer, nullable=False)  # Estimated, for the context window budget
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationship
+    conversation = relationship("Conversation", back_populates="turns")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, false
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from ..core.database import Base
@@ -14,8 +14,9 @@ class Request(Base):
     model = Column(String, nullable=False)
     provider = Column(String, nullable=False)
     latency_ms = Column(Float, nullable=True)
-    status = Column(String, nullable=False)  # success, failed, timeout
+    status = Column(String, nullable=False)  # success, failed, timeout, cancelled
     error_message = Column(Text, nullable=True)
+    cached = Column(Boolean, nullable=False, default=False, server_default=false())  # Served from the response cache
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationship
@@ -20,7 +20,9 @@ class User(Base):
     requests = relationship("Request", back_populates="user", cascade="all, delete-orphan")
     routing_policy = relationship("RoutingPolicy", back_populates="user", uselist=False, cascade="all, delete-orphan")
     subscription_records = relationship("SubscriptionRecord", back_populates="user", cascade="all, delete-orphan")
+    conversations = relationship("Conversation", back_populates="user", cascade="all, delete-orphan")
 
 # Fix circular import for SQLAlchemy relationship
 from .routing_policy import RoutingPolicy
 from .subscription_record import SubscriptionRecord
+from .conversation import Conversation
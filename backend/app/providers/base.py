@@ -1,6 +1,38 @@
+import httpx
 from abc import ABC, abstractmethod
-from typing import Optional
-from ..schemas.llm import GenerateRequest, GenerateResponse
+from typing import AsyncIterator, List, Optional, Tuple
+from ..schemas.llm import ChatTurn, GenerateRequest, GenerateResponse
+from ..core.http_clients import http_clients
+
+
+def split_history(request: GenerateRequest) -> Tuple[str, List[ChatTurn]]:
+    """(system text, user/assistant turns) of a request's conversation history"""
+    history = request.history or []
+    system = "\n\n".join(turn.content for turn in history if turn.role == "system")
+    return system, [turn for turn in history if turn.role != "system"]
+
+
+def render_transcript(request: GenerateRequest) -> str:
+    """Prompt with the conversation so far in front, for completion-style APIs without a messages array"""
+    system, turns = split_history(request)
+    if not system and not turns:
+        return request.prompt
+    lines = [system, ""] if system else []
+    if turns:
+        lines += ["Conversation so far:"] + [f"{turn.role.capitalize()}: {turn.content}" for turn in turns] + [""]
+    return "\n".join(lines + [request.prompt])
+
+
+class ProviderError(Exception):
+    """Upstream generation failure.
+    
+    ``status_code`` is the upstream HTTP status, or None when no response was
+    received (connection error, timeout).
+    """
+    
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
 
 
 class BaseProvider(ABC):
@@ -10,12 +42,53 @@ class BaseProvider(ABC):
         self.name = name
         self.is_local = is_local
         self.is_available = True
+        self._client: Optional[httpx.AsyncClient] = None
+        # Header-synced rate-limit budget for API providers (None = not rate limited)
+        self.rate_limit = None
+    
+    def bind_http_client(self, client: httpx.AsyncClient):
+        """Inject the shared, pooled HTTP client for this provider's upstream"""
+        self._client = client
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled HTTP client (falls back to the shared pool if nothing was injected)"""
+        if self._client is None or self._client.is_closed:
+            self._client = http_clients.get(self.name)
+        return self._client
+    
+    @property
+    def timeout(self) -> httpx.Timeout:
+        """Timeout profile for this provider"""
+        return http_clients.timeout(self.name)
+    
+    def can_serve(self, model: str) -> bool:
+        """Cheap, synchronous check used when planning the fallback chain"""
+        return True
+    
+    async def startup(self):
+        """Start background work (called from the app lifespan)"""
+        pass
+    
+    async def shutdown(self):
+        """Stop background work"""
+        pass
+    
+    def limiter_key(self, model: str) -> str:
+        """Concurrency limiter this model's calls count against (one per upstream by default)"""
+        return self.name
     
     @abstractmethod
     async def generate(self, request: GenerateRequest) -> GenerateResponse:
         """Generate response from the LLM provider"""
         pass
     
+    async def stream(self, request: GenerateRequest) -> AsyncIterator[str]:
+        """Stream response tokens (providers without streaming yield the full completion once)"""
+        response = await self.generate(request)
+        if response.response:
+            yield response.response
+    
     @abstractmethod
     async def is_model_available(self, model: str) -> bool:
         """Check if a specific model is available"""
@@ -1,9 +1,11 @@
-import httpx
+import json
 import time
-from typing import Optional
-from .base import BaseProvider
+from typing import AsyncIterator, Optional
+from .base import BaseProvider, ProviderError
 from ..schemas.llm import GenerateRequest, GenerateResponse
 from ..core.config import settings
+from ..services.rate_limiter import rate_limits
+from ..services.routing_config import routing_config
 
 
 class GroqProvider(BaseProvider):
@@ -13,78 +15,136 @@ class GroqProvider(BaseProvider):
         super().__init__("groq", is_local=False)
         self.api_key = settings.groq_api_key
         self.base_url = "https://api.groq.com/openai/v1"
-        # Only confirmed working models as of December 2024
-        self.models = [
-            "llama-3.1-8b-instant",    # Most reliable and fast
-            "llama3-8b-8192",          # Alternative 8B model
-            "gemma2-9b-it",            # Google's model, good performance
-            "gemma-7b-it"              # Smaller Google model
-        ]
         
         print(f"DEBUG: Groq API key loaded: {'Yes' if self.api_key else 'No'} (length: {len(self.api_key) if self.api_key else 0})")
         
         if not self.api_key:
             self.is_available = False
             print("DEBUG: Groq provider disabled - no API key")
+        else:
+            self.rate_limit = rate_limits.for_key(
+                "groq", self.api_key,
+                settings.groq_requests_per_minute, settings.groq_tokens_per_minute
+            )
+    
+    @property
+    def models(self) -> list[str]:
+        """Enabled models from the routing config (follows hot reloads)"""
+        return routing_config.current.provider_models(self.name)
     
     async def is_model_available(self, model: str) -> bool:
         """Check if model is available in Groq"""
         return model in self.models and self.is_available
     
-    async def generate(self, request: GenerateRequest) -> GenerateResponse:
-        """Generate response using Groq API"""
+    def _resolve_model(self, request: GenerateRequest) -> str:
+        """Use specified model or default to most reliable model"""
         if not self.api_key:
             raise Exception("Groq API key not configured")
         
-        start_time = time.time()
-        
-        # Use specified model or default to most reliable model
         model = request.model or "llama-3.1-8b-instant"
         if model not in self.models:
             raise Exception(f"Model {model} not available in Groq")
+        return model
+    
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    def _build_payload(self, request: GenerateRequest, model: str, stream: bool) -> dict:
+        return {
+            "model": model,
+            # Conversation history (summary as a system turn) goes ahead of the new prompt
+            "messages": [
+                *(turn.model_dump() for turn in request.history or ()),
+                {"role": "user", "content": request.prompt}
+            ],
+            "max_tokens": request.max_tokens or 1000,
+            "temperature": request.temperature or 0.7,
+            "stream": stream
+        }
+    
+    async def generate(self, request: GenerateRequest) -> GenerateResponse:
+        """Generate response using Groq API"""
+        start_time = time.time()
+        model = self._resolve_model(request)
         
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+            headers = self._headers()
+            payload = self._build_payload(request, model, stream=False)
             
-            payload = {
-                "model": model,
-                "messages": [
-                    {"role": "user", "content": request.prompt}
-                ],
-                "max_tokens": request.max_tokens or 1000,
-                "temperature": request.temperature or 0.7,
-                "stream": False
-            }
+            response = await self.client.post(
+                f"{self.base_url}/chat/completions",
+                json=payload,
+                headers=headers,
+                timeout=self.timeout
+            )
+            self.rate_limit.sync(response.headers, response.status_code)
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    json=payload,
-                    headers=headers,
-                    timeout=30.0
-                )
+            if response.status_code == 200:
+                result = response.json()
+                latency = (time.time() - start_time) * 1000
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    latency = (time.time() - start_time) * 1000
-                    
-                    return GenerateResponse(
-                        response=result["choices"][0]["message"]["content"],
-                        model=model,
-                        provider="groq",
-                        latency_ms=latency,
-                        tokens_used=result["usage"]["total_tokens"]
-                    )
-                else:
+                return GenerateResponse(
+                    response=result["choices"][0]["message"]["content"],
+                    model=model,
+                    provider="groq",
+                    latency_ms=latency,
+                    tokens_used=result["usage"]["total_tokens"]
+                )
+            else:
+                try:
                     error_msg = response.json().get("error", {}).get("message", "Unknown error")
-                    raise Exception(f"Groq API error: {error_msg}")
+                except ValueError:
+                    error_msg = response.text or "Unknown error"
+                raise ProviderError(f"Groq API error: {error_msg}", status_code=response.status_code)
                     
         except Exception as e:
-            self.is_available = False
-            raise Exception(f"Groq generation failed: {str(e)}")
+            raise ProviderError(f"Groq generation failed: {str(e)}", status_code=getattr(e, "status_code", None)) from e
+    
+    async def stream(self, request: GenerateRequest) -> AsyncIterator[str]:
+        """Stream tokens from Groq's SSE chat-completions endpoint"""
+        model = self._resolve_model(request)
+        
+        try:
+            async with self.client.stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                json=self._build_payload(request, model, stream=True),
+                headers=self._headers(),
+                timeout=self.timeout
+            ) as response:
+                self.rate_limit.sync(response.headers, response.status_code)
+                if response.status_code != 200:
+                    await response.aread()
+                    try:
+                        error_msg = response.json().get("error", {}).get("message", "Unknown error")
+                    except ValueError:
+                        error_msg = response.text or "Unknown error"
+                    raise ProviderError(f"Groq API error: {error_msg}", status_code=response.status_code)
+                
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    choices = chunk.get("choices") or [{}]
+                    token = choices[0].get("delta", {}).get("content")
+                    if token:
+                        yield token
+                        
+        except Exception as e:
+            raise ProviderError(f"Groq streaming failed: {str(e)}", status_code=getattr(e, "status_code", None)) from e
+    
+    async def health_check(self) -> bool:
+        """Cheap liveness ping - listing models consumes no tokens"""
+        if not self.api_key:
+            return False
+        response = await self.client.get(f"{self.base_url}/models", headers=self._headers(), timeout=settings.health_probe_timeout)
+        return response.status_code == 200
     
     def get_models(self) -> list[str]:
         """Get available Groq models"""
@@ -1,9 +1,11 @@
-import httpx
+import json
 import time
-from typing import Optional
-from .base import BaseProvider
+from typing import AsyncIterator, Optional
+from .base import BaseProvider, ProviderError, render_transcript, split_history
 from ..schemas.llm import GenerateRequest, GenerateResponse
 from ..core.config import settings
+from ..services.rate_limiter import rate_limits
+from ..services.routing_config import routing_config
 
 
 class HuggingFaceProvider(BaseProvider):
@@ -13,93 +15,179 @@ class HuggingFaceProvider(BaseProvider):
         super().__init__("huggingface", is_local=False)
         self.api_key = settings.huggingface_api_key
         self.base_url = "https://api-inference.huggingface.co"
-        self.models = [
-            "tiiuae/falcon-7b-instruct",
-            "microsoft/Phi-3-mini"
-        ]
         
         print(f"DEBUG: HuggingFace API key loaded: {'Yes' if self.api_key else 'No'} (length: {len(self.api_key) if self.api_key else 0})")
         
         if not self.api_key:
             self.is_available = False
             print("DEBUG: HuggingFace provider disabled - no API key")
+        else:
+            self.rate_limit = rate_limits.for_key(
+                "huggingface", self.api_key,
+                settings.huggingface_requests_per_minute, settings.huggingface_tokens_per_minute
+            )
+    
+    @property
+    def models(self) -> list[str]:
+        """Enabled models from the routing config (follows hot reloads)"""
+        return routing_config.current.provider_models(self.name)
     
     async def is_model_available(self, model: str) -> bool:
         """Check if model is available in Hugging Face"""
         return model in self.models and self.is_available
     
-    async def generate(self, request: GenerateRequest) -> GenerateResponse:
-        """Generate response using Hugging Face API"""
+    def _resolve_model(self, request: GenerateRequest) -> str:
+        """Use specified model or default to Phi-3-mini"""
         if not self.api_key:
             raise Exception("Hugging Face API key not configured")
         
-        start_time = time.time()
-        
-        # Use specified model or default to Phi-3-mini
         model = request.model or "microsoft/Phi-3-mini"
         
         if model not in self.models:
             raise Exception(f"Model {model} not available in Hugging Face")
+        return model
+    
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    def _format_prompt(self, request: GenerateRequest, model: str) -> str:
+        """Format prompt (and any conversation history) based on model"""
+        prompt = request.prompt
+        system, turns = split_history(request)
+        if "phi" in model.lower():
+            history = f"<|system|>\n{system}<|end|>\n" if system else ""
+            history += "".join(f"<|{turn.role}|>\n{turn.content}<|end|>\n" for turn in turns)
+            return f"{history}<|user|>\n{prompt}<|end|>\n<|assistant|>\n"
+        elif "falcon" in model.lower():
+            history = f"{system}\n" if system else ""
+            history += "".join(f"{turn.role.capitalize()}: {turn.content}\n" for turn in turns)
+            return f"{history}User: {prompt}\nAssistant:"
+        return render_transcript(request)
+    
+    def _build_payload(self, formatted_prompt: str, request: GenerateRequest, stream: bool) -> dict:
+        payload = {
+            "inputs": formatted_prompt,
+            "parameters": {
+                "max_new_tokens": request.max_tokens or 1000,
+                "temperature": request.temperature or 0.7,
+                "do_sample": True,
+                "return_full_text": False
+            }
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+    
+    async def generate(self, request: GenerateRequest) -> GenerateResponse:
+        """Generate response using Hugging Face API"""
+        start_time = time.time()
+        model = self._resolve_model(request)
         
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            # Format prompt based on model
-            if "phi" in model.lower():
-                formatted_prompt = f"<|user|>\n{request.prompt}<|end|>\n<|assistant|>\n"
-            elif "falcon" in model.lower():
-                formatted_prompt = f"User: {request.prompt}\nAssistant:"
-            else:
-                formatted_prompt = request.prompt
+            headers = self._headers()
+            formatted_prompt = self._format_prompt(request, model)
+            payload = self._build_payload(formatted_prompt, request, stream=False)
             
-            payload = {
-                "inputs": formatted_prompt,
-                "parameters": {
-                    "max_new_tokens": request.max_tokens or 1000,
-                    "temperature": request.temperature or 0.7,
-                    "do_sample": True,
-                    "return_full_text": False
-                }
-            }
+            response = await self.client.post(
+                f"{self.base_url}/models/{model}",
+                json=payload,
+                headers=headers,
+                timeout=self.timeout
+            )
+            self.rate_limit.sync(response.headers, response.status_code)
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/models/{model}",
-                    json=payload,
-                    headers=headers,
-                    timeout=60.0
+            if response.status_code == 200:
+                result = response.json()
+                latency = (time.time() - start_time) * 1000
+                
+                # Extract generated text from response
+                if isinstance(result, list) and len(result) > 0:
+                    generated_text = result[0].get("generated_text", "")
+                    # Remove the input prompt from the response
+                    if formatted_prompt in generated_text:
+                        generated_text = generated_text.replace(formatted_prompt, "").strip()
+                else:
+                    generated_text = str(result)
+                
+                return GenerateResponse(
+                    response=generated_text,
+                    model=model,
+                    provider="huggingface",
+                    latency_ms=latency,
+                    tokens_used=None  # HF API doesn't always provide token count
                 )
+            else:
+                try:
+                    error_msg = response.json().get("error", "Unknown error")
+                except ValueError:
+                    error_msg = response.text or "Unknown error"
+                raise ProviderError(f"Hugging Face API error: {error_msg}", status_code=response.status_code)
+                
+        except Exception as e:
+            raise ProviderError(f"Hugging Face generation failed: {str(e)}", status_code=getattr(e, "status_code", None)) from e
+    
+    async def stream(self, request: GenerateRequest) -> AsyncIterator[str]:
+        """Stream tokens from the text-generation SSE stream"""
+        model = self._resolve_model(request)
+        formatted_prompt = self._format_prompt(request, model)
+        
+        try:
+            async with self.client.stream(
+                "POST",
+                f"{self.base_url}/models/{model}",
+                json=self._build_payload(formatted_prompt, request, stream=True),
+                headers=self._headers(),
+                timeout=self.timeout
+            ) as response:
+                self.rate_limit.sync(response.headers, response.status_code)
+                if response.status_code != 200:
+                    await response.aread()
+                    try:
+                        error_msg = response.json().get("error", "Unknown error")
+                    except ValueError:
+                        error_msg = response.text or "Unknown error"
+                    raise ProviderError(f"Hugging Face API error: {error_msg}", status_code=response.status_code)
                 
-                if response.status_code == 200:
+                # Models not served by text-generation-inference answer with plain JSON
+                if "text/event-stream" not in response.headers.get("content-type", ""):
+                    await response.aread()
                     result = response.json()
-                    latency = (time.time() - start_time) * 1000
-                    
-                    # Extract generated text from response
                     if isinstance(result, list) and len(result) > 0:
                         generated_text = result[0].get("generated_text", "")
-                        # Remove the input prompt from the response
                         if formatted_prompt in generated_text:
                             generated_text = generated_text.replace(formatted_prompt, "").strip()
                     else:
                         generated_text = str(result)
-                    
-                    return GenerateResponse(
-                        response=generated_text,
-                        model=model,
-                        provider="huggingface",
-                        latency_ms=latency,
-                        tokens_used=None  # HF API doesn't always provide token count
-                    )
-                else:
-                    error_msg = response.json().get("error", "Unknown error")
-                    raise Exception(f"Hugging Face API error: {error_msg}")
-                    
+                    if generated_text:
+                        yield generated_text
+                    return
+                
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    chunk = json.loads(line[len("data:"):].strip())
+                    if chunk.get("error"):
+                        raise ProviderError(f"Hugging Face API error: {chunk['error']}", status_code=response.status_code)
+                    token = chunk.get("token") or {}
+                    if token.get("text") and not token.get("special"):
+                        yield token["text"]
+                        
         except Exception as e:
-            self.is_available = False
-            raise Exception(f"Hugging Face generation failed: {str(e)}")
+            raise ProviderError(f"Hugging Face streaming failed: {str(e)}", status_code=getattr(e, "status_code", None)) from e
+    
+    async def health_check(self) -> bool:
+        """Cheap liveness ping against the default model's endpoint"""
+        if not self.api_key:
+            return False
+        response = await self.client.get(
+            f"{self.base_url}/models/microsoft/Phi-3-mini",
+            headers=self._headers(),
+            timeout=settings.health_probe_timeout
+        )
+        return response.status_code in [200, 503]  # 503 means model is loading
     
     def get_models(self) -> list[str]:
         """Get available Hugging Face models"""
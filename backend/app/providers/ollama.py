@@ -1,9 +1,14 @@
-import httpx
+import json
 import time
-from typing import Optional
-from .base import BaseProvider
+from array import array
+from typing import AsyncIterator, List, Optional
+from .base import BaseProvider, ProviderError, render_transcript
+from .ollama_context import OllamaContextCache
+from .ollama_inventory import OllamaInventory
+from .ollama_warm_pool import OllamaWarmPool
 from ..schemas.llm import GenerateRequest, GenerateResponse
 from ..core.config import settings
+from ..services.routing_config import routing_config
 
 
 class OllamaProvider(BaseProvider):
@@ -12,29 +17,126 @@ class OllamaProvider(BaseProvider):
     def __init__(self):
         super().__init__("ollama", is_local=True)
         self.base_url = settings.ollama_base_url
-        # Common Ollama models (user needs to pull these locally)
-        self.models = [
-            "llama3.1:8b",      # Most common and reliable
-            "llama3:8b",        # Alternative
-            "mistral:7b",       # Good for various tasks
-            "gemma2:9b",        # Google's model
-            "codellama:7b"      # For coding tasks
-        ]
+        # Models declared in the routing config (user needs to pull these locally) -
+        # replaced by what is actually pulled once the inventory has been fetched
+        self.models = routing_config.current.provider_models("ollama")
+        self.inventory = OllamaInventory(self)
+        self.warm_pool = OllamaWarmPool(self)
+        # Per-conversation KV contexts, so the next turn doesn't prefill the whole chat again
+        self.contexts = OllamaContextCache(self)
         
         print(f"DEBUG: Ollama base URL: {self.base_url}")
         print(f"DEBUG: Ollama provider initialized as available: {self.is_available}")
     
     async def is_model_available(self, model: str) -> bool:
-        """Check if model is available locally"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                if response.status_code == 200:
-                    available_models = response.json().get("models", [])
-                    return any(m["name"] == model for m in available_models)
-        except Exception:
-            pass
-        return False
+        """Check if model is available locally (served from the cached inventory)"""
+        if not self.inventory.is_loaded and not self.inventory.recently_failed:
+            # First call pays one /api/tags round trip, shared by concurrent callers
+            await self.inventory.refresh()
+        else:
+            self.inventory.refresh_in_background()
+        return bool(self.inventory.contains(model))
+    
+    def can_serve(self, model: str) -> bool:
+        """Skip models we know are not pulled (unknown inventory = assume yes)"""
+        return self.inventory.contains(model) is not False
+    
+    async def startup(self):
+        self.contexts.clear_spill()
+        self.inventory.start()
+        self.warm_pool.start()
+    
+    async def shutdown(self):
+        await self.warm_pool.stop()
+        await self.inventory.stop()
+    
+    def quality_tier(self, model: str) -> int:
+        """Quality tier from the routing config, used to decide when a loaded model is "as good as" a cold one"""
+        return routing_config.current.quality_tier("ollama", model)
+    
+    def prefer_resident(self, models: List[str]) -> List[str]:
+        """Move loaded models of comparable quality to the front.
+        
+        A cold model pays a multi-second load before its first token, so a
+        resident model within ``ollama_resident_quality_slack`` tiers of the
+        best candidate is tried first. Order is otherwise preserved.
+        """
+        if not models:
+            return models
+        best = max(self.quality_tier(model) for model in models)
+        warm = [
+            model for model in models
+            if self.inventory.is_resident(model)
+            and self.quality_tier(model) >= best - settings.ollama_resident_quality_slack
+        ]
+        return warm + [model for model in models if model not in warm]
+    
+    def limiter_key(self, model: str) -> str:
+        """Each local model gets its own window - they compete for the same CPU/GPU very differently"""
+        return f"ollama:{model}"
+    
+    def _build_payload(self, request: GenerateRequest, model: str, stream: bool, context: Optional[array] = None) -> dict:
+        payload = {
+            "model": model,
+            # A reused context already holds the conversation, so only the new message is sent
+            "prompt": request.prompt if context is not None else render_transcript(request),
+            "stream": stream,
+            "keep_alive": settings.ollama_keep_alive,
+            "options": {
+                "temperature": request.temperature or 0.7,
+                "num_predict": request.max_tokens or 1000
+            }
+        }
+        if context is not None:
+            payload["context"] = context.tolist()
+        return payload
+    
+    async def _reusable_context(self, request: GenerateRequest, model: str) -> Optional[array]:
+        """Cached KV context for this conversation turn, if it is still valid and leaves room to answer"""
+        conversation = request.conversation
+        if conversation is None or not settings.ollama_context_reuse:
+            return None
+        context = await self.contexts.lookup(conversation, model)
+        window = routing_config.current.context_window("ollama", model)
+        if context is not None and window is not None:
+            if len(context) + len(request.prompt) // 4 + (request.max_tokens or 1000) > window:
+                # Too long to extend - start over from the bounded transcript (summary + recent turns)
+                self.contexts.invalidate(conversation)
+                return None
+        return context
+    
+    async def _chunks(self, request: GenerateRequest, model: str) -> AsyncIterator[dict]:
+        """Parsed NDJSON chunks from a streaming /api/generate call.
+        
+        Always streams, even for non-streaming callers: closing the connection
+        is the only way to make Ollama stop generating, so a cancelled request
+        frees the local model instead of finishing a completion nobody reads.
+        """
+        context = await self._reusable_context(request, model)
+        answer = []
+        async with self.client.stream(
+            "POST",
+            f"{self.base_url}/api/generate",
+            json=self._build_payload(request, model, stream=True, context=context),
+            timeout=self.timeout
+        ) as response:
+            if response.status_code != 200:
+                raise ProviderError(f"Ollama API error: {response.status_code}", status_code=response.status_code)
+            
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise ProviderError(f"Ollama API error: {chunk['error']}", status_code=response.status_code)
+                answer.append(chunk.get("response", ""))
+                if chunk.get("done"):
+                    self.inventory.mark_resident(model)
+                    if request.conversation is not None and chunk.get("context") and settings.ollama_context_reuse:
+                        self.contexts.store(request.conversation, model, "".join(answer), chunk["context"])
+                yield chunk
+                if chunk.get("done"):
+                    break
     
     async def generate(self, request: GenerateRequest) -> GenerateResponse:
         """Generate response using Ollama"""
@@ -44,41 +146,51 @@ class OllamaProvider(BaseProvider):
         model = request.model or "llama3.1:8b"
         
         try:
-            async with httpx.AsyncClient() as client:
-                payload = {
-                    "model": model,
-                    "prompt": request.prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": request.temperature or 0.7,
-                        "num_predict": request.max_tokens or 1000
-                    }
-                }
+            parts = []
+            tokens_used = None
+            chunks = self._chunks(request, model)
+            try:
+                async for chunk in chunks:
+                    parts.append(chunk.get("response", ""))
+                    if chunk.get("done"):
+                        tokens_used = chunk.get("eval_count")
+            finally:
+                await chunks.aclose()
+            
+            latency = (time.time() - start_time) * 1000
+            
+            return GenerateResponse(
+                response="".join(parts),
+                model=model,
+                provider="ollama",
+                latency_ms=latency,
+                tokens_used=tokens_used
+            )
                 
-                response = await client.post(
-                    f"{self.base_url}/api/generate",
-                    json=payload,
-                    timeout=60.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    latency = (time.time() - start_time) * 1000
-                    
-                    return GenerateResponse(
-                        response=result.get("response", ""),
-                        model=model,
-                        provider="ollama",
-                        latency_ms=latency,
-                        tokens_used=result.get("eval_count")
-                    )
-                else:
-                    raise Exception(f"Ollama API error: {response.status_code}")
-                    
         except Exception as e:
-            self.is_available = False
-            raise Exception(f"Ollama generation failed: {str(e)}")
+            raise ProviderError(f"Ollama generation failed: {str(e)}", status_code=getattr(e, "status_code", None)) from e
+    
+    async def stream(self, request: GenerateRequest) -> AsyncIterator[str]:
+        """Stream tokens from Ollama's NDJSON /api/generate endpoint"""
+        model = request.model or "llama3.1:8b"
+        
+        chunks = self._chunks(request, model)
+        try:
+            async for chunk in chunks:
+                token = chunk.get("response")
+                if token:
+                    yield token
+        except Exception as e:
+            raise ProviderError(f"Ollama streaming failed: {str(e)}", status_code=getattr(e, "status_code", None)) from e
+        finally:
+            await chunks.aclose()
+    
+    async def health_check(self) -> bool:
+        """Cheap liveness ping against the local Ollama server"""
+        response = await self.client.get(f"{self.base_url}/api/version", timeout=settings.health_probe_timeout)
+        return response.status_code == 200
     
     def get_models(self) -> list[str]:
         """Get available Ollama models"""
+        self.inventory.refresh_in_background()
         return self.models
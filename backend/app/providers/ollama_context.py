@@ -0,0 +1,191 @@
+import asyncio
+import glob
+import hashlib
+import json
+import os
+from array import array
+from collections import OrderedDict
+from typing import Optional
+from ..core.config import settings
+from ..schemas.llm import ConversationRef
+
+SPILL_SUFFIX = ".ctx"
+
+
+def answer_digest(text: str) -> str:
+    """Short fingerprint of an assistant answer, to tell which answer a KV context ends with"""
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+class ContextEntry:
+    """Ollama KV context for one conversation, valid only in the exact state it was produced in"""
+
+    def __init__(self, model: str, instance: str, weights: Optional[str], turns: int, answer: str, tokens: array):
+        self.model = model
+        self.instance = instance  # Ollama base URL the context was produced on
+        self.weights = weights  # Model digest from /api/tags, None if unknown
+        self.turns = turns  # Conversation turns the context covers
+        self.answer = answer  # answer_digest of the last answer in it
+        self.tokens = tokens
+
+    def header(self, key: str) -> dict:
+        return {"key": key, "model": self.model, "instance": self.instance, "weights": self.weights,
+                "turns": self.turns, "answer": self.answer}
+
+
+class OllamaContextCache:
+    """Per-conversation ``context`` arrays from /api/generate, so a turn skips re-prefilling the chat.
+
+    Entries live in an LRU bounded by ``ollama_context_max_tokens`` (stored as
+    4-byte ints). With ``ollama_context_spill_dir`` set, evicted entries are
+    written to disk and read back on the conversation's next turn instead of
+    being dropped. A context is only reused for the same model, Ollama
+    instance and model weights, and only if the conversation's last recorded
+    answer is the one it ends with; anything else invalidates it.
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._entries: "OrderedDict[str, ContextEntry]" = OrderedDict()
+        self._spilled: "OrderedDict[str, str]" = OrderedDict()  # Key -> model, for entries on disk
+        self._io: set = set()
+        self.tokens = 0
+        self.stats = {"hits": 0, "misses": 0, "invalidated": 0, "stores": 0, "evictions": 0,
+                      "spills": 0, "spill_loads": 0, "spill_failures": 0}
+
+    def _path(self, key: str) -> str:
+        name = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        return os.path.join(settings.ollama_context_spill_dir, name + SPILL_SUFFIX)
+
+    def pinned_model(self, conversation: Optional[ConversationRef]) -> Optional[str]:
+        """Model holding this conversation's context, which the router should keep it on"""
+        if conversation is None:
+            return None
+        entry = self._entries.get(conversation.key)
+        return entry.model if entry is not None else self._spilled.get(conversation.key)
+
+    def _is_valid(self, entry: ContextEntry, conversation: ConversationRef, model: str) -> bool:
+        weights = self.provider.inventory.digest(model)
+        return (
+            entry.model == model
+            and entry.instance == self.provider.base_url
+            and (entry.weights is None or weights is None or entry.weights == weights)
+            and entry.turns == conversation.turns
+            and entry.answer == conversation.last_answer
+        )
+
+    async def lookup(self, conversation: ConversationRef, model: str) -> Optional[array]:
+        """Reusable context for the conversation's next turn on ``model`` (a stale one is dropped)"""
+        key = conversation.key
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.tokens -= len(entry.tokens)
+        elif key in self._spilled:
+            entry = await self._load(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        if not self._is_valid(entry, conversation, model):
+            self.stats["invalidated"] += 1
+            return None
+        self._insert(key, entry)
+        self.stats["hits"] += 1
+        return entry.tokens
+
+    def store(self, conversation: ConversationRef, model: str, answer: str, context: list):
+        """Context returned with a finished answer; valid for the turn after this exchange is recorded"""
+        self.invalidate(conversation)
+        entry = ContextEntry(
+            model, self.provider.base_url, self.provider.inventory.digest(model),
+            conversation.turns + 2, answer_digest(answer), array("i", context)
+        )
+        self._insert(conversation.key, entry)
+        self.stats["stores"] += 1
+
+    def invalidate(self, conversation: ConversationRef):
+        entry = self._entries.pop(conversation.key, None)
+        if entry is not None:
+            self.tokens -= len(entry.tokens)
+        if self._spilled.pop(conversation.key, None) is not None:
+            self._background(asyncio.to_thread(self._remove_file, self._path(conversation.key)))
+
+    def _insert(self, key: str, entry: ContextEntry):
+        self._entries[key] = entry
+        self.tokens += len(entry.tokens)
+        while self.tokens > settings.ollama_context_max_tokens and self._entries:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self.tokens -= len(evicted.tokens)
+            if settings.ollama_context_spill_dir:
+                self._spill(evicted_key, evicted)
+            else:
+                self.stats["evictions"] += 1
+
+    def _background(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._io.add(task)
+        task.add_done_callback(self._io.discard)
+
+    def _spill(self, key: str, entry: ContextEntry):
+        self._spilled[key] = entry.model
+        self._spilled.move_to_end(key)
+        self.stats["spills"] += 1
+        self._background(asyncio.to_thread(self._write_file, self._path(key), entry.header(key), entry.tokens))
+        while len(self._spilled) > settings.ollama_context_spill_max_entries:
+            dropped, _ = self._spilled.popitem(last=False)
+            self.stats["evictions"] += 1
+            self._background(asyncio.to_thread(self._remove_file, self._path(dropped)))
+
+    @staticmethod
+    def _write_file(path: str, header: dict, tokens: array):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            f.write(tokens.tobytes())
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def _read_file(path: str) -> tuple:
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            tokens = array("i")
+            tokens.frombytes(f.read())
+        os.remove(path)
+        return header, tokens
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    async def _load(self, key: str) -> Optional[ContextEntry]:
+        self._spilled.pop(key, None)
+        try:
+            header, tokens = await asyncio.to_thread(self._read_file, self._path(key))
+            if header["key"] != key:
+                raise ValueError("spill file belongs to another conversation")
+        except Exception as e:
+            # Still being written, removed, or corrupt - the turn just prefills from the transcript
+            self.stats["spill_failures"] += 1
+            print(f"DEBUG: Could not load spilled Ollama context: {e}")
+            return None
+        self.stats["spill_loads"] += 1
+        return ContextEntry(header["model"], header["instance"], header["weights"], header["turns"], header["answer"], tokens)
+
+    def clear_spill(self):
+        """Drop contexts spilled by a previous process (their conversations are unknown to this one)"""
+        if settings.ollama_context_spill_dir:
+            for path in glob.glob(os.path.join(settings.ollama_context_spill_dir, "*" + SPILL_SUFFIX)):
+                self._remove_file(path)
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["invalidated"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else None,
+            "conversations": len(self._entries),
+            "spilled": len(self._spilled),
+            "tokens": self.tokens,
+            "max_tokens": settings.ollama_context_max_tokens
+        }
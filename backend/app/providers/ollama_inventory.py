@@ -0,0 +1,181 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from ..core.config import settings
+from ..services.rate_limiter import parse_duration
+
+
+def keep_alive_seconds() -> float:
+    """Configured Ollama keep_alive in seconds (negative = keep loaded forever)"""
+    seconds = parse_duration(str(settings.ollama_keep_alive))
+    if seconds is None:
+        return 300.0  # Ollama's default
+    return float("inf") if seconds < 0 else seconds
+
+
+class OllamaInventory:
+    """In-memory view of the models pulled on the Ollama host.
+
+    Refreshed from ``GET /api/tags`` in the background on a TTL. Concurrent
+    refreshes are single-flight: callers share the one in-flight request.
+    Also tracks which models are resident in memory (``GET /api/ps``).
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.models: Dict[str, dict] = {}
+        # Resident models -> monotonic time they are expected to be unloaded
+        self.resident: Dict[str, float] = {}
+        self.refreshed_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.failed_at: Optional[float] = None
+        # Bumped whenever the set of pulled models (or whether it is known) changes
+        self.version = 0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.refreshed_at is not None
+
+    @property
+    def is_stale(self) -> bool:
+        return self.refreshed_at is None or time.monotonic() - self.refreshed_at > settings.ollama_inventory_ttl
+
+    @property
+    def recently_failed(self) -> bool:
+        """Avoid re-paying a failing round trip on every request while Ollama is down"""
+        return self.failed_at is not None and time.monotonic() - self.failed_at < settings.ollama_inventory_ttl / 4
+
+    @staticmethod
+    def _canonical(name: str) -> str:
+        return name if ":" in name else f"{name}:latest"
+
+    def contains(self, model: str) -> Optional[bool]:
+        """Whether the model is pulled (None while the inventory is unknown)"""
+        if not self.is_loaded:
+            return None
+        return self._canonical(model) in self.models
+
+    def digest(self, model: str) -> Optional[str]:
+        """Digest of the pulled weights (changes when the model is re-pulled), None if unknown"""
+        info = self.models.get(self._canonical(model))
+        return info.get("digest") if info is not None else None
+
+    def names(self) -> List[str]:
+        return list(self.models)
+
+    def is_resident(self, model: str) -> bool:
+        """Whether the model is currently loaded in memory (no cold-load on the next call)"""
+        expires = self.resident.get(self._canonical(model))
+        return expires is not None and expires > time.monotonic()
+
+    def mark_resident(self, model: str):
+        """A call just used the model, so Ollama keeps it loaded for keep_alive"""
+        self.resident[self._canonical(model)] = time.monotonic() + keep_alive_seconds()
+
+    async def refresh_resident(self):
+        """Re-read the resident set from /api/ps"""
+        try:
+            response = await self.provider.client.get(
+                f"{self.provider.base_url}/api/ps",
+                timeout=self.provider.timeout
+            )
+            if response.status_code != 200:
+                raise Exception(f"Ollama API error: {response.status_code}")
+
+            now_wall = datetime.now(timezone.utc)
+            now = time.monotonic()
+            resident = {}
+            for entry in response.json().get("models", []):
+                expires = now + keep_alive_seconds()
+                if entry.get("expires_at"):
+                    try:
+                        expires_at = datetime.fromisoformat(entry["expires_at"].replace("Z", "+00:00"))
+                        expires = now + (expires_at - now_wall).total_seconds()
+                    except ValueError:
+                        pass
+                resident[self._canonical(entry["name"])] = expires
+            self.resident = resident
+        except Exception as e:
+            print(f"DEBUG: Ollama resident model refresh failed: {e}")
+
+    async def refresh(self):
+        """Refresh now, joining an in-flight refresh instead of starting a second one"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._fetch())
+        await asyncio.shield(self._refresh_task)
+
+    def refresh_in_background(self):
+        """Kick off a refresh if the inventory is stale, without waiting for it"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Called outside the event loop (scripts) - nothing to schedule on
+        if self.is_stale and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._fetch())
+
+    async def _fetch(self):
+        try:
+            response = await self.provider.client.get(
+                f"{self.provider.base_url}/api/tags",
+                timeout=self.provider.timeout
+            )
+            if response.status_code != 200:
+                raise Exception(f"Ollama API error: {response.status_code}")
+
+            models = {}
+            for entry in response.json().get("models", []):
+                details = entry.get("details") or {}
+                models[self._canonical(entry["name"])] = {
+                    "name": entry["name"],
+                    "digest": entry.get("digest"),
+                    "size": entry.get("size"),
+                    "family": details.get("family"),
+                    "parameter_size": details.get("parameter_size"),
+                    "quantization": details.get("quantization_level"),
+                    "modified_at": entry.get("modified_at")
+                }
+
+            if not self.is_loaded or models.keys() != self.models.keys():
+                self.version += 1
+            self.models = models
+            self.refreshed_at = time.monotonic()
+            self.last_error = None
+            self.failed_at = None
+            self.provider.models = [info["name"] for info in models.values()]
+        except Exception as e:
+            # Keep serving the last known inventory
+            self.last_error = str(e)
+            self.failed_at = time.monotonic()
+            print(f"DEBUG: Ollama inventory refresh failed: {e}")
+
+    async def _refresh_loop(self):
+        while True:
+            if self.is_stale:
+                await self.refresh()
+            await self.refresh_resident()
+            await asyncio.sleep(settings.ollama_ps_interval)
+
+    def start(self):
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        for task in (self._loop_task, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+    def snapshot(self) -> dict:
+        return {
+            "loaded": self.is_loaded,
+            "age_seconds": round(time.monotonic() - self.refreshed_at, 1) if self.refreshed_at else None,
+            "last_error": self.last_error,
+            "models": list(self.models.values()),
+            "resident": [name for name in self.resident if self.is_resident(name)]
+        }
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from collections import Counter, deque
+from typing import Deque, List, Optional, Tuple
+from ..core.config import settings
+
+
+class OllamaWarmPool:
+    """Keeps the Ollama models recent traffic needed resident in memory.
+
+    The router records which local model each request would fall back to.
+    Every ``ollama_warm_pool_interval`` seconds the most demanded models (plus
+    any pinned in settings) that are not resident get preloaded, so a fallback
+    to Ollama doesn't pay a multi-second cold load.
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._demand: Deque[Tuple[float, str]] = deque(maxlen=2000)
+        self._task: Optional[asyncio.Task] = None
+        self.preloads = 0
+        self.preload_failures = 0
+
+    def record_demand(self, model: str):
+        self._demand.append((time.monotonic(), model))
+
+    def wanted(self) -> List[str]:
+        """Pinned models first, then the most demanded ones within the window"""
+        if settings.ollama_warm_pool_size <= 0:
+            return []
+        cutoff = time.monotonic() - settings.ollama_warm_pool_window
+        counts = Counter(model for seen_at, model in self._demand if seen_at >= cutoff)
+        wanted = list(settings.ollama_warm_pool_models)
+        for model, _ in counts.most_common():
+            if model not in wanted:
+                wanted.append(model)
+        # Never try to load something that isn't pulled
+        wanted = [model for model in wanted if self.provider.inventory.contains(model) is not False]
+        return wanted[:settings.ollama_warm_pool_size]
+
+    async def preload(self, model: str) -> bool:
+        """Load a model without generating anything (an empty /api/generate call)"""
+        try:
+            response = await self.provider.client.post(
+                f"{self.provider.base_url}/api/generate",
+                json={"model": model, "keep_alive": settings.ollama_keep_alive},
+                timeout=self.provider.timeout
+            )
+            if response.status_code != 200:
+                raise Exception(f"Ollama API error: {response.status_code}")
+            self.provider.inventory.mark_resident(model)
+            self.preloads += 1
+            print(f"DEBUG: Warm pool preloaded {model}")
+            return True
+        except Exception as e:
+            self.preload_failures += 1
+            print(f"DEBUG: Warm pool preload of {model} failed: {e}")
+            return False
+
+    async def warm(self):
+        # One at a time: parallel loads would just fight over the same GPU memory
+        for model in self.wanted():
+            if not self.provider.inventory.is_resident(model):
+                await self.preload(model)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(settings.ollama_warm_pool_interval)
+            await self.warm()
+
+    def start(self):
+        if settings.ollama_warm_pool_size > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def snapshot(self) -> dict:
+        return {
+            "wanted": self.wanted(),
+            "preloads": self.preloads,
+            "preload_failures": self.preload_failures
+        }
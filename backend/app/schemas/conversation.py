@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+
+class ConversationTurnResponse(BaseModel):
+    position: int
+    role: str
+    content: str
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ConversationSummary(BaseModel):
+    session_id: str
+    turn_count: int = 0
+    summarized_turns: int = 0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ConversationResponse(ConversationSummary):
+    summary: Optional[str] = None
+    turns: List[ConversationTurnResponse] = []
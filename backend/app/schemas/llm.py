@@ -1,5 +1,17 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, PrivateAttr
+from typing import Literal, NamedTuple, Optional, List
+
+
+class ChatTurn(BaseModel):
+    role: Literal["system", "user", "assistant"]
+    content: str
+
+
+class ConversationRef(NamedTuple):
+    """Where a request sits in a server-side conversation"""
+    key: str  # Unique across users
+    turns: int  # Turns recorded before this request
+    last_answer: Optional[str]  # Digest of the last recorded assistant answer
 
 
 class GenerateRequest(BaseModel):
@@ -7,6 +19,18 @@ class GenerateRequest(BaseModel):
     model: Optional[str] = None  # If None, use auto-routing
     max_tokens: Optional[int] = 1000
     temperature: Optional[float] = 0.7
+    hedge: Optional[bool] = None  # Race the next fallback candidate if the first is slow (None = server default)
+    cache: Optional[bool] = None  # Response cache: None = only low-temperature requests, True = opt in, False = bypass
+    semantic_cache: bool = False  # Also accept a cached answer to a sufficiently similar earlier prompt of yours
+    session_id: Optional[str] = None  # Continue a server-side conversation (see /conversations)
+    # Earlier turns sent ahead of the prompt; filled from the conversation store when session_id is set
+    history: Optional[List[ChatTurn]] = None
+    # Set by the conversation store only - clients can't point a request at someone else's state
+    _conversation: Optional[ConversationRef] = PrivateAttr(default=None)
+
+    @property
+    def conversation(self) -> Optional[ConversationRef]:
+        return self._conversation
 
 
 class GenerateResponse(BaseModel):
@@ -15,6 +39,24 @@ class GenerateResponse(BaseModel):
     provider: str
     latency_ms: float
     tokens_used: Optional[int] = None
+    cached: bool = False  # Served from the response cache
+    cache_similarity: Optional[float] = None  # Set on semantic cache hits (cosine similarity to the cached prompt)
+
+
+class BatchGenerateRequest(BaseModel):
+    requests: List[GenerateRequest]
+    stream: bool = False  # Stream NDJSON results as they complete instead of one ordered response
+
+
+class BatchItemResult(BaseModel):
+    index: int  # Position in the submitted batch
+    status: str  # success, failed, timeout or cancelled
+    response: Optional[GenerateResponse] = None
+    error: Optional[str] = None
+
+
+class BatchGenerateResponse(BaseModel):
+    results: List[BatchItemResult]  # In input order
 
 
 class ImageGenerateRequest(BaseModel):
@@ -58,6 +100,10 @@ class ModelsResponse(BaseModel):
 
 class TitleGenerateRequest(BaseModel):
     messages: List[dict]  # List of messages with role and content
+    high_quality: bool = False  # Ask an LLM for the title even when providers are busy
+    session_id: Optional[str] = None
+    # Return the extracted title at once; the LLM title is fetched later via GET /llm/generate-title/{session_id}
+    background: bool = False
 
 
 class TitleGenerateResponse(BaseModel):
@@ -65,6 +111,7 @@ class TitleGenerateResponse(BaseModel):
     model: str
     provider: str
     latency_ms: float
+    pending: bool = False  # A better title is still being generated in the background
 
 
 
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Dict, Literal, Optional
+
+
+class RoutingPolicyUpdate(BaseModel):
+    preference: Optional[Literal["speed", "balanced", "accuracy"]] = None
+    enabled_providers: Optional[Dict[Literal["groq", "huggingface", "ollama"], bool]] = None
+
+
+class RoutingPolicyResponse(BaseModel):
+    user_id: int
+    preference: str = "balanced"
+    enabled_providers: Dict[str, bool] = {}
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,198 @@
+import asyncio
+import time
+import httpx
+from collections import deque
+from typing import Dict, Optional, Tuple
+from ..core.config import settings
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+    pass
+
+
+def is_unreachable(error: BaseException) -> bool:
+    """Whether the upstream never answered: a transport error or timeout anywhere in the exception chain"""
+    while error is not None:
+        if isinstance(error, (httpx.TransportError, asyncio.TimeoutError)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class CircuitBreaker:
+    """Closed / open / half-open circuit breaker for one (provider, model)"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        self.state = self.CLOSED
+        # Rolling window of (failed, slow) outcomes
+        self.outcomes = deque(maxlen=settings.breaker_window_size)
+        self.opened_at: Optional[float] = None
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+        self.times_opened = 0
+        self.last_error: Optional[str] = None
+
+    def _open(self, reason: str):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+        self.times_opened += 1
+        print(f"DEBUG: Circuit opened for {self.model} on {self.provider}: {reason}")
+
+    def _close(self):
+        self.state = self.CLOSED
+        self.opened_at = None
+        self.outcomes.clear()
+        print(f"DEBUG: Circuit closed for {self.model} on {self.provider}")
+
+    def allow_request(self) -> bool:
+        """Whether a call may go through (fails fast while open, admits timed probes when half-open)"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < settings.breaker_open_seconds:
+                return False
+            self.state = self.HALF_OPEN
+            self.probes_in_flight = 0
+            self.probe_successes = 0
+
+        if self.state == self.HALF_OPEN:
+            if self.probes_in_flight >= settings.breaker_half_open_max_calls:
+                return False
+            self.probes_in_flight += 1
+
+        return True
+
+    def release(self):
+        """A call admitted by allow_request ended without an outcome (e.g. it was cancelled)"""
+        if self.state == self.HALF_OPEN and self.probes_in_flight > 0:
+            self.probes_in_flight -= 1
+
+    def record_success(self, latency_ms: float):
+        slow = latency_ms >= settings.breaker_slow_call_ms
+
+        if self.state == self.HALF_OPEN:
+            self.probes_in_flight = max(0, self.probes_in_flight - 1)
+            if slow:
+                self._open(f"slow probe ({latency_ms:.0f} ms)")
+                return
+            self.probe_successes += 1
+            if self.probe_successes >= settings.breaker_half_open_max_calls:
+                self._close()
+            return
+
+        self.outcomes.append((False, slow))
+        self._evaluate()
+
+    def record_failure(self, error: Exception, latency_ms: Optional[float] = None):
+        self.last_error = str(error)
+
+        if self.state == self.HALF_OPEN:
+            self._open("probe failed")
+            return
+
+        if self.state == self.CLOSED:
+            # Only calls cut off by a timeout know how long they took
+            slow = latency_ms is not None and latency_ms >= settings.breaker_slow_call_ms
+            self.outcomes.append((True, slow))
+            self._evaluate()
+
+    def _evaluate(self):
+        if len(self.outcomes) < settings.breaker_min_calls:
+            return
+        failure_rate = sum(1 for failed, _ in self.outcomes if failed) / len(self.outcomes)
+        slow_rate = sum(1 for _, slow in self.outcomes if slow) / len(self.outcomes)
+        if failure_rate >= settings.breaker_failure_rate_threshold:
+            self._open(f"failure rate {failure_rate:.0%}")
+        elif slow_rate >= settings.breaker_slow_call_rate_threshold:
+            self._open(f"slow call rate {slow_rate:.0%}")
+
+    def snapshot(self) -> dict:
+        failures = sum(1 for failed, _ in self.outcomes if failed)
+        retry_in = None
+        if self.state == self.OPEN:
+            retry_in = max(0.0, settings.breaker_open_seconds - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "calls": len(self.outcomes),
+            "failure_rate": round(failures / len(self.outcomes), 3) if self.outcomes else 0.0,
+            "times_opened": self.times_opened,
+            "retry_in_seconds": round(retry_in, 1) if retry_in is not None else None,
+            "last_error": self.last_error
+        }
+
+
+class CircuitBreakerRegistry:
+    """Circuit breakers keyed by (provider, model).
+
+    Each provider also has a provider-wide breaker (model "*") that only counts
+    failures where the upstream never answered (connection errors, timeouts),
+    so an unreachable host is skipped for every model at once.
+    """
+
+    PROVIDER_WIDE = "*"
+
+    def __init__(self):
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+    def get(self, provider: str, model: str) -> CircuitBreaker:
+        key = (provider, model)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(provider, model)
+        return breaker
+
+    def is_open(self, provider: str, model: str) -> bool:
+        """Cheap check for routing: open and still inside the open period"""
+        for key in ((provider, self.PROVIDER_WIDE), (provider, model)):
+            breaker = self._breakers.get(key)
+            if breaker and breaker.state == CircuitBreaker.OPEN and \
+                    time.monotonic() - breaker.opened_at < settings.breaker_open_seconds:
+                return True
+        return False
+
+    def allow(self, provider: str, model: str) -> bool:
+        provider_breaker = self.get(provider, self.PROVIDER_WIDE)
+        if not provider_breaker.allow_request():
+            return False
+        if not self.get(provider, model).allow_request():
+            provider_breaker.release()
+            return False
+        return True
+
+    def release(self, provider: str, model: str):
+        self.get(provider, self.PROVIDER_WIDE).release()
+        self.get(provider, model).release()
+
+    def record_success(self, provider: str, model: str, latency_ms: float):
+        self.get(provider, self.PROVIDER_WIDE).record_success(0.0)
+        self.get(provider, model).record_success(latency_ms)
+
+    def record_failure(self, provider: str, model: str, error: Exception, latency_ms: Optional[float] = None):
+        status_code = getattr(error, "status_code", None)
+        if status_code == 429:
+            # Throttling is handled by the rate-limit budget, not a sign the model is broken
+            self.release(provider, model)
+            return
+        if is_unreachable(error):
+            self.get(provider, self.PROVIDER_WIDE).record_failure(error)
+        elif status_code is not None:
+            # The host answered, so it is reachable
+            self.get(provider, self.PROVIDER_WIDE).record_success(0.0)
+        else:
+            # A bad model name, malformed body or similar says nothing about the host
+            self.get(provider, self.PROVIDER_WIDE).release()
+        self.get(provider, model).record_failure(error, latency_ms)
+
+    def snapshot(self, provider: str) -> dict:
+        return {
+            model: breaker.snapshot()
+            for (name, model), breaker in self._breakers.items()
+            if name == provider
+        }
@@ -0,0 +1,124 @@
+import asyncio
+import re
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from ..core.config import settings
+
+_TOKEN = re.compile(r"\w+")
+_LITERAL_ALTERNATION = re.compile(r"^\\b\((.*)\)\\b$")
+_REGEX_SYNTAX = set(".^$*+?{}[]|()\\")
+
+# Every image_generation pattern needs one of these as a whole word, so prompts
+# without any of them score 0 for images without running those regexes.
+IMAGE_TRIGGER_WORDS = frozenset({
+    "image", "picture", "photo", "drawing", "painting", "artwork", "visual",
+    "draw", "paint", "sketch", "illustrate", "art"
+})
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def _literal_alternatives(pattern: str) -> Optional[List[str]]:
+    """Alternatives of a ``\\b(a|b c|c\\+\\+)\\b`` pattern as plain strings, None for anything else"""
+    match = _LITERAL_ALTERNATION.match(pattern)
+    if not match:
+        return None
+    alternatives = []
+    for alternative in match.group(1).split("|"):
+        literal = re.sub(r"\\(.)", r"\1", alternative)
+        unescaped = re.sub(r"\\.", "", alternative)
+        if any(char in _REGEX_SYNTAX for char in unescaped) or not literal or not _is_word_char(literal[0]):
+            return None
+        alternatives.append(literal)
+    return alternatives
+
+
+class TaskClassifier:
+    """Precompiled, single-pass version of the router's pattern scoring.
+
+    Scoring is unchanged: every pattern contributes 2 points per
+    (non-overlapping) match plus 1 if it matched at all, and the best scoring
+    task wins (``casual`` when nothing matched). Word-list patterns like
+    ``\\b(code|program|...)\\b`` are indexed by their first word, so the prompt
+    is tokenised once and each token is a dict lookup instead of ~25 regex
+    scans. Other patterns run as precompiled regexes, gated by trigger words.
+    """
+
+    def __init__(self, patterns: Dict[str, List[str]], triggers: Optional[Dict[str, FrozenSet[str]]] = None):
+        self.tasks = list(patterns)
+        self.triggers = triggers or {}
+        # first word -> [(pattern slot, alternative order, literal)], in alternative order
+        self._by_first_word: Dict[str, List[Tuple[int, int, str]]] = {}
+        self._slot_task: List[str] = []
+        self._regexes: List[Tuple[str, re.Pattern]] = []
+
+        for task, task_patterns in patterns.items():
+            for pattern in task_patterns:
+                alternatives = _literal_alternatives(pattern)
+                if alternatives is None:
+                    self._regexes.append((task, re.compile(pattern)))
+                    continue
+                slot = len(self._slot_task)
+                self._slot_task.append(task)
+                for order, literal in enumerate(alternatives):
+                    first_word = _TOKEN.match(literal).group(0)
+                    self._by_first_word.setdefault(first_word, []).append((slot, order, literal))
+
+    def _count_matches(self, text: str) -> Tuple[List[int], set]:
+        """Non-overlapping match count per word-list pattern, plus the set of tokens seen"""
+        counts = [0] * len(self._slot_task)
+        # End of the last match per pattern - findall never overlaps matches of one pattern
+        match_end = [0] * len(self._slot_task)
+        seen = set()
+        length = len(text)
+
+        for token in _TOKEN.finditer(text):
+            word = token.group(0)
+            seen.add(word)
+            entries = self._by_first_word.get(word)
+            if not entries:
+                continue
+            start = token.start()
+            matched_slots = set()
+            for slot, _, literal in entries:
+                if slot in matched_slots or start < match_end[slot]:
+                    continue
+                end = start + len(literal)
+                if not text.startswith(literal, start):
+                    continue
+                # Trailing \b: word-ness must change at the end of the match
+                if _is_word_char(literal[-1]) == (end < length and _is_word_char(text[end])):
+                    continue
+                # Entries are in alternative order, so the first hit is the one re picks
+                matched_slots.add(slot)
+                counts[slot] += 1
+                match_end[slot] = end
+        return counts, seen
+
+    def scores(self, prompt: str) -> Dict[str, int]:
+        text = prompt.lower()[:settings.classifier_max_chars]
+        counts, seen = self._count_matches(text)
+
+        scores = {task: 0 for task in self.tasks}
+        for slot, matches in enumerate(counts):
+            scores[self._slot_task[slot]] += matches * 2 + (1 if matches else 0)
+
+        for task, regex in self._regexes:
+            trigger_words = self.triggers.get(task)
+            if trigger_words is not None and trigger_words.isdisjoint(seen):
+                continue
+            matches = len(regex.findall(text))
+            scores[task] += matches * 2 + (1 if matches else 0)
+        return scores
+
+    def classify(self, prompt: str) -> str:
+        """Classify the task type based on prompt content"""
+        best_task, best_score = max(self.scores(prompt).items(), key=lambda x: x[1])
+        return best_task if best_score > 0 else "casual"
+
+    async def classify_async(self, prompt: str) -> str:
+        """Classify off the event loop when the prompt is long enough to matter"""
+        if len(prompt) > settings.classifier_thread_threshold:
+            return await asyncio.to_thread(self.classify, prompt)
+        return self.classify(prompt)
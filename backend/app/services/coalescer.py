@@ -0,0 +1,123 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    """One shared upstream call and the number of callers still waiting on it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _StreamFlight:
+    """One shared upstream stream, buffered so every subscriber sees every event from the start"""
+
+    def __init__(self, source: AsyncIterator[dict]):
+        self.events: List[dict] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(self._pump(source))
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _pump(self, source: AsyncIterator[dict]):
+        try:
+            async for event in source:
+                self.events.append(event)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError("Shared stream cancelled")
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            await source.aclose()
+            self.done = True
+            self._notify()
+
+    async def subscribe(self) -> AsyncIterator[dict]:
+        index = 0
+        while True:
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class Coalescer:
+    """Single-flight for identical in-flight generations.
+
+    The first caller for a key starts the upstream work; identical callers that
+    arrive while it is running await the same task (or subscribe to the same
+    token stream) instead of starting their own. Waiters are reference-counted:
+    a caller that goes away only detaches itself, and the upstream call is
+    cancelled once the last waiter has gone.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _StreamFlight] = {}
+        self.stats = {"leaders": 0, "coalesced": 0, "stream_leaders": 0, "stream_coalesced": 0, "abandoned": 0}
+
+    def _forget(self, registry: dict, key: str, flight):
+        if registry.get(key) is flight:
+            del registry[key]
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """Result of ``factory()``, shared with every concurrent caller using the same key"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(self._flights, key, flight))
+            self.stats["leaders"] += 1
+        else:
+            self.stats["coalesced"] += 1
+
+        flight.waiters += 1
+        try:
+            # shield: cancelling one waiter must not cancel the call the others are waiting on
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is left to read the result; new callers start a fresh flight
+                self._forget(self._flights, key, flight)
+                flight.task.cancel()
+                self.stats["abandoned"] += 1
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[dict]]) -> AsyncIterator[dict]:
+        """Events of ``factory()``, fanned out to every concurrent subscriber using the same key"""
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = _StreamFlight(factory())
+            self._streams[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(self._streams, key, flight))
+            self.stats["stream_leaders"] += 1
+        else:
+            self.stats["stream_coalesced"] += 1
+
+        flight.subscribers += 1
+        try:
+            async for event in flight.subscribe():
+                yield event
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.task.done():
+                self._forget(self._streams, key, flight)
+                flight.task.cancel()
+                self.stats["abandoned"] += 1
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "in_flight": len(self._flights), "streams_in_flight": len(self._streams)}
@@ -0,0 +1,155 @@
+import asyncio
+import httpx
+from collections import deque
+from typing import Deque, Dict, Optional
+from ..core.config import settings
+from .deadline import DeadlineExceeded
+
+
+class LimiterSpillover(Exception):
+    """Waiting for a slot would exceed the caller's budget - try the next candidate instead"""
+    pass
+
+
+def is_overload_signal(error: BaseException) -> bool:
+    """429/503 responses and upstream timeouts mean the provider is saturated"""
+    if getattr(error, "status_code", None) in (429, 503):
+        return True
+    cause = error.__cause__ or error.__context__
+    return isinstance(error, httpx.TimeoutException) or isinstance(cause, httpx.TimeoutException)
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limiter with a latency gradient.
+
+    The in-flight window grows additively while latency stays within
+    ``latency_tolerance`` of the no-load latency, and shrinks multiplicatively
+    on overload signals (429/503/timeouts) or when latency climbs. Excess
+    callers wait in a FIFO queue with a bounded wait.
+    """
+
+    def __init__(self, key: str, initial_limit: float, max_limit: float):
+        self.key = key
+        self.limit = float(initial_limit)
+        self.min_limit = float(settings.limiter_min_limit)
+        self.max_limit = float(max_limit)
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._recent_latencies: Deque[float] = deque(maxlen=50)
+        self.avg_latency_ms: Optional[float] = None
+        self.spilled = 0
+        self.overloads = 0
+
+    @property
+    def no_load_latency_ms(self) -> Optional[float]:
+        return min(self._recent_latencies) if self._recent_latencies else None
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def has_spare_capacity(self, ratio: float = 1.0) -> bool:
+        """Whether a new call would start immediately (``ratio`` < 1 demands extra headroom)"""
+        return not self._waiters and self.in_flight < self.limit * ratio
+
+    def estimated_wait_ms(self) -> float:
+        """Rough queueing delay for a new caller: queue depth / window * typical latency"""
+        if self.in_flight < self.limit and not self._waiters:
+            return 0.0
+        typical = self.avg_latency_ms or settings.limiter_default_latency_ms
+        return (len(self._waiters) + 1) / max(self.limit, 1.0) * typical
+
+    async def acquire(self, max_wait_ms: float):
+        """Take a slot, queueing for at most ``max_wait_ms``; raise LimiterSpillover otherwise"""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+
+        estimated = self.estimated_wait_ms()
+        if estimated > max_wait_ms:
+            self.spilled += 1
+            raise LimiterSpillover(f"{self.key} saturated ({self.in_flight}/{self.limit:.1f} in flight, ~{estimated:.0f} ms wait)")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), max_wait_ms / 1000)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self.spilled += 1
+            raise LimiterSpillover(f"{self.key} queue wait exceeded {max_wait_ms:.0f} ms")
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: asyncio.Future):
+        if waiter.done() and not waiter.cancelled():
+            # The slot was handed over just as we gave up - pass it on
+            self.release_slot()
+        else:
+            waiter.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def release_slot(self):
+        """Free a slot without feeding the control loop"""
+        self.in_flight -= 1
+        self._wake()
+
+    def release(self, latency_ms: Optional[float] = None, error: Optional[BaseException] = None):
+        """Free a slot and adapt the window from the call's outcome"""
+        if error is not None and is_overload_signal(error):
+            self.overloads += 1
+            self.limit = max(self.min_limit, self.limit * settings.limiter_backoff_ratio)
+        elif latency_ms is not None and (error is None or isinstance(error, DeadlineExceeded)):
+            # A call killed by the request deadline took at least latency_ms - still a latency signal
+            self._recent_latencies.append(latency_ms)
+            self.avg_latency_ms = latency_ms if self.avg_latency_ms is None else 0.8 * self.avg_latency_ms + 0.2 * latency_ms
+            if latency_ms > self.no_load_latency_ms * settings.limiter_latency_tolerance:
+                # Latency gradient says we are queueing upstream - back off gently
+                self.limit = max(self.min_limit, self.limit * 0.9)
+            elif error is None and self.in_flight >= self.limit / 2:
+                # Window is actually in use and latency is fine - grow by ~1 per window
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self.release_slot()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "avg_latency_ms": round(self.avg_latency_ms, 1) if self.avg_latency_ms is not None else None,
+            "no_load_latency_ms": self.no_load_latency_ms,
+            "spilled": self.spilled,
+            "overloads": self.overloads
+        }
+
+
+class ConcurrencyLimiterRegistry:
+    """One adaptive limiter per upstream (per model for local Ollama)"""
+
+    def __init__(self):
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+
+    def get(self, key: str, is_local: bool = False) -> AdaptiveLimiter:
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            if is_local:
+                limiter = AdaptiveLimiter(key, settings.limiter_local_initial_limit, settings.limiter_local_max_limit)
+            else:
+                limiter = AdaptiveLimiter(key, settings.limiter_initial_limit, settings.limiter_max_limit)
+            self._limiters[key] = limiter
+        return limiter
+
+    def snapshot(self) -> dict:
+        return {key: limiter.snapshot() for key, limiter in self._limiters.items()}
@@ -0,0 +1,273 @@
+import asyncio
+from typing import List, Optional, Tuple
+from sqlalchemy import select, update, delete, desc
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..models.conversation import Conversation, ConversationTurn
+from ..schemas.llm import ChatTurn, ConversationRef, GenerateRequest
+from ..providers.ollama_context import answer_digest
+from .routing_policy import CompiledPolicy, DEFAULT_POLICY
+
+
+def estimate_turn_tokens(content: str) -> int:
+    """~4 characters per token plus a few for the role markers"""
+    return len(content) // 4 + 4
+
+
+class ConversationStore:
+    """Server-side chat history, sent upstream as a bounded window.
+
+    Each turn gets the rolling summary (as a system turn) plus the newest turns
+    that fit ``conversation_window_tokens``, so the payload stays the same size
+    however long the chat gets. Once the turns not yet summarized pass
+    ``conversation_summary_trigger_tokens``, the oldest of them are folded into
+    the summary by a background LLM call. That call only runs while the router
+    has spare capacity; if it is skipped, older turns drop out of the window
+    until a later turn gets the summary caught up.
+    """
+
+    def __init__(self):
+        self.router = None
+        self._summarizing: set = set()
+        self._tasks: set = set()
+        self.stats = {"windows": 0, "turns_appended": 0, "summaries": 0, "summaries_deferred": 0, "summary_failures": 0}
+
+    def bind_router(self, router):
+        self.router = router
+
+    @staticmethod
+    async def get(db: AsyncSession, user_id: int, session_id: str) -> Optional[Conversation]:
+        result = await db.execute(
+            select(Conversation).where(Conversation.user_id == user_id, Conversation.session_id == session_id)
+        )
+        return result.scalar_one_or_none()
+
+    async def get_or_create(self, db: AsyncSession, user_id: int, session_id: str) -> Conversation:
+        conversation = await self.get(db, user_id, session_id)
+        if conversation is not None:
+            return conversation
+        conversation = Conversation(user_id=user_id, session_id=session_id, summarized_turns=0, turn_count=0)
+        db.add(conversation)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # A concurrent first turn created it
+            await db.rollback()
+            return await self.get(db, user_id, session_id)
+        await db.refresh(conversation)
+        return conversation
+
+    @staticmethod
+    async def list_for_user(db: AsyncSession, user_id: int, limit: int = 100) -> List[Conversation]:
+        result = await db.execute(
+            select(Conversation)
+            .where(Conversation.user_id == user_id)
+            .order_by(desc(Conversation.id))
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def turns(db: AsyncSession, conversation: Conversation, limit: int) -> List[ConversationTurn]:
+        """The newest ``limit`` turns, oldest first"""
+        result = await db.execute(
+            select(ConversationTurn)
+            .where(ConversationTurn.conversation_id == conversation.id)
+            .order_by(desc(ConversationTurn.position), desc(ConversationTurn.id))
+            .limit(limit)
+        )
+        return list(reversed(result.scalars().all()))
+
+    @staticmethod
+    async def delete(db: AsyncSession, conversation: Conversation):
+        await db.execute(delete(ConversationTurn).where(ConversationTurn.conversation_id == conversation.id))
+        await db.delete(conversation)
+        await db.commit()
+
+    async def window(self, db: AsyncSession, conversation: Conversation) -> Tuple[List[ChatTurn], Optional[str]]:
+        """(summary plus the newest unsummarized turns that fit the token budget oldest first, last answer)"""
+        budget = settings.conversation_window_tokens
+        history: List[ChatTurn] = []
+        if conversation.summary:
+            summary = f"Summary of the earlier conversation:\n{conversation.summary}"
+            budget -= estimate_turn_tokens(summary)
+            history.append(ChatTurn(role="system", content=summary))
+
+        result = await db.execute(
+            select(ConversationTurn)
+            .where(
+                ConversationTurn.conversation_id == conversation.id,
+                ConversationTurn.position >= conversation.summarized_turns
+            )
+            .order_by(desc(ConversationTurn.position), desc(ConversationTurn.id))
+            .limit(settings.conversation_window_max_turns)
+        )
+        rows = result.scalars().all()
+        last_answer = rows[0].content if rows and rows[0].role == "assistant" else None
+        recent = []
+        for turn in rows:
+            if turn.tokens > budget:
+                break
+            budget -= turn.tokens
+            recent.append(ChatTurn(role=turn.role, content=turn.content))
+        # Start on a whole exchange rather than an answer whose question was cut off
+        if recent and recent[-1].role == "assistant":
+            recent.pop()
+        self.stats["windows"] += 1
+        return history + recent[::-1], last_answer
+
+    async def prepare(self, db: AsyncSession, user_id: int, request: GenerateRequest) -> GenerateRequest:
+        """The request with its conversation window as ``history`` (unchanged without a session_id)"""
+        if not request.session_id:
+            return request
+        conversation = await self.get(db, user_id, request.session_id)
+        history, last_answer = await self.window(db, conversation) if conversation is not None else ([], None)
+        prepared = request.model_copy(update={"history": history or None})
+        # Lets the Ollama provider check its cached KV context still ends where this conversation does
+        prepared._conversation = ConversationRef(
+            key=f"{user_id}:{request.session_id}",
+            turns=conversation.turn_count if conversation is not None else 0,
+            last_answer=answer_digest(last_answer) if last_answer is not None else None
+        )
+        return prepared
+
+    async def append(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        session_id: str,
+        prompt: str,
+        response: str,
+        policy: Optional[CompiledPolicy] = None
+    ):
+        """Record a finished exchange, then fold old turns into the summary in the background if needed"""
+        conversation = await self.get_or_create(db, user_id, session_id)
+        # Reserve two positions atomically so concurrent turns never share one
+        result = await db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation.id)
+            .values(turn_count=Conversation.turn_count + 2)
+            .returning(Conversation.turn_count)
+        )
+        position = result.scalar_one() - 2
+        db.add_all([
+            ConversationTurn(conversation_id=conversation.id, position=position, role="user",
+                             content=prompt, tokens=estimate_turn_tokens(prompt)),
+            ConversationTurn(conversation_id=conversation.id, position=position + 1, role="assistant",
+                             content=response, tokens=estimate_turn_tokens(response))
+        ])
+        await db.commit()
+        self.stats["turns_appended"] += 2
+        self.schedule_summary(conversation.id, policy)
+
+    def schedule_summary(self, conversation_id: int, policy: Optional[CompiledPolicy] = None):
+        if self.router is None or conversation_id in self._summarizing:
+            return
+        self._summarizing.add(conversation_id)
+        task = asyncio.create_task(self._summarize(conversation_id, policy or DEFAULT_POLICY))
+        self._tasks.add(task)
+
+        def done(finished: asyncio.Task):
+            self._tasks.discard(finished)
+            self._summarizing.discard(conversation_id)
+
+        task.add_done_callback(done)
+
+    @staticmethod
+    def _turns_to_fold(turns: List[ConversationTurn]) -> List[ConversationTurn]:
+        """Oldest turns to summarize so the rest fit half the window (the last exchange always stays verbatim)"""
+        if sum(turn.tokens for turn in turns) <= settings.conversation_summary_trigger_tokens:
+            return []
+        kept = 0
+        split = len(turns)
+        while split > 0:
+            tokens = turns[split - 1].tokens
+            if len(turns) - split >= 2 and kept + tokens > settings.conversation_window_tokens // 2:
+                break
+            kept += tokens
+            split -= 1
+        # Bound the summary prompt; anything left over is folded on a later turn
+        folded, total = [], 0
+        for turn in turns[:split]:
+            if folded and total + turn.tokens > settings.conversation_window_tokens:
+                break
+            folded.append(turn)
+            total += turn.tokens
+        # Fold whole exchanges, so the window never opens with an orphaned answer
+        while folded and folded[-1].role != "assistant":
+            folded.pop()
+        return folded
+
+    async def _summarize(self, conversation_id: int, policy: CompiledPolicy):
+        try:
+            async with AsyncSessionLocal() as db:
+                conversation = await db.get(Conversation, conversation_id)
+                if conversation is None:
+                    return
+                result = await db.execute(
+                    select(ConversationTurn)
+                    .where(
+                        ConversationTurn.conversation_id == conversation_id,
+                        ConversationTurn.position >= conversation.summarized_turns
+                    )
+                    .order_by(ConversationTurn.position, ConversationTurn.id)
+                )
+                fold = self._turns_to_fold(result.scalars().all())
+                if not fold:
+                    return
+                # Summaries are background work: never compete with interactive turns for a slot
+                if not self.router.has_spare_capacity("summarization", policy, settings.conversation_summary_spare_ratio):
+                    self.stats["summaries_deferred"] += 1
+                    return
+
+                transcript = "\n".join(f"{turn.role.capitalize()}: {turn.content}" for turn in fold)
+                previous = conversation.summary or "(none)"
+                summary_request = GenerateRequest(
+                    prompt=f"""Update the running summary of a conversation with the new turns below. Keep every fact, name, number, decision and open question the assistant may need later. Write plain prose, at most {settings.conversation_summary_max_tokens // 2} words. Return only the summary.
+
+Current summary:
+{previous}
+
+New turns:
+{transcript}
+
+Updated summary:""",
+                    max_tokens=settings.conversation_summary_max_tokens,
+                    temperature=0.2,
+                    cache=False
+                )
+                response = await self.router.route_request(summary_request, policy)
+
+                # Only advance from the state we summarized (another worker may have got there first)
+                await db.execute(
+                    update(Conversation)
+                    .where(
+                        Conversation.id == conversation_id,
+                        Conversation.summarized_turns == conversation.summarized_turns
+                    )
+                    .values(summary=response.response.strip(), summarized_turns=fold[-1].position + 1)
+                )
+                await db.commit()
+                self.stats["summaries"] += 1
+                print(f"DEBUG: Folded {len(fold)} turns of conversation {conversation_id} into its summary")
+        except Exception as e:
+            self.stats["summary_failures"] += 1
+            print(f"DEBUG: Conversation summary failed for {conversation_id}: {e}")
+
+    async def stop(self):
+        tasks = [task for task in self._tasks if not task.done()]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "summaries_running": len(self._summarizing)}
+
+
+conversation_store = ConversationStore()
@@ -0,0 +1,79 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Optional, TypeVar
+import httpx
+from ..core.config import settings
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    """The request's overall time budget is spent"""
+    pass
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Transient upstream failures worth another try: 5xx/408 answers and transport errors"""
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code == 408 or status_code >= 500
+    cause = error.__cause__ or error.__context__
+    return isinstance(error, httpx.TransportError) or isinstance(cause, httpx.TransportError)
+
+
+def resolve_budget_ms(header_value: Optional[str], plan: Optional[str] = None) -> float:
+    """Budget from the X-Request-Deadline-Ms header, else the plan's default, capped at deadline_max_ms"""
+    budget = settings.deadline_plan_defaults_ms.get(plan or "", settings.deadline_default_ms)
+    if header_value:
+        try:
+            requested = float(header_value)
+            if requested > 0:
+                budget = requested
+        except ValueError:
+            pass
+    return min(budget, settings.deadline_max_ms)
+
+
+class Deadline:
+    """Total time budget for one request, shared by all of its attempts"""
+
+    def __init__(self, budget_ms: float):
+        self.budget_ms = budget_ms
+        self.expires_at = time.monotonic() + budget_ms / 1000
+
+    @property
+    def remaining(self) -> float:
+        """Seconds left (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def remaining_ms(self) -> float:
+        return self.remaining * 1000
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def error(self) -> DeadlineExceeded:
+        return DeadlineExceeded(f"Request deadline of {self.budget_ms:.0f} ms exceeded")
+
+    def check(self):
+        if self.expired:
+            raise self.error()
+
+    async def run(self, awaitable: Awaitable[T]) -> T:
+        """Await with the remaining budget as timeout (the awaitable is cancelled on expiry)"""
+        try:
+            return await asyncio.wait_for(awaitable, self.remaining)
+        except asyncio.TimeoutError:
+            raise self.error() from None
+
+    async def backoff(self, attempt: int) -> bool:
+        """Sleep a full-jitter exponential backoff; False (without sleeping) if it wouldn't fit the budget"""
+        cap = min(settings.retry_backoff_max_ms, settings.retry_backoff_base_ms * 2 ** attempt)
+        delay = random.uniform(0, cap) / 1000
+        if delay >= self.remaining:
+            return False
+        await asyncio.sleep(delay)
+        return True
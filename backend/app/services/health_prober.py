@@ -0,0 +1,123 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+from ..core.config import settings
+
+
+class ProbeStatus:
+    """Smoothed health of one upstream, updated by every probe"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.healthy: Optional[bool] = None  # None until the first probe finished
+        self.ewma_latency_ms: Optional[float] = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+        self.last_ok: Optional[float] = None
+        self.last_checked: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        if self.healthy is None:
+            return "unknown"
+        return "healthy" if self.healthy else "unhealthy"
+
+    def record(self, ok: bool, latency_ms: float, error: Optional[str] = None):
+        alpha = settings.health_ewma_alpha
+        self.last_checked = time.time()
+        self.error_rate = (1 - alpha) * self.error_rate + alpha * (0.0 if ok else 1.0)
+
+        if ok:
+            self.ewma_latency_ms = latency_ms if self.ewma_latency_ms is None else \
+                (1 - alpha) * self.ewma_latency_ms + alpha * latency_ms
+            self.last_ok = self.last_checked
+            self.last_error = None
+            self.consecutive_failures = 0
+            self.consecutive_successes += 1
+            if not self.healthy and self.consecutive_successes >= settings.health_healthy_threshold:
+                if self.healthy is False:
+                    print(f"DEBUG: Health prober revived {self.name}")
+                self.healthy = True
+        else:
+            self.last_error = error
+            self.consecutive_successes = 0
+            self.consecutive_failures += 1
+            if self.healthy is not False and (
+                    self.healthy is None or self.consecutive_failures >= settings.health_unhealthy_threshold):
+                print(f"DEBUG: Health prober demoted {self.name}: {error}")
+                self.healthy = False
+
+    def snapshot(self) -> dict:
+        return {
+            "status": self.state,
+            "latency_ms": round(self.ewma_latency_ms, 1) if self.ewma_latency_ms is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "last_ok": self.last_ok,
+            "last_checked": self.last_checked,
+            "last_error": self.last_error
+        }
+
+
+class HealthProber:
+    """Pings every registered upstream concurrently on an interval.
+
+    Health endpoints serve the cached statuses instead of calling upstreams,
+    and routing demotes unhealthy providers before user traffic hits them.
+    """
+
+    def __init__(self):
+        self._checks: Dict[str, Callable[[], Awaitable[bool]]] = {}
+        self.statuses: Dict[str, ProbeStatus] = {}
+        # Bumped whenever an upstream is demoted or revived
+        self.version = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, check: Callable[[], Awaitable[bool]]):
+        self._checks[name] = check
+        self.statuses.setdefault(name, ProbeStatus(name))
+
+    def status(self, name: str) -> ProbeStatus:
+        return self.statuses.setdefault(name, ProbeStatus(name))
+
+    def is_demoted(self, name: str) -> bool:
+        status = self.statuses.get(name)
+        return status is not None and status.healthy is False
+
+    async def _probe(self, name: str, check: Callable[[], Awaitable[bool]]):
+        start_time = time.time()
+        try:
+            ok = await asyncio.wait_for(check(), settings.health_probe_timeout)
+            error = None if ok else "health check failed"
+        except asyncio.TimeoutError:
+            ok, error = False, f"timed out after {settings.health_probe_timeout}s"
+        except Exception as e:
+            ok, error = False, str(e)
+        was_demoted = self.is_demoted(name)
+        self.statuses[name].record(ok, (time.time() - start_time) * 1000, error)
+        if self.is_demoted(name) != was_demoted:
+            self.version += 1
+
+    async def probe_all(self):
+        await asyncio.gather(*(self._probe(name, check) for name, check in self._checks.items()))
+
+    async def _loop(self):
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(settings.health_probe_interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def snapshot(self) -> dict:
+        return {name: status.snapshot() for name, status in self.statuses.items()}
@@ -5,6 +5,13 @@ import io
 from typing import List
 from ..schemas.llm import ImageGenerateRequest, ImageGenerateResponse
 from ..core.config import settings
+from ..core.http_clients import http_clients
+from .keyword_matcher import KeywordMatcher
+
+QUALITY_TERMS = KeywordMatcher([
+    "high quality", "detailed", "sharp focus", "professional",
+    "8k resolution", "masterpiece", "best quality", "ultra detailed"
+])
 
 
 class ImageGeneratorService:
@@ -24,6 +31,11 @@ class ImageGeneratorService:
         }
         
         self.is_available = bool(self.api_key)
+        self.client = http_clients.get("huggingface")
+    
+    def bind_http_client(self, client: httpx.AsyncClient):
+        """Inject the shared, pooled Hugging Face client"""
+        self.client = client
     
     async def generate_image(self, request: ImageGenerateRequest) -> ImageGenerateResponse:
         """Generate high-quality images using Hugging Face models"""
@@ -56,50 +68,43 @@ class ImageGeneratorService:
                 }
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/models/{model_name}",
-                    json=payload,
-                    headers=headers,
-                    timeout=120.0  # Longer timeout for image generation
+            response = await self.client.post(
+                f"{self.base_url}/models/{model_name}",
+                json=payload,
+                headers=headers,
+                timeout=http_clients.timeout("image_generation")  # Longer timeout for image generation
+            )
+            
+            if response.status_code == 200:
+                # Convert image bytes to base64
+                image_bytes = response.content
+                image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+                
+                latency = (time.time() - start_time) * 1000
+                
+                return ImageGenerateResponse(
+                    images=[f"data:image/png;base64,{image_base64}"],
+                    model=model_key,
+                    provider="huggingface",
+                    latency_ms=latency,
+                    prompt=request.prompt
                 )
+            else:
+                error_msg = response.text
+                try:
+                    error_json = response.json()
+                    error_msg = error_json.get("error", error_msg)
+                except:
+                    pass
+                raise Exception(f"Image generation failed: {error_msg}")
                 
-                if response.status_code == 200:
-                    # Convert image bytes to base64
-                    image_bytes = response.content
-                    image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-                    
-                    latency = (time.time() - start_time) * 1000
-                    
-                    return ImageGenerateResponse(
-                        images=[f"data:image/png;base64,{image_base64}"],
-                        model=model_key,
-                        provider="huggingface",
-                        latency_ms=latency,
-                        prompt=request.prompt
-                    )
-                else:
-                    error_msg = response.text
-                    try:
-                        error_json = response.json()
-                        error_msg = error_json.get("error", error_msg)
-                    except:
-                        pass
-                    raise Exception(f"Image generation failed: {error_msg}")
-                    
         except Exception as e:
             raise Exception(f"Image generation error: {str(e)}")
     
     def _enhance_prompt(self, prompt: str) -> str:
         """Enhance prompt for better image quality"""
-        quality_terms = [
-            "high quality", "detailed", "sharp focus", "professional",
-            "8k resolution", "masterpiece", "best quality", "ultra detailed"
-        ]
-        
         # Check if prompt already has quality terms
-        prompt_lower = prompt.lower()
-        has_quality_terms = any(term in prompt_lower for term in quality_terms)
+        has_quality_terms = QUALITY_TERMS.contains_any(prompt.lower())
         
         if not has_quality_terms:
             # Add quality enhancement
@@ -160,12 +165,11 @@ class ImageGeneratorService:
                 "Content-Type": "application/json"
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/models/stabilityai/stable-diffusion-xl-base-1.0",
-                    headers=headers,
-                    timeout=10.0
-                )
-                return response.status_code in [200, 503]  # 503 means model is loading
+            response = await self.client.get(
+                f"{self.base_url}/models/stabilityai/stable-diffusion-xl-base-1.0",
+                headers=headers,
+                timeout=settings.health_probe_timeout
+            )
+            return response.status_code in [200, 503]  # 503 means model is loading
         except:
             return False
\ No newline at end of file
@@ -0,0 +1,58 @@
+import re
+from typing import Iterable, List, Optional
+
+
+class KeywordMatcher:
+    """Matches a fixed set of keywords in one scan.
+
+    The keywords are compiled once into a trie (the goto function of an
+    Aho-Corasick automaton). The trie is emitted as a single prefix-factored
+    regex, so the C regex engine only follows trie edges from each position.
+    A miss costs about the same for 5 keywords or 500, and it runs far faster
+    than a pure-Python automaton or one ``in`` check per keyword.
+
+    ``whole_words=False`` keeps plain substring semantics (``keyword in text``).
+    With ``whole_words=True`` a match must start and end on a word boundary.
+    In both modes overlapping keywords resolve to the longest one at the
+    leftmost position.
+    """
+
+    def __init__(self, keywords: Iterable[str], whole_words: bool = False):
+        self.keywords = sorted(set(keyword for keyword in keywords if keyword))
+        self.whole_words = whole_words
+        if not self.keywords:
+            self._regex = None
+            return
+        trie: dict = {}
+        for keyword in self.keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[""] = {}  # end of a keyword
+        pattern = self._emit(trie)
+        self._regex = re.compile(rf"\b(?:{pattern})\b" if whole_words else pattern)
+
+    @classmethod
+    def _emit(cls, node: dict) -> str:
+        branches = [re.escape(char) + cls._emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A keyword ending here makes the rest optional; greedy, so the longest keyword wins
+        return f"(?:{body})?" if "" in node else body
+
+    def search(self, text: str) -> Optional[str]:
+        """Leftmost (then longest) keyword found in ``text``, or None"""
+        if self._regex is None:
+            return None
+        match = self._regex.search(text)
+        return match.group(0) if match else None
+
+    def contains_any(self, text: str) -> bool:
+        return self._regex is not None and self._regex.search(text) is not None
+
+    def find_all(self, text: str) -> List[str]:
+        """All non-overlapping keyword occurrences, left to right"""
+        if self._regex is None:
+            return []
+        return self._regex.findall(text)
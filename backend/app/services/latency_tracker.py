@@ -0,0 +1,39 @@
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+
+class LatencyTracker:
+    """Rolling window of observed latencies per (provider, model)"""
+
+    def __init__(self, window: int = 200, min_samples: int = 5):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[Tuple[str, str, str], Deque[float]] = {}
+
+    def record(self, provider: str, model: str, latency_ms: float, kind: str = "total"):
+        """Record a latency sample. ``kind`` is "total" for full completions or "ttft" for first token"""
+        key = (provider, model, kind)
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.window)
+        samples.append(latency_ms)
+
+    def percentile(self, provider: str, model: str, q: float, kind: str = "total") -> Optional[float]:
+        """Latency at quantile ``q`` (0-1), or None until enough samples were seen"""
+        samples = self._samples.get((provider, model, kind))
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        """p50/p95 per tracked (provider, model, kind)"""
+        snapshot = {}
+        for (provider, model, kind), samples in self._samples.items():
+            snapshot[f"{provider}/{model}/{kind}"] = {
+                "samples": len(samples),
+                "p50_ms": self.percentile(provider, model, 0.5, kind),
+                "p95_ms": self.percentile(provider, model, 0.95, kind)
+            }
+        return snapshot
@@ -0,0 +1,132 @@
+import asyncio
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Tuple
+from sqlalchemy import select
+from ..core.config import settings
+from ..models.request import Request
+
+
+class LatencySketch:
+    """Log-bucketed latency histogram (~5% relative error) that slowly forgets old samples"""
+
+    GAMMA = 1.1
+
+    def __init__(self, max_count: float = 500.0):
+        self.buckets: Dict[int, float] = {}
+        self.count = 0.0
+        self.max_count = max_count
+
+    def add(self, latency_ms: float):
+        index = math.ceil(math.log(max(latency_ms, 1.0), self.GAMMA))
+        self.buckets[index] = self.buckets.get(index, 0.0) + 1.0
+        self.count += 1.0
+        if self.count > self.max_count:
+            # Halve every bucket so recent behaviour dominates
+            self.buckets = {index: weight / 2 for index, weight in self.buckets.items() if weight >= 0.02}
+            self.count = sum(self.buckets.values())
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0.0
+        for index in sorted(self.buckets):
+            cumulative += self.buckets[index]
+            if cumulative >= target:
+                # Midpoint of the bucket (GAMMA^(i-1), GAMMA^i]
+                return 2 * self.GAMMA ** index / (self.GAMMA + 1)
+        return 2 * self.GAMMA ** max(self.buckets) / (self.GAMMA + 1)
+
+
+class ModelStats:
+    """Rolling latency and success statistics for one (provider, model, task)"""
+
+    def __init__(self):
+        self.ewma_latency_ms: Optional[float] = None
+        self.success_rate = 1.0
+        self.samples = 0
+        self.sketch = LatencySketch()
+
+    def record(self, latency_ms: Optional[float], success: bool):
+        alpha = settings.stats_ewma_alpha
+        self.samples += 1
+        self.success_rate = (1 - alpha) * self.success_rate + alpha * (1.0 if success else 0.0)
+        # Failures only carry a latency when the request deadline cut them off (a lower bound)
+        if latency_ms is not None:
+            self.ewma_latency_ms = latency_ms if self.ewma_latency_ms is None else \
+                (1 - alpha) * self.ewma_latency_ms + alpha * latency_ms
+            self.sketch.add(latency_ms)
+
+    def expected_latency_ms(self) -> Optional[float]:
+        """EWMA latency inflated by the failure rate (a failed call costs a fallback)"""
+        if self.ewma_latency_ms is None:
+            return None
+        return self.ewma_latency_ms / max(self.success_rate, settings.stats_min_success)
+
+    def snapshot(self) -> dict:
+        return {
+            "samples": self.samples,
+            "ewma_latency_ms": round(self.ewma_latency_ms, 1) if self.ewma_latency_ms is not None else None,
+            "success_rate": round(self.success_rate, 3),
+            "p50_ms": self.sketch.quantile(0.5),
+            "p95_ms": self.sketch.quantile(0.95)
+        }
+
+
+class ModelStatsRegistry:
+    """Live statistics per (provider, model, task type), plus a per-model aggregate ("*")"""
+
+    ANY_TASK = "*"
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str, str], ModelStats] = {}
+        # Bumped on every recorded outcome, so the router only re-ranks when something was learned
+        self.version = 0
+
+    def _get(self, key: Tuple[str, str, str]) -> ModelStats:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = ModelStats()
+        return stats
+
+    def record(self, provider: str, model: str, task_type: str, latency_ms: Optional[float], success: bool):
+        self._get((provider, model, task_type)).record(latency_ms, success)
+        self._get((provider, model, self.ANY_TASK)).record(latency_ms, success)
+        self.version += 1
+
+    def get(self, provider: str, model: str, task_type: str) -> Optional[ModelStats]:
+        """Task-specific stats once there are enough samples, else the model's aggregate"""
+        for key in ((provider, model, task_type), (provider, model, self.ANY_TASK)):
+            stats = self._stats.get(key)
+            if stats is not None and stats.samples >= settings.stats_min_samples:
+                return stats
+        return None
+
+    def expected_latency_ms(self, provider: str, model: str, task_type: str) -> Optional[float]:
+        stats = self.get(provider, model, task_type)
+        return stats.expected_latency_ms() if stats is not None else None
+
+    async def seed(self, db, classify: Callable[[str], str]) -> int:
+        """Warm the statistics from recent successful, uncached rows of the requests table"""
+        since = datetime.now(timezone.utc) - timedelta(hours=settings.stats_seed_hours)
+        result = await db.execute(
+            select(Request.provider, Request.model, Request.prompt, Request.latency_ms)
+            .where(
+                Request.status == "success",
+                Request.cached.is_(False),
+                Request.latency_ms.isnot(None),
+                Request.created_at >= since
+            )
+            .order_by(Request.created_at.desc())
+            .limit(settings.stats_seed_limit)
+        )
+        rows = list(reversed(result.all()))  # Oldest first so the EWMA ends on recent behaviour
+        # The table has no task column - classify the prompts again, off the event loop
+        task_types = await asyncio.to_thread(lambda: [classify(row.prompt[:2000]) for row in rows])
+        for row, task_type in zip(rows, task_types):
+            self.record(row.provider, row.model, task_type, row.latency_ms, True)
+        return len(rows)
+
+    def snapshot(self) -> dict:
+        return {f"{provider}/{model}/{task}": stats.snapshot() for (provider, model, task), stats in self._stats.items()}
@@ -0,0 +1,169 @@
+import hashlib
+import re
+import time
+from typing import Dict, Mapping, Optional
+from ..schemas.llm import GenerateRequest
+
+
+class RateLimitExceeded(Exception):
+    """The provider's remaining rate-limit budget can't cover this request"""
+    pass
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse rate-limit reset values ("2m59.56s", "7.66s", "250ms" or plain seconds) into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def estimate_tokens(request: GenerateRequest) -> int:
+    """Prompt and history tokens (~4 chars each) plus the completion budget"""
+    history = sum(len(turn.content) // 4 + 4 for turn in request.history or ())
+    return len(request.prompt) // 4 + history + (request.max_tokens or 1000)
+
+
+class TokenBucket:
+    """Continuously refilling bucket; capacity and refill rate can be re-synced at any time"""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.available = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def has(self, amount: float) -> bool:
+        self._refill()
+        return self.available >= amount
+
+    def take(self, amount: float):
+        self._refill()
+        self.available -= amount
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], reset_seconds: Optional[float]):
+        """Adopt the upstream's view: ``remaining`` now, full ``limit`` again after ``reset_seconds``"""
+        if limit is not None and limit > 0:
+            self.capacity = limit
+        if remaining is not None:
+            self.available = min(self.capacity, remaining)
+            self.updated_at = time.monotonic()
+            if reset_seconds:
+                self.refill_per_second = max(0.0, self.capacity - remaining) / reset_seconds
+
+
+class RateLimitBudget:
+    """Request and token buckets for one API key, re-synced from response headers"""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        # A limit of 0 means "unknown" - only headers will tell us
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60) if tokens_per_minute else None
+        self.blocked_until = 0.0
+        self.rejected = 0
+        self.throttled = 0
+
+    def can_reserve(self, estimated_tokens: int) -> bool:
+        """Whether try_reserve would succeed right now, without taking anything; False counts as a rejection"""
+        if time.monotonic() < self.blocked_until \
+                or (self.requests is not None and not self.requests.has(1)) \
+                or (self.tokens is not None and not self.tokens.has(estimated_tokens)):
+            self.rejected += 1
+            return False
+        return True
+
+    def try_reserve(self, estimated_tokens: int) -> bool:
+        """Reserve budget for a call about to be dispatched; False means route elsewhere"""
+        if not self.can_reserve(estimated_tokens):
+            return False
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(estimated_tokens)
+        return True
+
+    def sync(self, headers: Mapping[str, str], status_code: int):
+        """Re-sync from x-ratelimit-* and retry-after response headers"""
+        def number(name: str) -> Optional[float]:
+            try:
+                return float(headers[name])
+            except (KeyError, ValueError):
+                return None
+
+        for kind in ("requests", "tokens"):
+            limit = number(f"x-ratelimit-limit-{kind}")
+            remaining = number(f"x-ratelimit-remaining-{kind}")
+            if limit is None and remaining is None:
+                continue
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            bucket = getattr(self, kind)
+            if bucket is None:
+                capacity = limit or remaining
+                bucket = TokenBucket(capacity, capacity / 60)
+                setattr(self, kind, bucket)
+            bucket.sync(limit, remaining, reset)
+
+        retry_after = parse_duration(headers.get("retry-after"))
+        if status_code == 429:
+            self.throttled += 1
+            # Without a hint, sit out a short cool-down rather than hammering the API
+            self.blocked_until = time.monotonic() + (retry_after if retry_after is not None else 5.0)
+        elif retry_after is not None:
+            self.blocked_until = time.monotonic() + retry_after
+
+    def snapshot(self) -> dict:
+        def bucket_state(bucket: Optional[TokenBucket]) -> Optional[dict]:
+            if bucket is None:
+                return None
+            bucket._refill()
+            return {
+                "available": round(bucket.available, 1),
+                "capacity": bucket.capacity,
+                "refill_per_second": round(bucket.refill_per_second, 3)
+            }
+
+        return {
+            "requests": bucket_state(self.requests),
+            "tokens": bucket_state(self.tokens),
+            "blocked_for_seconds": round(max(0.0, self.blocked_until - time.monotonic()), 1),
+            "rejected": self.rejected,
+            "throttled": self.throttled
+        }
+
+
+class RateLimitRegistry:
+    """One budget per API key (keys are hashed, never stored in clear)"""
+
+    def __init__(self):
+        self._budgets: Dict[str, RateLimitBudget] = {}
+        self._labels: Dict[str, str] = {}
+
+    def for_key(self, label: str, api_key: str, requests_per_minute: float, tokens_per_minute: float) -> RateLimitBudget:
+        key_id = hashlib.sha256(api_key.encode()).hexdigest()[:12]
+        budget = self._budgets.get(key_id)
+        if budget is None:
+            budget = self._budgets[key_id] = RateLimitBudget(requests_per_minute, tokens_per_minute)
+            self._labels[key_id] = label
+        return budget
+
+    def snapshot(self) -> dict:
+        return {f"{self._labels[key_id]}:{key_id}": budget.snapshot() for key_id, budget in self._budgets.items()}
+
+
+rate_limits = RateLimitRegistry()
@@ -0,0 +1,103 @@
+import hashlib
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+from ..core.config import settings
+from ..schemas.llm import GenerateRequest, GenerateResponse
+
+# Rough per-entry bookkeeping cost (key, tuple, response object) on top of the text itself
+ENTRY_OVERHEAD_BYTES = 256
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Canonical form of a prompt for exact matching.
+
+    Unicode is NFC-normalised, line endings unified and trailing whitespace
+    dropped. Indentation and case are kept, since they can change the answer.
+    """
+    text = unicodedata.normalize("NFC", prompt).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+
+
+class ResponseCache:
+    """Exact-match LRU of finished generations, bounded by bytes and a TTL.
+
+    Only deterministic-enough requests are cached: temperature at or below
+    ``response_cache_max_temperature`` unless the request opts in with
+    ``cache=True``. ``cache=False`` always bypasses the cache.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else settings.response_cache_max_bytes
+        self.ttl = ttl if ttl is not None else settings.response_cache_ttl
+        self._entries: "OrderedDict[str, tuple[float, int, GenerateResponse]]" = OrderedDict()
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    def should_cache(self, request: GenerateRequest) -> bool:
+        if not settings.response_cache_enabled or request.cache is False:
+            return False
+        if request.cache:
+            return True
+        return request.temperature is not None and request.temperature <= settings.response_cache_max_temperature
+
+    def key_for(self, request: GenerateRequest, scope: str = "") -> str:
+        """Digest of everything that shapes the answer; ``scope`` separates routing policies"""
+        temperature = "default" if request.temperature is None else f"{request.temperature:.3f}"
+        # The same prompt means something else later in a conversation
+        history = "\x1e".join(f"{turn.role}:{turn.content}" for turn in request.history or ())
+        parts = (normalize_prompt(request.prompt), history, request.model or "auto", str(request.max_tokens), temperature, scope)
+        return hashlib.blake2b("\x1f".join(parts).encode(), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[GenerateResponse]:
+        """Cached response marked ``cached=True``, with the lookup time as its latency"""
+        start_time = time.perf_counter()
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        stored_at, size, response = entry
+        if time.monotonic() - stored_at > self.ttl:
+            self._remove(key)
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return response.model_copy(update={
+            "cached": True,
+            "latency_ms": (time.perf_counter() - start_time) * 1000
+        })
+
+    def put(self, key: str, response: GenerateResponse):
+        size = ENTRY_OVERHEAD_BYTES + len(response.response.encode()) + len(response.model) + len(response.provider)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic(), size, response)
+        self.bytes += size
+        self.stats["stores"] += 1
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else None
+        }
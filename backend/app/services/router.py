@@ -1,10 +1,29 @@
+import asyncio
 import re
-from typing import List, Optional
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 from ..providers.base import BaseProvider
 from ..providers.ollama import OllamaProvider
 from ..providers.groq import GroqProvider
 from ..providers.huggingface import HuggingFaceProvider
 from ..schemas.llm import GenerateRequest, GenerateResponse
+from ..core.config import settings
+from .latency_tracker import LatencyTracker
+from .circuit_breaker import CircuitBreakerRegistry, CircuitOpenError
+from .concurrency_limiter import AdaptiveLimiter, ConcurrencyLimiterRegistry
+from .rate_limiter import RateLimitExceeded, estimate_tokens
+from .health_prober import HealthProber
+from .deadline import Deadline, is_retryable
+from .classifier import IMAGE_TRIGGER_WORDS, TaskClassifier
+from .keyword_matcher import KeywordMatcher
+from .model_stats import ModelStatsRegistry
+from .routing_policy import DEFAULT_POLICY, PREFERENCES, CompiledPolicy
+from .routing_table import RoutingTable
+from .routing_config import routing_config
+from .response_cache import ResponseCache
+from .semantic_cache import SemanticCache
+from .coalescer import Coalescer
+from ..core.database import AsyncSessionLocal
 
 
 class RouterService:
@@ -17,6 +36,37 @@ class RouterService:
             "huggingface": HuggingFaceProvider()
         }
         
+        # Per (provider, model) circuit breakers replace permanently disabling a provider
+        self.breakers = CircuitBreakerRegistry()
+        
+        # Adaptive in-flight windows per upstream; saturated candidates spill to the next one
+        self.limiters = ConcurrencyLimiterRegistry()
+        
+        # Observed latencies drive the hedging delay
+        self.latency_tracker = LatencyTracker()
+        
+        # Per (provider, model, task) latency and success stats drive candidate ordering
+        self.model_stats = ModelStatsRegistry()
+        # Exact-match cache of finished generations, checked before any routing work
+        self.response_cache = ResponseCache()
+        # Opt-in near-duplicate cache, one partition per user
+        self.semantic_cache = SemanticCache(self.providers["ollama"])
+        # Identical concurrent requests share one upstream call (or token stream)
+        self.coalescer = Coalescer()
+        
+        # Precomputed routing decisions, swapped out whenever health, inventory or ranking change
+        self._table: Optional[RoutingTable] = None
+        # Bumped by the background re-rank loop when live statistics changed
+        self._ranking_epoch = 0
+        self._rerank_task: Optional[asyncio.Task] = None
+        self.hedge_stats = {"fired": 0, "wins": 0, "losses": 0, "budget_exhausted": 0}
+        self._hedges_outstanding = 0
+        
+        # Background pings keep provider health fresh without waiting for user traffic to fail
+        self.prober = HealthProber()
+        for name, provider in self.providers.items():
+            self.prober.register(name, provider.health_check)
+        
         # Log provider availability for debugging
         for name, provider in self.providers.items():
             print(f"DEBUG: Provider {name} is_available: {provider.is_available}")
@@ -69,10 +119,9 @@ class RouterService:
                 r"\b(opinion|thought|feel|like|dislike|prefer)\b"
             ]
         }
-    
-    def is_image_generation_request(self, prompt: str) -> bool:
-        """Check if the request is for image generation"""
-        prompt_lower = prompt.lower().strip()
+        
+        # Compiled once: scoring all categories is a single pass over the prompt
+        self.classifier = TaskClassifier(self.patterns, triggers={"image_generation": IMAGE_TRIGGER_WORDS})
         
         # Direct keyword combinations that indicate image generation
         image_keywords = [
@@ -94,46 +143,66 @@ class RouterService:
             "draw me", "paint me", "sketch me", "show me",
             "visualize", "render"
         ]
+        self._image_keywords = KeywordMatcher(image_keywords)
         
-        # Check for direct keyword matches first
-        for keyword in image_keywords:
-            if keyword in prompt_lower:
-                return True
+        # Every image regex below needs one of these whole words, so most prompts skip them entirely
+        self._image_triggers = KeywordMatcher(IMAGE_TRIGGER_WORDS | {"design", "create", "generate", "make"}, whole_words=True)
+        image_patterns = self.patterns["image_generation"] + [
+            r"\b(image|picture|photo|drawing|painting)\s+of\s+",
+            r"\b(draw|paint|sketch|illustrate|design|create|generate|make)\s+.*\b(car|bmw|landscape|person|animal|building|scene)"
+        ]
+        self._image_patterns = re.compile("|".join(f"(?:{pattern})" for pattern in image_patterns))
+    
+    async def startup(self):
+        """Start provider background tasks and the health prober, and seed model statistics"""
+        for provider in self.providers.values():
+            await provider.startup()
+        self.prober.start()
+        routing_config.start()
+        if self._rerank_task is None or self._rerank_task.done():
+            self._rerank_task = asyncio.create_task(self._rerank_loop())
         
-        # Check for pattern-based matches
-        for pattern in self.patterns["image_generation"]:
-            if re.search(pattern, prompt_lower):
-                return True
+        try:
+            async with AsyncSessionLocal() as db:
+                seeded = await self.model_stats.seed(db, self.classifier.classify)
+            print(f"DEBUG: Seeded model statistics from {seeded} recent requests")
+        except Exception as e:
+            print(f"DEBUG: Could not seed model statistics: {e}")
+    
+    async def shutdown(self):
+        """Stop provider background tasks, the health prober, the re-rank loop and the routing config watcher"""
+        await routing_config.stop()
+        await self.prober.stop()
+        if self._rerank_task is not None and not self._rerank_task.done():
+            self._rerank_task.cancel()
+            try:
+                await self._rerank_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        for provider in self.providers.values():
+            await provider.shutdown()
+    
+    def bind_http_clients(self, clients):
+        """Inject the shared, pooled HTTP clients into every provider"""
+        for name, provider in self.providers.items():
+            provider.bind_http_client(clients.get(name))
+    
+    def is_image_generation_request(self, prompt: str) -> bool:
+        """Check if the request is for image generation"""
+        prompt_lower = prompt.lower().strip()[:settings.classifier_max_chars]
         
-        # Additional checks for common image request patterns
-        if re.search(r"\b(image|picture|photo|drawing|painting)\s+of\s+", prompt_lower):
-            return True
-            
-        if re.search(r"\b(draw|paint|sketch|illustrate|design|create|generate|make)\s+.*\b(car|bmw|landscape|person|animal|building|scene)", prompt_lower):
+        # Direct keyword combinations that indicate image generation (one scan for all of them)
+        if self._image_keywords.contains_any(prompt_lower):
             return True
         
-        return False
+        # Pattern-based matches, plus additional checks for common image request patterns
+        if not self._image_triggers.contains_any(prompt_lower):
+            return False
+        return self._image_patterns.search(prompt_lower) is not None
     
     def classify_task(self, prompt: str) -> str:
         """Classify the task type based on prompt content"""
-        prompt_lower = prompt.lower()
-        scores = {}
-        
-        for task_type, patterns in self.patterns.items():
-            score = 0
-            for pattern in patterns:
-                matches = len(re.findall(pattern, prompt_lower))
-                score += matches * 2  # Weight pattern matches
-                
-                # Bonus for exact matches
-                if re.search(pattern, prompt_lower):
-                    score += 1
-            
-            scores[task_type] = score
-        
-        # Return task with highest score, default to casual
-        best_task = max(scores.items(), key=lambda x: x[1])
-        return best_task[0] if best_task[1] > 0 else "casual"
+        return self.classifier.classify(prompt)
     
     def get_provider_priority(self) -> List[str]:
         """Get provider priority order based on availability and speed"""
@@ -148,60 +217,21 @@ class RouterService:
             
         if self.providers["ollama"].is_available:
             priority.append("ollama")  # Local fallback, slowest
-            
-        return priority
+        
+        # Providers failing their health probes are still tried, but last
+        demoted = [name for name in priority if self.prober.is_demoted(name)]
+        return [name for name in priority if name not in demoted] + demoted
 
     def get_optimal_model(self, task_type: str, preference: str = "balanced") -> tuple[str, str]:
         """Get optimal model and provider for task type with smart fallback"""
+        table = self.decision_table()
+        available = table.mask(name for name, provider in self.providers.items() if provider.is_available)
         
-        # Enhanced routing rules - using only confirmed working models
-        routing_rules = {
-            "reasoning": [
-                ("gemma2-9b-it", "groq"),                # Best available for reasoning
-                ("llama-3.1-8b-instant", "groq"),        # Fast and reliable
-                ("microsoft/Phi-3-mini", "huggingface"), # Good reasoning fallback
-                ("llama3.1:8b", "ollama")                 # Local fallback
-            ],
-            "coding": [
-                ("llama-3.1-8b-instant", "groq"),        # Excellent for code
-                ("gemma2-9b-it", "groq"),                # Alternative for complex code
-                ("codellama:7b", "ollama")                # Specialized coding model
-            ],
-            "creative": [
-                ("gemma2-9b-it", "groq"),                # Creative and capable
-                ("llama-3.1-8b-instant", "groq"),        # Fast creative tasks
-                ("microsoft/Phi-3-mini", "huggingface"), # Creative fallback
-                ("llama3.1:8b", "ollama")                 # Local fallback
-            ],
-            "summarization": [
-                ("llama-3.1-8b-instant", "groq"),        # Fast summarization
-                ("gemma2-9b-it", "groq"),                # Detailed summaries
-                ("mistral:7b", "ollama")                  # Local fallback
-            ],
-            "historical": [
-                ("gemma2-9b-it", "groq"),                # Best for detailed explanations
-                ("llama-3.1-8b-instant", "groq"),        # Fast alternative
-                ("llama3.1:8b", "ollama")                 # Local fallback
-            ],
-            "educational": [
-                ("gemma2-9b-it", "groq"),                # Detailed explanations
-                ("llama-3.1-8b-instant", "groq"),        # Fast learning content
-                ("llama3.1:8b", "ollama")                 # Local fallback
-            ],
-            "casual": [
-                ("llama-3.1-8b-instant", "groq"),        # Fast for casual chat
-                ("gemma2-9b-it", "groq"),                # More detailed responses
-                ("llama3.1:8b", "ollama")                 # Local fallback
-            ]
-        }
-        
-        # Get the routing options for this task type
-        options = routing_rules.get(task_type, routing_rules["casual"])
-        
-        # Try each option in order, checking availability
-        for model, provider in options:
-            if self.providers[provider].is_available:
-                return model, provider
+        # Fastest available option within the task's quality tier (precomputed per availability)
+        best = table.optimal(task_type, available, preference)
+        if best is not None:
+            provider, model = best
+            return model, provider
         
         # Ultimate fallback - try any available provider
         priority = self.get_provider_priority()
@@ -216,106 +246,710 @@ class RouterService:
         # Last resort
         return "llama3:8b", "ollama"
     
-    async def route_request(self, request: GenerateRequest, user_preference: str = "balanced") -> GenerateResponse:
-        """Route request to optimal provider with intelligent fallback"""
+    def get_models_to_try(self, provider_name: str, task_type: str) -> List[str]:
+        """Get models to try for a provider (enabled models from the routing config)"""
+        return list(routing_config.current.models_to_try(provider_name, task_type))
+    
+    def quality_tier(self, provider_name: str, model: str) -> int:
+        return routing_config.current.quality_tier(provider_name, model)
+    
+    def rank_candidates(
+        self,
+        candidates: List[tuple[str, str]],
+        task_type: str,
+        preference: str = "balanced"
+    ) -> List[tuple[str, str]]:
+        """Order candidates by expected latency, shaped by the routing preference.
+        
+        Demoted providers always go last. ``balanced`` then puts candidates below the
+        task's minimum tier after those meeting it, ``accuracy`` goes best tier first,
+        and ``speed`` ignores tiers entirely. Within a group the live EWMA latency
+        (inflated by the failure rate) decides; models without enough samples use a
+        per-provider prior. Ties keep their order.
+        """
+        min_tier = routing_config.current.min_tiers.get(task_type, 1)
+        
+        def key(candidate: tuple[str, str]):
+            provider_name, model = candidate
+            expected = self.model_stats.expected_latency_ms(provider_name, model, task_type)
+            if expected is None:
+                expected = settings.stats_prior_ms.get(provider_name, settings.limiter_default_latency_ms)
+            if preference == "speed":
+                quality = 0
+            elif preference == "accuracy":
+                quality = -self.quality_tier(provider_name, model)
+            else:
+                quality = self.quality_tier(provider_name, model) < min_tier
+            return (self.prober.is_demoted(provider_name), quality, expected)
+        
+        return sorted(candidates, key=key)
+    
+    def _table_signature(self) -> tuple:
+        """Everything the decision table depends on besides the static rules"""
+        return (
+            routing_config.current.version,
+            self.prober.version,
+            self.providers["ollama"].inventory.version,
+            self._ranking_epoch
+        )
+    
+    def decision_table(self) -> RoutingTable:
+        """The current routing table, rebuilt only when its signature changed.
+        
+        A rebuild happens when the routing config is reloaded, when a provider is
+        demoted or revived, or when the set of pulled Ollama models changes. Re-ranking
+        from live latency statistics happens off the request path, in ``_rerank_loop``.
+        """
+        signature = self._table_signature()
+        table = self._table
+        if table is not None and table.signature == signature:
+            return table
+        
+        config = routing_config.current
+        
+        def universe(task_type: str) -> List[tuple[str, str]]:
+            return [
+                (provider_name, model)
+                for provider_name in config.provider_order  # Breaks ranking ties
+                for model in self.get_models_to_try(provider_name, task_type)
+                if self.providers[provider_name].can_serve(model)
+            ]
+        
+        def optimal_options(task_type: str) -> List[tuple[str, str]]:
+            return list(config.preferred(task_type))
+        
+        self._table = RoutingTable.build(
+            signature,
+            tuple(self.providers),
+            task_types=set(self.patterns) | set(config.task_types),
+            preferences=PREFERENCES,
+            universe=universe,
+            optimal_options=optimal_options,
+            rank=self.rank_candidates
+        )
+        print(f"DEBUG: Rebuilt routing table ({len(self._table)} entries) for signature {signature}")
+        return self._table
+    
+    async def _rerank_loop(self):
+        """Every ``routing_table_rerank_interval`` seconds, rebuild the table if model statistics changed"""
+        ranked_at = self.model_stats.version
+        while True:
+            await asyncio.sleep(settings.routing_table_rerank_interval)
+            if self.model_stats.version == ranked_at:
+                continue
+            ranked_at = self.model_stats.version
+            self._ranking_epoch += 1
+            try:
+                self.decision_table()
+            except Exception as e:
+                print(f"DEBUG: Routing table re-rank failed: {e}")
+    
+    async def plan_candidates(
+        self,
+        request: GenerateRequest,
+        task_type: Optional[str] = None,
+        policy: Optional[CompiledPolicy] = None
+    ) -> List[tuple[str, str]]:
+        """Ordered (provider, model) fallback chain for a request under the user's routing policy"""
+        policy = policy or DEFAULT_POLICY
+        candidates = []
         
         # If specific model is requested, try it first but still fallback
         if request.model:
             for provider_name, provider in self.providers.items():
-                if await provider.is_model_available(request.model):
-                    try:
-                        return await provider.generate(request)
-                    except Exception as e:
-                        print(f"Specific model {request.model} on {provider_name} failed: {e}")
-                        continue
+                if policy.allows(provider_name) and await provider.is_model_available(request.model):
+                    candidates.append((provider_name, request.model))
         
         # Auto-routing based on task classification
-        task_type = self.classify_task(request.prompt)
+        task_type = task_type or await self.classifier.classify_async(request.prompt)
         print(f"DEBUG: Classified task as: {task_type} for prompt: '{request.prompt[:50]}...'")
         
         # Get provider priority list
         provider_priority = self.get_provider_priority()
         print(f"DEBUG: Provider priority: {provider_priority}")
         
-        # Try providers in priority order with appropriate models
-        for provider_name in provider_priority:
-            try:
-                provider = self.providers[provider_name]
-                if not provider.is_available:
-                    print(f"DEBUG: Provider {provider_name} not available, skipping")
-                    continue
+        # One lookup in the precomputed table (an explicitly requested model stays in front)
+        table = self.decision_table()
+        usable = table.mask(name for name in provider_priority if policy.allows(name))
+        auto_candidates = list(table.candidates(task_type, usable, policy.preference))
+        
+        local_models = [model for provider_name, model in auto_candidates if provider_name == "ollama"]
+        if local_models:
+            # Remember what local fallback this traffic needs, then skip cold loads where we can
+            ollama = self.providers["ollama"]
+            ollama.warm_pool.record_demand(local_models[0])
+            resident_first = iter(ollama.prefer_resident(local_models))
+            auto_candidates = [
+                (provider_name, next(resident_first) if provider_name == "ollama" else model)
+                for provider_name, model in auto_candidates
+            ]
+            pinned = ollama.contexts.pinned_model(request.conversation)
+            if pinned is not None and ollama.can_serve(pinned) and not request.model:
+                # Stay on the model holding this conversation's KV context (switching would discard it),
+                # as an extra candidate ahead of the other local ones so no fallback is lost
+                pinned_candidate = ("ollama", pinned)
+                auto_candidates = [candidate for candidate in auto_candidates if candidate != pinned_candidate]
+                first_local = next(
+                    (index for index, (provider_name, _) in enumerate(auto_candidates) if provider_name == "ollama"),
+                    len(auto_candidates)
+                )
+                auto_candidates.insert(first_local, pinned_candidate)
+        candidates += auto_candidates
+        
+        # Models whose context window can't hold the prompt plus the completion go last
+        needed = estimate_tokens(request)
+        config = routing_config.current
+        too_small = [c for c in candidates if (config.context_window(*c) or needed) < needed]
+        if too_small:
+            candidates = [c for c in candidates if c not in too_small] + too_small
+        
+        # Skip known-bad candidates without paying a round trip
+        open_circuits = [c for c in candidates if self.breakers.is_open(*c)]
+        if open_circuits:
+            print(f"DEBUG: Skipping candidates with open circuits: {open_circuits}")
+            candidates = [c for c in candidates if c not in open_circuits]
+        
+        return candidates
+
+    def has_spare_capacity(self, task_type: str, policy: Optional[CompiledPolicy] = None, ratio: float = 1.0) -> bool:
+        """Whether the first model routing would pick for ``task_type`` can take a call right now.
+
+        ``ratio`` < 1 demands headroom: the limiter must be under that fraction
+        of its concurrency limit with nobody queued.
+        """
+        policy = policy or DEFAULT_POLICY
+        table = self.decision_table()
+        usable = table.mask(name for name in self.get_provider_priority() if policy.allows(name))
+        for provider_name, model in table.candidates(task_type, usable, policy.preference):
+            if self.breakers.is_open(provider_name, model):
+                continue
+            provider = self.providers[provider_name]
+            return self.limiters.get(provider.limiter_key(model), is_local=provider.is_local).has_spare_capacity(ratio)
+        return False
+
+    def _all_failed_error(self) -> Exception:
+        available_providers = [name for name, provider in self.providers.items() if provider.is_available]
+        return Exception(f"All providers failed. Available providers: {available_providers}. Please check your API keys and network connection.")
+    
+    def _use_hedging(self, request: GenerateRequest) -> bool:
+        """Hedging is opt-in, globally via settings or per request"""
+        return request.hedge if request.hedge is not None else settings.hedging_enabled
+    
+    def _hedge_delay(self, provider_name: str, model: str, kind: str) -> float:
+        """Seconds to wait on a candidate before firing a hedge (its latency percentile)"""
+        observed = self.latency_tracker.percentile(provider_name, model, settings.hedge_latency_percentile, kind)
+        delay_ms = observed if observed is not None else settings.hedge_default_delay_ms
+        return max(delay_ms, settings.hedge_min_delay_ms) / 1000
+    
+    def _release_hedge(self, task: asyncio.Task):
+        self._hedges_outstanding -= 1
+    
+    async def _run_candidates(
+        self,
+        candidates: List[tuple[str, str]],
+        attempt: Callable[[str, str, bool], Awaitable[Any]],
+        hedge: bool = False,
+        kind: str = "total",
+        discard: Optional[Callable[[Any], Awaitable[None]]] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Any:
+        """Run ``attempt`` over the fallback chain and return the first successful result.
+        
+        Without hedging candidates are tried strictly one after another. With hedging,
+        the next candidate is fired in parallel once the current one is slower than its
+        latency percentile; the first success wins and the losers are cancelled.
+        ``attempt`` is called with (provider, model, is_last_candidate); ``discard``
+        releases results of attempts that succeeded but lost the race.
+        
+        Every attempt is bounded by what is left of ``deadline``. Candidates that failed
+        transiently get another pass after a jittered exponential backoff while the
+        budget allows; once it is spent DeadlineExceeded is raised.
+        """
+        deadline = deadline or Deadline(settings.deadline_default_ms)
+        remaining = list(candidates)
+        retryable: List[tuple[str, str]] = []
+        retry_round = 0
+        pending: Dict[asyncio.Task, tuple[str, str, bool]] = {}
+        hedges_fired = 0
+        hedge_blocked = False
+        launched_at, current = 0.0, None
+        
+        def launch(is_hedge: bool):
+            provider_name, model = remaining.pop(0)
+            task = asyncio.create_task(deadline.run(attempt(provider_name, model, not remaining)))
+            pending[task] = (provider_name, model, is_hedge)
+            if is_hedge:
+                self._hedges_outstanding += 1
+                self.hedge_stats["fired"] += 1
+                task.add_done_callback(self._release_hedge)
+            return time.monotonic(), (provider_name, model)
+        
+        try:
+            while True:
+                if not pending and not remaining:
+                    # Chain exhausted - give transiently failed candidates another go
+                    if not retryable or retry_round >= settings.retry_max_rounds or deadline.expired:
+                        break
+                    if not await deadline.backoff(retry_round):
+                        break
+                    retry_round += 1
+                    print(f"DEBUG: Retrying {retryable} (round {retry_round})")
+                    remaining, retryable = retryable, []
                 
-                # Get models to try for this provider (only confirmed working models)
-                models_to_try = []
+                if not pending:
+                    deadline.check()
+                    launched_at, current = launch(False)
                 
-                if provider_name == "groq":
-                    if task_type in ["coding", "reasoning", "historical", "educational"]:
-                        # For complex tasks, try larger models first
-                        models_to_try = ["gemma2-9b-it", "llama-3.1-8b-instant", "llama3-8b-8192"]
-                    else:
-                        # For simple tasks, use fastest models
-                        models_to_try = ["llama-3.1-8b-instant", "gemma2-9b-it"]
-                elif provider_name == "huggingface":
-                    models_to_try = ["microsoft/Phi-3-mini"]
-                else:  # ollama
-                    if task_type == "coding":
-                        models_to_try = ["codellama:7b", "llama3.1:8b"]
-                    elif task_type == "summarization":
-                        models_to_try = ["mistral:7b", "llama3.1:8b"]
+                timeout = None
+                if hedge and remaining and not hedge_blocked and hedges_fired < settings.hedge_max_per_request:
+                    timeout = max(0.0, launched_at + self._hedge_delay(*current, kind) - time.monotonic())
+                
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                
+                if not done:
+                    # Current candidate is slower than usual - hedge with the next one
+                    if self._hedges_outstanding < settings.hedge_max_outstanding:
+                        print(f"DEBUG: Hedging {current[1]} on {current[0]} with {remaining[0][1]} on {remaining[0][0]}")
+                        launched_at, current = launch(True)
+                        hedges_fired += 1
                     else:
-                        models_to_try = ["llama3.1:8b", "llama3:8b"]
+                        self.hedge_stats["budget_exhausted"] += 1
+                        hedge_blocked = True
+                    continue
                 
-                # Try each model for this provider
-                for model in models_to_try:
-                    try:
-                        print(f"DEBUG: Trying {provider_name} with model {model}")
-                        
-                        # Create a copy of the request with the selected model
-                        request_copy = GenerateRequest(
-                            prompt=request.prompt,
-                            model=model,
-                            max_tokens=request.max_tokens,
-                            temperature=request.temperature
-                        )
-                        
-                        response = await provider.generate(request_copy)
-                        print(f"DEBUG: Success with {provider_name} using {model}")
-                        return response
-                        
-                    except Exception as model_error:
-                        print(f"DEBUG: Model {model} on {provider_name} failed: {model_error}")
+                hedge_blocked = False
+                winner = None
+                for task in done:
+                    provider_name, model, is_hedge = pending.pop(task)
+                    if task.cancelled():
                         continue
+                    if task.exception() is not None:
+                        print(f"DEBUG: Model {model} on {provider_name} failed: {task.exception()}")
+                        if is_retryable(task.exception()):
+                            retryable.append((provider_name, model))
+                    elif winner is None:
+                        winner = (task.result(), is_hedge)
+                    elif discard:
+                        await discard(task.result())
                 
-            except Exception as e:
-                print(f"DEBUG: Provider {provider_name} completely failed: {e}")
-                continue
+                if winner is not None:
+                    result, is_hedge = winner
+                    if hedges_fired:
+                        self.hedge_stats["wins" if is_hedge else "losses"] += 1
+                    return result
+        finally:
+            # Cancel the losers (closes their in-flight upstream connections)
+            for task in pending:
+                task.cancel()
+            if pending:
+                results = await asyncio.gather(*pending, return_exceptions=True)
+                if discard:
+                    for result in results:
+                        if not isinstance(result, BaseException):
+                            await discard(result)
+        
+        if deadline.expired:
+            raise deadline.error()
         
         # If all providers failed, raise a comprehensive error
-        available_providers = [name for name, provider in self.providers.items() if provider.is_available]
-        raise Exception(f"All providers failed. Available providers: {available_providers}. Please check your API keys and network connection.")
+        raise self._all_failed_error()
+    
+    async def _admit(
+        self,
+        provider_name: str,
+        model: str,
+        request: GenerateRequest,
+        is_last: bool,
+        deadline: Optional[Deadline] = None
+    ) -> AdaptiveLimiter:
+        """Pass the circuit breaker, take a concurrency slot and reserve rate-limit budget.
+        
+        Candidates without rate-limit budget are skipped without a round trip. Saturated
+        candidates spill over to the next one; the last candidate queues longer instead,
+        but never past the request deadline. Budget is only taken once the call is
+        admitted, so candidates skipped by the breaker or limiter cost nothing.
+        """
+        provider = self.providers[provider_name]
+        budget = provider.rate_limit
+        tokens = estimate_tokens(request)
+        if budget is not None and not budget.can_reserve(tokens):
+            raise RateLimitExceeded(f"{provider_name} rate-limit budget exhausted for ~{tokens} tokens")
+        
+        if not self.breakers.allow(provider_name, model):
+            raise CircuitOpenError(f"Circuit open for {model} on {provider_name}")
+        
+        limiter = self.limiters.get(provider.limiter_key(model), is_local=provider.is_local)
+        try:
+            max_wait = settings.limiter_last_candidate_wait_ms if is_last else settings.limiter_max_queue_wait_ms
+            if deadline is not None:
+                max_wait = min(max_wait, deadline.remaining_ms)
+            await limiter.acquire(max_wait)
+        except BaseException:
+            self.breakers.release(provider_name, model)
+            raise
+        
+        # Other calls may have drained the budget while this one queued
+        if budget is not None and not budget.try_reserve(tokens):
+            limiter.release_slot()
+            self.breakers.release(provider_name, model)
+            raise RateLimitExceeded(f"{provider_name} rate-limit budget exhausted for ~{tokens} tokens")
+        return limiter
+    
+    async def _attempt_generate(
+        self,
+        request: GenerateRequest,
+        provider_name: str,
+        model: str,
+        is_last: bool = False,
+        deadline: Optional[Deadline] = None,
+        task_type: str = ModelStatsRegistry.ANY_TASK
+    ) -> GenerateResponse:
+        print(f"DEBUG: Trying {provider_name} with model {model}")
+        
+        # Create a copy of the request with the selected model
+        request_copy = request.model_copy(update={"model": model})
+        
+        limiter = await self._admit(provider_name, model, request_copy, is_last, deadline)
+        start_time = time.time()
+        try:
+            response = await self.providers[provider_name].generate(request_copy)
+        except asyncio.CancelledError:
+            if deadline is not None and deadline.expired:
+                # Killed by the deadline: a timeout, so a model that always misses it gets backed off
+                elapsed_ms = (time.time() - start_time) * 1000
+                self._record_deadline_kill(provider_name, model, task_type, elapsed_ms, deadline)
+                limiter.release(elapsed_ms, error=deadline.error())
+            else:
+                # Lost a hedge race or the client went away - says nothing about the model
+                self.breakers.release(provider_name, model)
+                limiter.release_slot()
+            raise
+        except Exception as e:
+            self.breakers.record_failure(provider_name, model, e)
+            self.model_stats.record(provider_name, model, task_type, None, False)
+            limiter.release(error=e)
+            raise
+        
+        limiter.release(response.latency_ms)
+        self.breakers.record_success(provider_name, model, response.latency_ms)
+        self.latency_tracker.record(provider_name, model, response.latency_ms)
+        self.model_stats.record(provider_name, model, task_type, response.latency_ms, True)
+        print(f"DEBUG: Success with {provider_name} using {model}")
+        return response
+    
+    def _record_deadline_kill(self, provider_name: str, model: str, task_type: str, elapsed_ms: float, deadline: Deadline):
+        """Count an attempt cancelled by the request deadline as a timeout that took ``elapsed_ms``"""
+        print(f"DEBUG: {model} on {provider_name} cut off by the deadline after {elapsed_ms:.0f}ms")
+        self.breakers.record_failure(provider_name, model, deadline.error(), elapsed_ms)
+        self.model_stats.record(provider_name, model, task_type, elapsed_ms, False)
+    
+    async def _hold_slot(
+        self,
+        tokens: AsyncIterator[str],
+        limiter: AdaptiveLimiter,
+        deadline: Optional[Deadline] = None
+    ) -> AsyncIterator[str]:
+        """Keep a concurrency slot for the whole lifetime of a token stream"""
+        start_time = time.time()
+        error = None
+        started = False
+        try:
+            async for token in tokens:
+                started = True
+                yield token
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            await tokens.aclose()
+            if isinstance(error, asyncio.CancelledError) and not started and deadline is not None and deadline.expired:
+                # The deadline only bounds the wait for the first token
+                limiter.release((time.time() - start_time) * 1000, error=deadline.error())
+            elif isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+                limiter.release_slot()
+            else:
+                limiter.release((time.time() - start_time) * 1000, error=error)
+    
+    async def _attempt_stream(
+        self,
+        request: GenerateRequest,
+        provider_name: str,
+        model: str,
+        is_last: bool = False,
+        deadline: Optional[Deadline] = None,
+        task_type: str = ModelStatsRegistry.ANY_TASK
+    ) -> tuple:
+        """Open a token stream and wait for its first token"""
+        print(f"DEBUG: Streaming from {provider_name} with model {model}")
+        start_time = time.time()
+        request_copy = request.model_copy(update={"model": model})
+        
+        limiter = await self._admit(provider_name, model, request_copy, is_last, deadline)
+        tokens = self._hold_slot(self.providers[provider_name].stream(request_copy), limiter, deadline)
+        
+        try:
+            first_token = await tokens.__anext__()
+        except StopAsyncIteration:
+            first_token = ""
+        except asyncio.CancelledError:
+            if deadline is not None and deadline.expired:
+                self._record_deadline_kill(provider_name, model, task_type, (time.time() - start_time) * 1000, deadline)
+            else:
+                self.breakers.release(provider_name, model)
+            await tokens.aclose()
+            raise
+        except Exception as e:
+            self.breakers.record_failure(provider_name, model, e)
+            self.model_stats.record(provider_name, model, task_type, None, False)
+            await tokens.aclose()
+            raise
+        
+        ttft = (time.time() - start_time) * 1000
+        self.breakers.record_success(provider_name, model, ttft)
+        # Time to first token isn't comparable to full latencies - only count the success
+        self.model_stats.record(provider_name, model, task_type, None, True)
+        self.latency_tracker.record(provider_name, model, ttft, kind="ttft")
+        return provider_name, model, tokens, first_token, start_time, ttft
+    
+    @staticmethod
+    def _policy_scope(policy: Optional[CompiledPolicy]) -> str:
+        policy = policy or DEFAULT_POLICY
+        return f"{policy.preference}|{','.join(sorted(policy.disabled_providers))}"
+    
+    def _cache_lookup(self, request: GenerateRequest, policy: Optional[CompiledPolicy]) -> tuple:
+        """(cache key or None when the request isn't cacheable, cached response or None)"""
+        if not self.response_cache.should_cache(request):
+            return None, None
+        key = self.response_cache.key_for(request, self._policy_scope(policy))
+        hit = self.response_cache.get(key)
+        if hit is not None:
+            print(f"DEBUG: Response cache hit ({hit.provider}/{hit.model}) in {hit.latency_ms:.3f}ms")
+        return key, hit
+    
+    async def _semantic_lookup(self, request: GenerateRequest, policy: Optional[CompiledPolicy], tenant: Any) -> tuple:
+        """(partition key, prompt vector, cached response) - all None unless the request opted in"""
+        # Only the prompt is embedded, so turns that depend on conversation history never qualify
+        if not (settings.semantic_cache_enabled and request.semantic_cache and request.cache is not False) or request.history:
+            return None, None, None
+        embedder, vector = await self.semantic_cache.embed(request.prompt)
+        # Only requests of the same shape may share answers
+        key = (tenant, embedder, request.model, request.max_tokens, request.temperature, self._policy_scope(policy))
+        hit = self.semantic_cache.lookup(key, vector)
+        if hit is not None:
+            print(f"DEBUG: Semantic cache hit ({hit.provider}/{hit.model}, similarity {hit.cache_similarity})")
+        return key, vector, hit
+    
+    def _flight_key(self, request: GenerateRequest, policy: Optional[CompiledPolicy], tenant: Any = None) -> Optional[str]:
+        """Single-flight key for a request, or None when it must get its own upstream call.
+        
+        Only one tenant's requests are merged, and only within one conversation, since
+        the leader's conversation is the one whose Ollama KV context gets stored.
+        """
+        if not settings.coalescing_enabled or request.cache is False:
+            return None
+        conversation = request.conversation.key if request.conversation is not None else ""
+        return f"{tenant}|{conversation}|{self.response_cache.key_for(request, self._policy_scope(policy))}"
+    
+    def _remember(self, cache_key: Optional[str], semantic: tuple, response: GenerateResponse):
+        """Store a fresh response in whichever caches the request qualified for"""
+        if cache_key is not None:
+            self.response_cache.put(cache_key, response)
+        semantic_key, vector, _ = semantic
+        if semantic_key is not None:
+            self.semantic_cache.store(semantic_key, vector, response)
+    
+    async def route_request(
+        self,
+        request: GenerateRequest,
+        policy: Optional[CompiledPolicy] = None,
+        deadline: Optional[Deadline] = None,
+        tenant: Any = None
+    ) -> GenerateResponse:
+        """Route request to optimal provider with intelligent fallback within ``deadline``.
+        
+        ``tenant`` (the user id) partitions the semantic cache and request coalescing.
+        """
+        cache_key, hit = self._cache_lookup(request, policy)
+        if hit is not None:
+            return hit
+        semantic = await self._semantic_lookup(request, policy, tenant)
+        if semantic[2] is not None:
+            return semantic[2]
+        
+        deadline = deadline or Deadline(settings.deadline_default_ms)
+        flight_key = self._flight_key(request, policy, tenant)
+        if flight_key is None:
+            response = await self._generate(request, policy, deadline)
+        else:
+            # Joiners wait within their own deadline; the shared call runs within the first caller's
+            response = await deadline.run(
+                self.coalescer.run(flight_key, lambda: self._generate(request, policy, deadline))
+            )
+        self._remember(cache_key, semantic, response)
+        return response
+    
+    async def _generate(self, request: GenerateRequest, policy: Optional[CompiledPolicy], deadline: Deadline) -> GenerateResponse:
+        task_type = await self.classifier.classify_async(request.prompt)
+        candidates = await self.plan_candidates(request, task_type, policy)
+        
+        return await self._run_candidates(
+            candidates,
+            lambda provider_name, model, is_last: self._attempt_generate(
+                request, provider_name, model, is_last, deadline, task_type
+            ),
+            hedge=self._use_hedging(request),
+            deadline=deadline
+        )
+    
+    async def route_stream(
+        self,
+        request: GenerateRequest,
+        policy: Optional[CompiledPolicy] = None,
+        deadline: Optional[Deadline] = None,
+        tenant: Any = None
+    ) -> AsyncIterator[dict]:
+        """Stream tokens from the optimal provider.
+        
+        Uses the same fallback chain as route_request, but only falls back while
+        no token has been emitted yet. Yields ``start``, ``token`` and ``done`` events.
+        The deadline bounds the time to first token.
+        
+        Identical concurrent streams of the same ``tenant`` share one upstream stream:
+        later subscribers replay the events so far and then follow along live.
+        """
+        deadline = deadline or Deadline(settings.deadline_default_ms)
+        flight_key = self._flight_key(request, policy, tenant)
+        if flight_key is None:
+            events = self._stream(request, policy, deadline)
+        else:
+            events = self.coalescer.stream(flight_key, lambda: self._stream(request, policy, deadline))
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+    
+    async def _stream(self, request: GenerateRequest, policy: Optional[CompiledPolicy], deadline: Deadline) -> AsyncIterator[dict]:
+        task_type = await self.classifier.classify_async(request.prompt)
+        candidates = await self.plan_candidates(request, task_type, policy)
+        
+        provider_name, model, tokens, first_token, start_time, ttft = await self._run_candidates(
+            candidates,
+            lambda provider_name, model, is_last: self._attempt_stream(
+                request, provider_name, model, is_last, deadline, task_type
+            ),
+            hedge=self._use_hedging(request),
+            kind="ttft",
+            discard=lambda result: result[2].aclose(),
+            deadline=deadline
+        )
+        
+        # First token is out - from here on we are committed to this candidate
+        yield {"type": "start", "provider": provider_name, "model": model, "ttft_ms": ttft}
+        try:
+            if first_token:
+                yield {"type": "token", "content": first_token}
+            async for token in tokens:
+                yield {"type": "token", "content": token}
+        finally:
+            await tokens.aclose()
+        
+        yield {
+            "type": "done",
+            "provider": provider_name,
+            "model": model,
+            "ttft_ms": ttft,
+            "latency_ms": (time.time() - start_time) * 1000
+        }
+    
+    async def route_batch(
+        self,
+        requests: List[GenerateRequest],
+        budget_ms: float,
+        policy: Optional[CompiledPolicy] = None,
+        tenant: Any = None
+    ) -> AsyncIterator[tuple[int, Any]]:
+        """Route independent requests concurrently, yielding (index, response or exception) as they finish.
+        
+        Candidates for the whole batch are planned up front and grouped by their first
+        choice. Each provider gets at most ``batch_provider_concurrency`` batch requests
+        in flight so a large batch can't starve interactive traffic. Every request gets
+        its own deadline of ``budget_ms`` from the moment the batch is dispatched, so
+        waiting for a provider slot counts against it. Batches are text-only and never
+        hedged.
+        """
+        # Classify the whole batch in one pass off the event loop, then plan concurrently
+        task_types = await asyncio.to_thread(
+            lambda: [self.classifier.classify(request.prompt) for request in requests]
+        )
+        plans = await asyncio.gather(*(
+            self.plan_candidates(request, task_type, policy) for request, task_type in zip(requests, task_types)
+        ))
+        
+        groups: Dict[tuple, List[int]] = {}
+        for index, candidates in enumerate(plans):
+            groups.setdefault(candidates[0] if candidates else None, []).append(index)
+        print(f"DEBUG: Batch of {len(requests)} grouped as {[(key, len(indexes)) for key, indexes in groups.items()]}")
+        
+        semaphores = {
+            name: asyncio.Semaphore(settings.batch_provider_concurrency.get(name, 4))
+            for name in self.providers
+        }
+        
+        async def run(index: int) -> tuple[int, Any]:
+            deadline = Deadline(budget_ms)
+            candidates, request, task_type = plans[index], requests[index], task_types[index]
+            cache_key, hit = self._cache_lookup(request, policy)
+            if hit is not None:
+                return index, hit
+            semantic = await self._semantic_lookup(request, policy, tenant)
+            if semantic[2] is not None:
+                return index, semantic[2]
+            if not candidates:
+                return index, self._all_failed_error()
+            
+            async def generate() -> GenerateResponse:
+                semaphore = semaphores[candidates[0][0]]
+                await deadline.run(semaphore.acquire())
+                try:
+                    return await self._run_candidates(
+                        candidates,
+                        lambda provider_name, model, is_last: self._attempt_generate(
+                            request, provider_name, model, is_last, deadline, task_type
+                        ),
+                        deadline=deadline
+                    )
+                finally:
+                    semaphore.release()
+            
+            # Duplicates within the batch (or of live traffic) share one upstream call
+            flight_key = self._flight_key(request, policy, tenant)
+            try:
+                response = await (generate() if flight_key is None else self.coalescer.run(flight_key, generate))
+            except Exception as e:
+                return index, e
+            self._remember(cache_key, semantic, response)
+            return index, response
+        
+        # Dispatch group by group so requests for the same upstream go out back to back
+        tasks = [asyncio.create_task(run(index)) for indexes in groups.values() for index in indexes]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
     
     def get_available_models(self) -> List[dict]:
         """Get list of only confirmed working models across providers"""
         models = []
         
-        # Only include confirmed working models
+        # Only include models the routing config lists, plus whatever is actually pulled on the Ollama host
         confirmed_models = {
-            "groq": [
-                "llama-3.1-8b-instant",
-                "gemma2-9b-it", 
-                "llama3-8b-8192",
-                "gemma-7b-it"
-            ],
-            "huggingface": [
-                "microsoft/Phi-3-mini"
-            ],
-            "ollama": [
-                "llama3.1:8b",
-                "llama3:8b", 
-                "mistral:7b",
-                "gemma2:9b",
-                "codellama:7b"
-            ]
+            "groq": routing_config.current.listed_models("groq"),
+            "huggingface": routing_config.current.listed_models("huggingface"),
+            "ollama": self.providers["ollama"].get_models()
         }
         
         for provider_name, provider in self.providers.items():
@@ -330,25 +964,24 @@ class RouterService:
         
         return models
     
+    def get_hedge_stats(self) -> dict:
+        """Hedge counters for tuning the hedge delay"""
+        return {**self.hedge_stats, "outstanding": self._hedges_outstanding}
+    
     async def health_check(self) -> dict:
-        """Check health of all providers"""
+        """Health of all providers, served from the background prober's cache"""
         health_status = {}
         
         for provider_name, provider in self.providers.items():
-            try:
-                is_healthy = await provider.health_check()
-                health_status[provider_name] = {
-                    "status": "healthy" if is_healthy else "unhealthy",
-                    "is_local": provider.is_local,
-                    "models": provider.get_models()
-                }
-            except Exception as e:
-                health_status[provider_name] = {
-                    "status": "error",
-                    "error": str(e),
-                    "is_local": provider.is_local,
-                    "models": []
-                }
+            probe = self.prober.status(provider_name).snapshot()
+            if probe["status"] == "healthy" and self.breakers.is_open(provider_name, self.breakers.PROVIDER_WIDE):
+                probe["status"] = "degraded"
+            health_status[provider_name] = {
+                **probe,
+                "is_local": provider.is_local,
+                "models": provider.get_models(),
+                "circuit_breakers": self.breakers.snapshot(provider_name)
+            }
         
         return health_status
 
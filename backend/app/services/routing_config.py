@@ -0,0 +1,216 @@
+import asyncio
+import os
+import tomllib
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field, model_validator
+from ..core.config import settings
+
+PROVIDERS = ("groq", "huggingface", "ollama")
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "core", "routing.toml")
+
+
+class ProviderSpec(BaseModel):
+    enabled: bool = True
+
+    class Config:
+        extra = "forbid"
+
+
+class ModelSpec(BaseModel):
+    provider: str
+    name: str
+    context_window: int = Field(gt=0)
+    quality_tier: int = Field(default=1, ge=0)
+    listed: bool = True
+    enabled: bool = True
+
+    class Config:
+        extra = "forbid"
+
+
+class TaskRule(BaseModel):
+    min_tier: int = Field(default=1, ge=0)
+    preferred: List[str] = []
+    fallback: Dict[str, List[str]] = {}
+
+    class Config:
+        extra = "forbid"
+
+
+class Defaults(BaseModel):
+    fallback: Dict[str, List[str]] = {}
+
+    class Config:
+        extra = "forbid"
+
+
+class RoutingConfigFile(BaseModel):
+    """Schema of routing.toml"""
+
+    provider_order: List[str] = list(PROVIDERS)
+    providers: Dict[str, ProviderSpec] = {}
+    models: List[ModelSpec]
+    defaults: Defaults = Defaults()
+    tasks: Dict[str, TaskRule]
+
+    class Config:
+        extra = "forbid"
+
+    @model_validator(mode="after")
+    def check_references(self):
+        unknown = [name for name in [*self.provider_order, *self.providers] if name not in PROVIDERS]
+        if unknown:
+            raise ValueError(f"Unknown providers: {unknown}")
+        if sorted(self.provider_order) != sorted(PROVIDERS):
+            raise ValueError(f"provider_order must list each of {list(PROVIDERS)} exactly once")
+
+        declared = set()
+        for model in self.models:
+            if model.provider not in PROVIDERS:
+                raise ValueError(f"Model {model.name} has unknown provider {model.provider}")
+            if (model.provider, model.name) in declared:
+                raise ValueError(f"Model {model.provider}/{model.name} is declared twice")
+            declared.add((model.provider, model.name))
+
+        if "casual" not in self.tasks:
+            raise ValueError("A 'casual' task rule is required (it is the default)")
+
+        chains = [("defaults", self.defaults.fallback)] + [(task, rule.fallback) for task, rule in self.tasks.items()]
+        for owner, fallback in chains:
+            for provider, models in fallback.items():
+                for model in models:
+                    if (provider, model) not in declared:
+                        raise ValueError(f"{owner}: fallback model {provider}/{model} is not declared")
+        for task, rule in self.tasks.items():
+            for reference in rule.preferred:
+                provider, _, model = reference.partition("/")
+                if (provider, model) not in declared:
+                    raise ValueError(f"{task}: preferred model {reference} is not declared")
+        return self
+
+
+class RoutingConfig:
+    """Compiled, read-only view of routing.toml that the router and providers query"""
+
+    def __init__(self, spec: RoutingConfigFile, version: int = 0, source: str = ""):
+        self.version = version
+        self.source = source
+        self.provider_order: Tuple[str, ...] = tuple(spec.provider_order)
+        enabled_providers = {name for name in PROVIDERS if spec.providers.get(name, ProviderSpec()).enabled}
+
+        self.models: Dict[Tuple[str, str], ModelSpec] = {
+            (model.provider, model.name): model
+            for model in spec.models
+            if model.enabled and model.provider in enabled_providers
+        }
+        self.min_tiers: Dict[str, int] = {task: rule.min_tier for task, rule in spec.tasks.items()}
+        self.task_types: Tuple[str, ...] = tuple(spec.tasks)
+
+        # Disabled models drop out of every chain, so a reload can drain them immediately
+        self._fallback: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        for provider in PROVIDERS:
+            default_chain = spec.defaults.fallback.get(provider, [])
+            self._fallback[(provider, "*")] = self._usable(provider, default_chain)
+            for task, rule in spec.tasks.items():
+                self._fallback[(provider, task)] = self._usable(provider, rule.fallback.get(provider, default_chain))
+
+        self._preferred: Dict[str, Tuple[Tuple[str, str], ...]] = {}
+        for task, rule in spec.tasks.items():
+            pairs = [tuple(reference.partition("/")[::2]) for reference in rule.preferred]
+            self._preferred[task] = tuple(pair for pair in pairs if pair in self.models)
+
+    def _usable(self, provider: str, chain: List[str]) -> Tuple[str, ...]:
+        return tuple(model for model in chain if (provider, model) in self.models)
+
+    def models_to_try(self, provider: str, task_type: str) -> Tuple[str, ...]:
+        return self._fallback.get((provider, task_type), self._fallback.get((provider, "*"), ()))
+
+    def preferred(self, task_type: str) -> Tuple[Tuple[str, str], ...]:
+        """(provider, model) pairs in order of preference for ``task_type``"""
+        return self._preferred.get(task_type, self._preferred["casual"])
+
+    def provider_models(self, provider: str) -> List[str]:
+        return [name for (owner, name) in self.models if owner == provider]
+
+    def listed_models(self, provider: str) -> List[str]:
+        return [name for (owner, name), model in self.models.items() if owner == provider and model.listed]
+
+    def quality_tier(self, provider: str, model: str, default: int = 1) -> int:
+        spec = self.models.get((provider, model))
+        return spec.quality_tier if spec is not None else default
+
+    def context_window(self, provider: str, model: str) -> Optional[int]:
+        spec = self.models.get((provider, model))
+        return spec.context_window if spec is not None else None
+
+
+def load_routing_config(path: str, version: int = 0) -> RoutingConfig:
+    """Parse, validate and compile a routing file (raises on any error)"""
+    with open(path, "rb") as f:
+        data = tomllib.load(f)
+    return RoutingConfig(RoutingConfigFile.model_validate(data), version, path)
+
+
+class RoutingConfigLoader:
+    """Holds the live RoutingConfig and swaps in a new one when the file changes.
+
+    Requests read ``current`` once and keep that object, so a reload never
+    changes the rules under a request that is already running. A file that
+    fails to parse or validate is rejected and the previous config stays live.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.routing_config_path or DEFAULT_CONFIG_PATH
+        self._mtime = os.stat(self.path).st_mtime_ns
+        self.current = load_routing_config(self.path)
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def reload_if_changed(self) -> bool:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            self.last_error = str(e)
+            return False
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+
+        try:
+            config = load_routing_config(self.path, self.current.version + 1)
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"DEBUG: Rejected routing config {self.path}, keeping version {self.current.version}: {e}")
+            return False
+        self.current = config
+        self.last_error = None
+        print(f"DEBUG: Loaded routing config version {config.version} from {self.path}")
+        return True
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(settings.routing_config_poll_interval)
+            self.reload_if_changed()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def snapshot(self) -> dict:
+        return {
+            "path": self.path,
+            "version": self.current.version,
+            "models": len(self.current.models),
+            "last_error": self.last_error
+        }
+
+
+routing_config = RoutingConfigLoader()
@@ -0,0 +1,80 @@
+import time
+from typing import Dict, FrozenSet, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from ..core.config import settings
+from ..models.routing_policy import RoutingPolicy
+from ..schemas.routing_policy import RoutingPolicyUpdate
+
+PREFERENCES = ("speed", "balanced", "accuracy")
+
+
+class CompiledPolicy:
+    """Immutable, routing-ready form of a user's RoutingPolicy row"""
+
+    __slots__ = ("preference", "disabled_providers")
+
+    def __init__(self, preference: str = "balanced", disabled_providers: FrozenSet[str] = frozenset()):
+        self.preference = preference if preference in PREFERENCES else "balanced"
+        self.disabled_providers = disabled_providers
+
+    @classmethod
+    def from_row(cls, policy: Optional[RoutingPolicy]) -> "CompiledPolicy":
+        if policy is None:
+            return DEFAULT_POLICY
+        # Providers missing from enabled_providers stay enabled
+        disabled = frozenset(name for name, enabled in (policy.enabled_providers or {}).items() if not enabled)
+        return cls(policy.preference or "balanced", disabled)
+
+    def allows(self, provider_name: str) -> bool:
+        return provider_name not in self.disabled_providers
+
+
+DEFAULT_POLICY = CompiledPolicy()
+
+
+class RoutingPolicyService:
+
+    @staticmethod
+    async def get_policy_for_user(db: AsyncSession, user_id: int) -> Optional[RoutingPolicy]:
+        result = await db.execute(select(RoutingPolicy).where(RoutingPolicy.user_id == user_id))
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def upsert_policy(db: AsyncSession, user_id: int, update: RoutingPolicyUpdate) -> RoutingPolicy:
+        policy = await RoutingPolicyService.get_policy_for_user(db, user_id)
+        if policy is None:
+            policy = RoutingPolicy(user_id=user_id, preference="balanced", enabled_providers={})
+            db.add(policy)
+        update_dict = update.dict(exclude_unset=True, exclude_none=True)
+        if "enabled_providers" in update_dict:
+            # Merge so a partial update doesn't silently re-enable other providers
+            update_dict["enabled_providers"] = {**(policy.enabled_providers or {}), **update_dict["enabled_providers"]}
+        for field, value in update_dict.items():
+            setattr(policy, field, value)
+        await db.commit()
+        await db.refresh(policy)
+        policy_cache.invalidate(user_id)
+        return policy
+
+
+class PolicyCache:
+    """Compiled routing policy per user, so routing never queries routing_policies on the hot path"""
+
+    def __init__(self):
+        self._policies: Dict[int, Tuple[float, CompiledPolicy]] = {}
+
+    async def get_policy(self, db: AsyncSession, user_id: int) -> CompiledPolicy:
+        cached = self._policies.get(user_id)
+        if cached is not None and time.monotonic() - cached[0] < settings.routing_policy_cache_ttl:
+            return cached[1]
+
+        policy = CompiledPolicy.from_row(await RoutingPolicyService.get_policy_for_user(db, user_id))
+        self._policies[user_id] = (time.monotonic(), policy)
+        return policy
+
+    def invalidate(self, user_id: int):
+        self._policies.pop(user_id, None)
+
+
+policy_cache = PolicyCache()
@@ -0,0 +1,72 @@
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+Candidate = Tuple[str, str]  # (provider, model)
+
+
+class RoutingTable:
+    """Immutable routing decisions keyed by (task type, availability bitmask, preference).
+
+    Bit ``i`` of the mask is set when ``providers[i]`` may be used (available and
+    enabled by the user's policy). Every combination is precomputed, so routing a
+    request is one dict lookup that returns a ready, ordered candidate tuple.
+    Tables are never mutated; the router swaps in a new one when health,
+    inventory or the live latency ranking change.
+    """
+
+    def __init__(
+        self,
+        signature: tuple,
+        providers: Sequence[str],
+        candidates: Mapping[tuple, Tuple[Candidate, ...]],
+        optimal: Mapping[tuple, Optional[Candidate]]
+    ):
+        self.signature = signature
+        self.providers = tuple(providers)
+        self._bits = {name: 1 << index for index, name in enumerate(self.providers)}
+        self._candidates = MappingProxyType(dict(candidates))
+        self._optimal = MappingProxyType(dict(optimal))
+
+    @classmethod
+    def build(
+        cls,
+        signature: tuple,
+        providers: Sequence[str],
+        task_types: Iterable[str],
+        preferences: Iterable[str],
+        universe: Callable[[str], List[Candidate]],
+        optimal_options: Callable[[str], List[Candidate]],
+        rank: Callable[[List[Candidate], str, str], List[Candidate]]
+    ) -> "RoutingTable":
+        """Rank each task's candidates once per preference, then filter that ranking for every mask"""
+        bits = {name: 1 << index for index, name in enumerate(providers)}
+        masks = range(1 << len(providers))
+        candidates: Dict[tuple, Tuple[Candidate, ...]] = {}
+        optimal: Dict[tuple, Optional[Candidate]] = {}
+
+        for task_type in task_types:
+            for preference in preferences:
+                ranked = rank(universe(task_type), task_type, preference)
+                ranked_options = rank(optimal_options(task_type), task_type, preference)
+                for mask in masks:
+                    key = (task_type, mask, preference)
+                    candidates[key] = tuple(c for c in ranked if bits[c[0]] & mask)
+                    optimal[key] = next((c for c in ranked_options if bits[c[0]] & mask), None)
+        return cls(signature, providers, candidates, optimal)
+
+    def mask(self, providers: Iterable[str]) -> int:
+        mask = 0
+        for name in providers:
+            mask |= self._bits.get(name, 0)
+        return mask
+
+    def candidates(self, task_type: str, mask: int, preference: str) -> Tuple[Candidate, ...]:
+        found = self._candidates.get((task_type, mask, preference))
+        return found if found is not None else self._candidates.get(("casual", mask, preference), ())
+
+    def optimal(self, task_type: str, mask: int, preference: str) -> Optional[Candidate]:
+        key = (task_type, mask, preference)
+        return self._optimal[key] if key in self._optimal else self._optimal.get(("casual", mask, preference))
+
+    def __len__(self) -> int:
+        return len(self._candidates)
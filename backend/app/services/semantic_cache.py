@@ -0,0 +1,252 @@
+import math
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Sequence, Tuple
+from ..core.config import settings
+from ..schemas.llm import GenerateResponse
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is in requirements.txt; without it the cache falls back to a slow pure-Python scan
+    np = None
+
+_WORD = re.compile(r"\w+")
+_APOSTROPHE = re.compile(r"['\u2019]")
+
+# Function words barely change what a question asks, so they carry little weight
+_STOPWORDS = frozenset("""
+a an the is are was were be been am to of in on at for from by and or but what whats how why when
+where which who whom do does did i me my we our you your it its this that these those with can could would
+should will shall may might please tell give s t
+""".split())
+
+# Negations flip what a question asks, so they must never be down-weighted ("isn't" is read as "isnt")
+_NEGATIONS = frozenset("""
+not no never nor none nothing nobody neither cannot dont doesnt didnt isnt arent wasnt werent cant couldnt
+wouldnt shouldnt wont havent hasnt hadnt aint
+""".split())
+
+
+class HashedNgramEmbedder:
+    """Cheap local embedding: signed feature hashing of words, word trigrams and content-word bigrams.
+
+    Function words are down-weighted so that "what's the capital of France"
+    and "what is the capital of France" land together, while changing the
+    subject ("... of Germany") moves the vector a long way. Negations are
+    up-weighted and all spelled "not", so "is it safe" and "isn't it safe"
+    stay apart. It needs no model and costs well under a millisecond per prompt.
+    """
+
+    name = "hashed-ngram"
+    STOPWORD_WEIGHT = 0.2
+    NEGATION_WEIGHT = 2.0
+    TRIGRAM_WEIGHT = 0.5
+
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim or settings.semantic_cache_dim
+
+    def _features(self, text: str) -> List[Tuple[str, float]]:
+        words = ["not" if word in _NEGATIONS else word for word in _WORD.findall(_APOSTROPHE.sub("", text.lower()))]
+        features = []
+        for word in words:
+            if word == "not":
+                weight = self.NEGATION_WEIGHT
+            else:
+                weight = self.STOPWORD_WEIGHT if word in _STOPWORDS else 1.0
+            features.append((f"w:{word}", weight))
+            padded = f"#{word}#"
+            features += [(f"c:{padded[i:i + 3]}", weight * self.TRIGRAM_WEIGHT) for i in range(len(padded) - 2)]
+        content = [word for word in words if word not in _STOPWORDS]
+        features += [(f"b:{a} {b}", 1.0) for a, b in zip(content, content[1:])]
+        return features
+
+    def embed_sync(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for feature, weight in self._features(text):
+            digest = zlib.crc32(feature.encode())
+            vector[digest % self.dim] += weight if digest & 0x80000000 else -weight
+        norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector] if norm else vector
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        return self.embed_sync(text)
+
+
+class OllamaEmbedder:
+    """Embeddings from an Ollama embedding model (e.g. nomic-embed-text), when one is configured"""
+
+    def __init__(self, provider, model: str):
+        self.provider = provider
+        self.model = model
+        self.name = f"ollama:{model}"
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        try:
+            response = await self.provider.client.post(
+                f"{self.provider.base_url}/api/embeddings",
+                json={"model": self.model, "prompt": text},
+                timeout=settings.semantic_cache_embed_timeout
+            )
+            if response.status_code != 200:
+                raise Exception(f"Ollama API error: {response.status_code}")
+            vector = response.json().get("embedding") or []
+        except Exception as e:
+            print(f"DEBUG: Ollama embedding failed, using hashed n-grams: {e}")
+            return None
+        norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector] if norm else None
+
+
+class VectorPartition:
+    """Unit vectors plus cached responses for one tenant and request shape.
+
+    Search is an exact scan: one matrix-vector product with NumPy, or a sparse
+    dot product per entry without it. Partitions are capped at
+    ``semantic_cache_max_entries`` and evict the least recently hit entry, which
+    keeps a scan to about a millisecond with NumPy.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.responses: List[GenerateResponse] = []
+        self.stored_at: List[float] = []
+        self.used_at: List[float] = []
+        self._vectors: List[Sequence[float]] = []
+        self._matrix = None  # NumPy copy of _vectors, rebuilt lazily after writes
+
+    def __len__(self) -> int:
+        return len(self.responses)
+
+    def _drop(self, index: int):
+        for column in (self.responses, self.stored_at, self.used_at, self._vectors):
+            column.pop(index)
+        self._matrix = None
+
+    def expire(self, ttl: float) -> int:
+        cutoff = time.monotonic() - ttl
+        stale = [index for index, stored_at in enumerate(self.stored_at) if stored_at < cutoff]
+        for index in reversed(stale):
+            self._drop(index)
+        return len(stale)
+
+    def add(self, vector: Sequence[float], response: GenerateResponse) -> int:
+        """Store an entry, evicting the least recently used ones beyond the cap; returns evictions"""
+        evicted = 0
+        while len(self.responses) >= self.max_entries:
+            self._drop(min(range(len(self.used_at)), key=self.used_at.__getitem__))
+            evicted += 1
+        now = time.monotonic()
+        self.responses.append(response)
+        self.stored_at.append(now)
+        self.used_at.append(now)
+        self._vectors.append(np.asarray(vector, dtype=np.float32) if np is not None else list(vector))
+        self._matrix = None
+        return evicted
+
+    def best(self, vector: Sequence[float]) -> Tuple[int, float]:
+        """Index and cosine similarity of the closest entry (-1 when empty)"""
+        if not self.responses:
+            return -1, 0.0
+        if np is not None:
+            if self._matrix is None:
+                self._matrix = np.vstack(self._vectors)
+            scores = self._matrix @ np.asarray(vector, dtype=np.float32)
+            index = int(np.argmax(scores))
+            return index, float(scores[index])
+        # Hashed vectors are sparse - only walk the query's non-zero dimensions
+        nonzero = [(dimension, value) for dimension, value in enumerate(vector) if value]
+        scores = [sum(stored[dimension] * value for dimension, value in nonzero) for stored in self._vectors]
+        index = max(range(len(scores)), key=scores.__getitem__)
+        return index, scores[index]
+
+
+class SemanticCache:
+    """Opt-in near-duplicate cache: answers a paraphrase with a response cached for a similar prompt.
+
+    Entries are partitioned by tenant, request shape (model, max_tokens,
+    temperature, routing policy) and embedder, so users never see each
+    other's answers and vectors from different embedders never mix.
+    Partitions themselves are LRU-evicted beyond ``semantic_cache_max_tenants``.
+    """
+
+    SIMILARITY_BUCKETS = 20  # Histogram of best-match similarity in steps of 0.05
+
+    def __init__(self, ollama_provider=None):
+        self.hashed = HashedNgramEmbedder()
+        model = settings.semantic_cache_embedding_model
+        self.ollama = OllamaEmbedder(ollama_provider, model) if model and ollama_provider is not None else None
+        self._partitions: "OrderedDict[Hashable, VectorPartition]" = OrderedDict()
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "near_misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+        self.similarities = [0] * self.SIMILARITY_BUCKETS
+
+    async def embed(self, text: str) -> Tuple[str, List[float]]:
+        """(embedder name, unit vector), preferring the Ollama model when it is configured and reachable"""
+        text = text[:settings.semantic_cache_max_chars]
+        if self.ollama is not None and self.ollama.provider.is_available:
+            vector = await self.ollama.embed(text)
+            if vector:
+                return self.ollama.name, vector
+        return self.hashed.name, self.hashed.embed_sync(text)
+
+    def _partition(self, key: Hashable, create: bool = False) -> Optional[VectorPartition]:
+        partition = self._partitions.get(key)
+        if partition is None and create:
+            partition = self._partitions[key] = VectorPartition(settings.semantic_cache_max_entries)
+            while len(self._partitions) > settings.semantic_cache_max_tenants:
+                _, evicted = self._partitions.popitem(last=False)
+                self.stats["evictions"] += len(evicted)
+        if partition is not None:
+            self._partitions.move_to_end(key)
+        return partition
+
+    def lookup(self, key: Hashable, vector: Sequence[float]) -> Optional[GenerateResponse]:
+        """Cached response for the most similar prompt if it clears the threshold"""
+        start_time = time.perf_counter()
+        self.stats["lookups"] += 1
+        partition = self._partition(key)
+        if partition is not None:
+            self.stats["expired"] += partition.expire(settings.semantic_cache_ttl)
+        index, similarity = partition.best(vector) if partition is not None else (-1, 0.0)
+        if index >= 0:
+            bucket = min(self.SIMILARITY_BUCKETS - 1, max(0, int(similarity * self.SIMILARITY_BUCKETS)))
+            self.similarities[bucket] += 1
+
+        threshold = settings.semantic_cache_threshold
+        if index < 0 or similarity < threshold:
+            self.stats["misses"] += 1
+            if index >= 0 and similarity >= threshold - 0.05:
+                self.stats["near_misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        partition.used_at[index] = time.monotonic()
+        return partition.responses[index].model_copy(update={
+            "cached": True,
+            "cache_similarity": round(similarity, 4),
+            "latency_ms": (time.perf_counter() - start_time) * 1000
+        })
+
+    def store(self, key: Hashable, vector: Sequence[float], response: GenerateResponse):
+        partition = self._partition(key, create=True)
+        self.stats["evictions"] += partition.add(vector, response)
+        self.stats["stores"] += 1
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["lookups"]
+        step = 1 / self.SIMILARITY_BUCKETS
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else None,
+            "threshold": settings.semantic_cache_threshold,
+            "backend": "numpy" if np is not None else "python",
+            "embedder": self.ollama.name if self.ollama is not None else self.hashed.name,
+            "partitions": len(self._partitions),
+            "entries": sum(len(partition) for partition in self._partitions.values()),
+            # Best-match similarity per lookup, for tuning the threshold
+            "similarity_histogram": {
+                f"{index * step:.2f}-{(index + 1) * step:.2f}": count
+                for index, count in enumerate(self.similarities) if count
+            }
+        }
@@ -1,7 +1,10 @@
+import time
+from datetime import datetime, timezone
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
-from typing import Optional, List
-from ..models.subscription_record import SubscriptionRecord
+from typing import Dict, Optional, List, Tuple
+from ..core.config import settings
+from ..models.subscription_record import SubscriptionRecord, SubscriptionStatus
 from ..schemas.subscription_record import SubscriptionRecordCreate, SubscriptionRecordUpdate
 
 
@@ -13,6 +16,7 @@ class SubscriptionRecordService:
         db.add(record)
         await db.commit()
         await db.refresh(record)
+        plan_cache.invalidate(record.user_id)
         return record
     
     @staticmethod
@@ -47,6 +51,35 @@ class SubscriptionRecordService:
             setattr(record, field, value)
         await db.commit()
         await db.refresh(record)
+        plan_cache.invalidate(record.user_id)
         return record
 
 
+class PlanCache:
+    """Active plan per user, cached so the hot path doesn't query subscriptions on every call"""
+    
+    def __init__(self):
+        self._plans: Dict[int, Tuple[float, Optional[str]]] = {}
+    
+    async def get_plan(self, db: AsyncSession, user_id: int) -> Optional[str]:
+        cached = self._plans.get(user_id)
+        if cached is not None and time.monotonic() - cached[0] < settings.plan_cache_ttl:
+            return cached[1]
+        
+        record = await SubscriptionRecordService.get_latest_record_for_user(db, user_id)
+        plan = None
+        if record is not None and record.status == SubscriptionStatus.ACTIVE.value:
+            end_date = record.end_date
+            if end_date is not None and end_date.tzinfo is None:
+                end_date = end_date.replace(tzinfo=timezone.utc)
+            if end_date is None or end_date > datetime.now(timezone.utc):
+                plan = record.plan_type
+        
+        self._plans[user_id] = (time.monotonic(), plan)
+        return plan
+    
+    def invalidate(self, user_id: int):
+        self._plans.pop(user_id, None)
+
+
+plan_cache = PlanCache()
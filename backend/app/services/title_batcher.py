@@ -0,0 +1,265 @@
+import asyncio
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..models.request import Request
+from ..schemas.llm import GenerateRequest, TitleGenerateResponse
+from .routing_policy import CompiledPolicy
+
+_NUMBERED_LINE = re.compile(r'^\s*"?(\d+)"?\s*[:.)\-]\s*(.+?)\s*,?\s*$', re.MULTILINE)
+
+
+def clean_title(title: str) -> Optional[str]:
+    """A model-written title without quotes or a "Title:" prefix, or None if it is unusable"""
+    title = title.replace("Title:", "").replace('"', "").replace("'", "").strip()
+    return title if 3 <= len(title) <= 50 else None
+
+
+def parse_titles(text: str) -> Dict[int, str]:
+    """Titles by conversation number from a JSON object, or from "1: ..." lines if the JSON is malformed"""
+    start, end = text.find("{"), text.rfind("}")
+    if start >= 0 and end > start:
+        try:
+            data = json.loads(text[start:end + 1])
+            return {int(key): str(value) for key, value in data.items() if str(key).strip().isdigit()}
+        except (ValueError, AttributeError):
+            pass
+    return {int(number): title for number, title in _NUMBERED_LINE.findall(text)}
+
+
+class _TitleJob:
+    """One session waiting for an LLM title; ``fallback`` is its locally extracted title"""
+
+    def __init__(self, user_id: int, session_id: Optional[str], messages: List[dict], fallback: TitleGenerateResponse,
+                 policy: CompiledPolicy, required: bool, background: bool):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.messages = messages
+        self.fallback = fallback
+        self.policy = policy
+        self.required = required
+        self.background = background
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def excerpt(self) -> str:
+        lines = []
+        for msg in self.messages[:settings.title_batch_max_messages]:
+            content = (msg.get("content") or "")[:settings.title_batch_max_chars]
+            lines.append(f"{msg.get('role', 'user').capitalize()}: {content}")
+        return "\n".join(lines)
+
+    def resolve(self, response: TitleGenerateResponse):
+        # The caller may have disconnected and cancelled its future already
+        if not self.future.done():
+            self.future.set_result(response)
+
+
+class TitleBatcher:
+    """Low-priority lane that titles several of a user's chat sessions with one LLM call.
+
+    Sessions queue up until ``title_batch_max_sessions`` are waiting or
+    ``title_batch_max_wait_ms`` has passed since the first one, then the batch
+    is sent as a single prompt asking for a JSON object of titles. A batch is
+    only sent while the fastest model has spare capacity, so interactive chat
+    always wins: sessions that merely wanted an LLM title when it was cheap get
+    their local title instead, and ``required`` (high quality) sessions wait up
+    to ``title_batch_max_defer_ms`` for capacity before going anyway.
+
+    Every session gets a future. Background sessions also leave their result
+    in a bounded store that ``take_result`` hands out once.
+    """
+
+    def __init__(self, router):
+        self.router = router
+        self._queue: "asyncio.Queue[_TitleJob]" = asyncio.Queue()
+        self._pending: Dict[Tuple[int, str], _TitleJob] = {}  # By session, for deduplication and status
+        self._open: set = set()  # Every job whose future is not resolved yet
+        self._results: "OrderedDict[Tuple[int, str], TitleGenerateResponse]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self._dispatches: set = set()
+        self.stats = {"sessions": 0, "batches": 0, "llm_titles": 0, "local_titles": 0, "deferred": 0, "failures": 0}
+
+    def submit(
+        self,
+        user_id: int,
+        messages: List[dict],
+        fallback: TitleGenerateResponse,
+        policy: CompiledPolicy,
+        session_id: Optional[str] = None,
+        required: bool = False,
+        background: bool = False
+    ) -> asyncio.Future:
+        """Queue a session for the next batch; resolves to its title (never raises)"""
+        key = (user_id, session_id)
+        existing = self._pending.get(key) if session_id else None
+        if existing is not None and not existing.future.done():
+            existing.required |= required
+            existing.background |= background
+            return existing.future
+
+        job = _TitleJob(user_id, session_id, messages, fallback, policy, required, background)
+        if session_id:
+            self._pending[key] = job
+        self._open.add(job)
+        self._queue.put_nowait(job)
+        self.stats["sessions"] += 1
+        return job.future
+
+    def status(self, user_id: int, session_id: str) -> Optional[str]:
+        """"ready", "pending" or None for a background title"""
+        key = (user_id, session_id)
+        if key in self._results:
+            return "ready"
+        job = self._pending.get(key)
+        return "pending" if job is not None and job.background else None
+
+    def take_result(self, user_id: int, session_id: str) -> Optional[TitleGenerateResponse]:
+        return self._results.pop((user_id, session_id), None)
+
+    def _forget(self, job: _TitleJob):
+        self._open.discard(job)
+        key = (job.user_id, job.session_id)
+        if self._pending.get(key) is job:
+            del self._pending[key]
+
+    def _finish(self, job: _TitleJob, response: TitleGenerateResponse):
+        self._forget(job)
+        key = (job.user_id, job.session_id)
+        if job.background and job.session_id:
+            self._results[key] = response
+            self._results.move_to_end(key)
+            while len(self._results) > settings.title_results_max:
+                self._results.popitem(last=False)
+        self.stats["llm_titles" if response.provider != "local" else "local_titles"] += 1
+        job.resolve(response)
+
+    async def _collect(self) -> List[_TitleJob]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + settings.title_batch_max_wait_ms / 1000
+        while len(batch) < settings.title_batch_max_sessions:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _loop(self):
+        while True:
+            batch = await self._collect()
+            # One upstream call per user and routing policy: a prompt never mixes users' conversations
+            groups: Dict[Hashable, List[_TitleJob]] = {}
+            for job in batch:
+                groups.setdefault((job.user_id, job.policy.disabled_providers), []).append(job)
+            for jobs in groups.values():
+                task = asyncio.create_task(self._dispatch(jobs))
+                self._dispatches.add(task)
+                task.add_done_callback(self._dispatches.discard)
+
+    def _has_capacity(self, policy: CompiledPolicy) -> bool:
+        return self.router.has_spare_capacity("summarization", policy, settings.title_llm_spare_ratio)
+
+    async def _dispatch(self, jobs: List[_TitleJob]):
+        policy = jobs[0].policy
+        if not self._has_capacity(policy):
+            for job in [job for job in jobs if not job.required]:
+                self._finish(job, job.fallback)
+            jobs = [job for job in jobs if job.required]
+            deadline = time.monotonic() + settings.title_batch_max_defer_ms / 1000
+            while jobs and time.monotonic() < deadline and not self._has_capacity(policy):
+                await asyncio.sleep(0.1)
+            if jobs:
+                self.stats["deferred"] += 1
+        # Callers that disconnected while queued no longer need a title
+        for job in [job for job in jobs if job.future.cancelled()]:
+            self._forget(job)
+        jobs = [job for job in jobs if not job.future.done()]
+        if jobs:
+            await self._generate(jobs, policy)
+
+    async def _generate(self, jobs: List[_TitleJob], policy: CompiledPolicy):
+        excerpts = [job.excerpt() for job in jobs]
+        sections = "\n\n".join(f"### Conversation {number}\n{excerpt}" for number, excerpt in enumerate(excerpts, 1))
+        prompt = f"""Write a concise, descriptive title (3-6 words) for each conversation below that captures its main topic or question. Do not use quotes or special characters in the titles.
+Reply with only a JSON object mapping each conversation number to its title, like {{"1": "First title", "2": "Second title"}}.
+
+{sections}
+
+JSON:"""
+        title_request = GenerateRequest(
+            prompt=prompt,
+            model=None,
+            max_tokens=20 * len(jobs) + 20,
+            temperature=0.3
+        )
+
+        self.stats["batches"] += 1
+        try:
+            response = await self.router.route_request(title_request, policy)
+            titles = parse_titles(response.response)
+        except Exception as e:
+            print(f"DEBUG: Batched title generation failed for {len(jobs)} sessions, using extracted titles: {e}")
+            self.stats["failures"] += 1
+            for job in jobs:
+                self._finish(job, job.fallback)
+            return
+
+        results = []
+        for number, job in enumerate(jobs, 1):
+            title = clean_title(titles.get(number, ""))
+            result = job.fallback if title is None else TitleGenerateResponse(
+                title=title,
+                model=response.model,
+                provider=response.provider,
+                latency_ms=response.latency_ms
+            )
+            results.append(result)
+            self._finish(job, result)
+        await self._record(jobs, excerpts, results, response.cached)
+
+    async def _record(self, jobs: List[_TitleJob], excerpts: List[str], results: List[TitleGenerateResponse], cached: bool):
+        # Save each session's title generation (optional, for analytics); only its own conversation is stored
+        try:
+            async with AsyncSessionLocal() as db:
+                for job, excerpt, result in zip(jobs, excerpts, results):
+                    if result.provider == "local":
+                        continue
+                    db.add(Request(
+                        user_id=job.user_id,
+                        prompt=f"Title for conversation:\n{excerpt}",
+                        response=result.title,
+                        model=result.model,
+                        provider=result.provider,
+                        latency_ms=result.latency_ms,
+                        status="success",
+                        cached=cached
+                    ))
+                await db.commit()
+        except Exception as e:
+            print(f"DEBUG: Could not record title generations: {e}")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        tasks = [task for task in [self._task, *self._dispatches] if task is not None and not task.done()]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        # Nobody is left to write an LLM title; hand out the extracted ones
+        for job in list(self._open):
+            self._finish(job, job.fallback)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "queued": self._queue.qsize(), "pending": len(self._open), "results": len(self._results)}
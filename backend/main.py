@@ -7,7 +7,9 @@ from contextlib import asynccontextmanager
 
 from app.core.config import settings
 from app.core.database import init_db  # your async DB init
-from app.api import auth, llm, searches, metrics, payments, subscription
+from app.core.http_clients import http_clients
+from app.services.conversation_store import conversation_store
+from app.api import auth, llm, searches, metrics, payments, subscription, routing_policy, conversations
 
 
 @asynccontextmanager
@@ -18,8 +20,21 @@ async def lifespan(app: FastAPI):
         print("✅ Database initialized successfully")
     except Exception as e:
         print(f"❌ Database initialization failed: {e}")
+    
+    # One pooled HTTP client per upstream host, shared by all providers
+    await http_clients.startup()
+    llm.router_service.bind_http_clients(http_clients)
+    llm.image_service.bind_http_client(http_clients.get("huggingface"))
+    llm.image_summarizer.bind_http_client(http_clients.get("huggingface"))
+    await llm.router_service.startup()
+    llm.title_batcher.start()
+    
     yield
     print("🔄 Shutting down application...")
+    await llm.title_batcher.stop()
+    await conversation_store.stop()
+    await llm.router_service.shutdown()
+    await http_clients.shutdown()
 
 
 # Create FastAPI app
@@ -55,6 +70,8 @@ app.include_router(searches.router, prefix="/api")
 app.include_router(metrics.router, prefix="/api")
 app.include_router(payments.router, prefix="/api")
 app.include_router(subscription.router, prefix="/api")
+app.include_router(routing_policy.router, prefix="/api")
+app.include_router(conversations.router, prefix="/api")
 
 
 # Root & Health
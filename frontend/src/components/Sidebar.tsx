@@ -186,7 +186,7 @@ const Sidebar = () => {
                     </button>
                     {!session.titleGenerated && session.messages.length >= 2 && (
                       <button
-                        onClick={() => user && generateTitleForSession(user.id, session.id)}
+                        onClick={() => user && generateTitleForSession(user.id, session.id, true)}
                         className="p-1 rounded hover:bg-gray-700 text-blue-400"
                         title="Generate smart title"
                       >
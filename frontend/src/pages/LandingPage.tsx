@@ -254,7 +254,8 @@ const LandingPage = () => {
         messageContent,
         selectedModel || undefined,
         1000,
-        temperature
+        temperature,
+        useChatStore.getState().activeSessionId || undefined
       )
 
       const assistantMessage: Omit<Message, 'id' | 'timestamp'> = {
@@ -68,7 +68,7 @@ export const authApi = {
 
 // LLM API
 export const llmApi = {
-  generate: async (prompt: string, model?: string, maxTokens?: number, temperature?: number) => {
+  generate: async (prompt: string, model?: string, maxTokens?: number, temperature?: number, sessionId?: string) => {
     return apiRequest<{
       response: string
       model: string
@@ -82,6 +82,8 @@ export const llmApi = {
         model,
         max_tokens: maxTokens,
         temperature,
+        // The server keeps the conversation history for this session, so only the new message is sent
+        session_id: sessionId,
       }),
     })
   },
@@ -143,18 +145,33 @@ export const llmApi = {
     }>('/llm/image-models')
   },
 
-  generateTitle: async (messages: Array<{ role: string; content: string }>) => {
+  generateTitle: async (
+    messages: Array<{ role: string; content: string }>,
+    highQuality = false,
+    sessionId?: string,
+    background = false
+  ) => {
     return apiRequest<{
       title: string
       model: string
       provider: string
       latency_ms: number
+      pending: boolean
     }>('/llm/generate-title', {
       method: 'POST',
-      body: JSON.stringify({ messages }),
+      body: JSON.stringify({ messages, high_quality: highQuality, session_id: sessionId, background }),
     })
   },
 
+  // Title requested with `background`; 202 (no title yet) while it is still being generated
+  fetchTitle: async (sessionId: string) => {
+    return apiRequest<{
+      title?: string
+      model?: string
+      provider?: string
+    }>(`/llm/generate-title/${encodeURIComponent(sessionId)}`)
+  },
+
   healthCheck: async () => {
     return apiRequest<{ status: string; providers: Record<string, any> }>('/llm/health')
   },
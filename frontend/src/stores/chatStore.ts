@@ -24,6 +24,7 @@ export interface ChatSession {
   messages: Message[];
   created_at: string;
   titleGenerated?: boolean; // Track if title was auto-generated
+  titlePending?: boolean; // A better title is being generated server-side; collected on next load
 }
 
 export interface ChatState {
@@ -48,7 +49,8 @@ export interface ChatState {
   loadChatSession: (userId: string | number | null, sessionId: string) => void;
   newChatSession: (userId: string | number | null) => void;
   removeChatSession: (userId: string | number | null, sessionId: string) => void;
-  generateTitleForSession: (userId: string | number | null, sessionId: string) => Promise<void>;
+  generateTitleForSession: (userId: string | number | null, sessionId: string, highQuality?: boolean) => Promise<void>;
+  collectPendingTitle: (userId: string | number | null, sessionId: string) => Promise<void>;
   clearActiveSession: () => void;
   createSessionFromMessages: (userId: string | number | null) => void;
 }
@@ -179,6 +181,9 @@ export const useChatStore = create<ChatState>()(
         const session = sessions.find((s: ChatSession) => s.id === sessionId);
         if (session) {
           set({ messages: session.messages, activeSessionId: sessionId });
+          if (session.titlePending) {
+            get().collectPendingTitle(userId, sessionId);
+          }
         }
       },
 
@@ -223,7 +228,7 @@ export const useChatStore = create<ChatState>()(
         });
       },
 
-      generateTitleForSession: async (userId: string | number | null, sessionId: string) => {
+      generateTitleForSession: async (userId: string | number | null, sessionId: string, highQuality = false) => {
         if (!userId) return;
 
         const state = get() as ChatState;
@@ -239,14 +244,15 @@ export const useChatStore = create<ChatState>()(
             content: msg.content
           }));
 
-          const response = await llmApi.generateTitle(apiMessages);
+          // Automatic titles don't wait for the LLM; its title is collected when the session is next loaded
+          const response = await llmApi.generateTitle(apiMessages, highQuality, sessionId, !highQuality);
 
           // Update the session with the generated title
           set((prevState: ChatState) => {
             const prevSessions = prevState.chatSessions[userId] || [];
             const updatedSessions = prevSessions.map(s =>
               s.id === sessionId
-                ? { ...s, title: response.title, titleGenerated: true }
+                ? { ...s, title: response.title, titleGenerated: true, titlePending: response.pending }
                 : s
             );
 
@@ -278,6 +284,37 @@ export const useChatStore = create<ChatState>()(
         }
       },
 
+      collectPendingTitle: async (userId: string | number | null, sessionId: string) => {
+        if (!userId) return;
+
+        let title: string | undefined;
+        let stillPending = false;
+        try {
+          const response = await llmApi.fetchTitle(sessionId);
+          title = response.title;
+          stillPending = !title;
+        } catch (error) {
+          // Unknown to the server (restarted or already collected): keep the extracted title
+          console.error('Failed to collect title:', error);
+        }
+
+        set((prevState: ChatState) => {
+          const prevSessions = prevState.chatSessions[userId] || [];
+          const updatedSessions = prevSessions.map(s =>
+            s.id === sessionId
+              ? { ...s, title: title || s.title, titlePending: stillPending }
+              : s
+          );
+
+          return {
+            chatSessions: {
+              ...prevState.chatSessions,
+              [userId]: updatedSessions
+            }
+          };
+        });
+      },
+
       clearActiveSession: () => {
         set({ activeSessionId: null });
       },
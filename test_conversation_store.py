@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test script for server-side conversation ordering.
+
+Concurrent turns of one conversation must get distinct positions, windows
+must come back oldest first and start on a whole exchange, and folding old
+turns into the summary must leave the newest turns verbatim.
+
+Needs a database: set DATABASE_URL to a scratch database, or install
+aiosqlite to use a throwaway SQLite file.
+
+Usage:
+    python test_conversation_store.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+# Add the backend directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+if "DATABASE_URL" not in os.environ:
+    try:
+        import aiosqlite  # noqa: F401
+    except ImportError:
+        print("SKIP: set DATABASE_URL to a scratch database or install aiosqlite to run this test")
+        sys.exit(0)
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/conversations.db"
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("DEBUG", "false")
+
+import app.models.user, app.models.subscription_record, app.models.routing_policy, app.models.search, app.models.request  # noqa: E401,F401
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, init_db
+from app.models.user import User
+from app.schemas.llm import GenerateRequest, GenerateResponse
+from app.services.conversation_store import ConversationStore
+
+failures = 0
+
+
+def check(label, condition):
+    global failures
+    print(f"{'PASS' if condition else 'FAIL'}: {label}")
+    if not condition:
+        failures += 1
+
+
+class FakeRouter:
+    """Always has capacity and answers summary prompts with a numbered summary"""
+
+    def __init__(self):
+        self.summaries = 0
+
+    def has_spare_capacity(self, task_type, policy=None, ratio=1.0):
+        return True
+
+    async def route_request(self, request, policy=None):
+        self.summaries += 1
+        return GenerateResponse(response=f"summary {self.summaries}", model="m", provider="groq", latency_ms=1.0)
+
+
+async def new_user(db) -> int:
+    user = User(email=f"user{os.urandom(4).hex()}@example.com", password_hash="x", name="test")
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user.id
+
+
+async def test_concurrent_turns(store: ConversationStore):
+    async with AsyncSessionLocal() as db:
+        user_id = await new_user(db)
+        await store.get_or_create(db, user_id, "concurrent")
+
+    async def turn(index: int):
+        async with AsyncSessionLocal() as db:
+            await store.append(db, user_id, "concurrent", f"question {index}", f"answer {index}")
+
+    await asyncio.gather(*(turn(index) for index in range(5)))
+
+    async with AsyncSessionLocal() as db:
+        conversation = await store.get(db, user_id, "concurrent")
+        turns = await store.turns(db, conversation, 100)
+    positions = [turn.position for turn in turns]
+    check("concurrent turns get distinct positions", positions == list(range(10)))
+    check("turn_count matches the stored turns", conversation.turn_count == 10)
+    check("every question is followed by its own answer", all(
+        question.role == "user" and answer.role == "assistant" and
+        question.content.split()[-1] == answer.content.split()[-1]
+        for question, answer in zip(turns[::2], turns[1::2])
+    ))
+
+
+async def test_window_order(store: ConversationStore):
+    settings.conversation_window_tokens = 60
+    settings.conversation_summary_trigger_tokens = 10_000
+    async with AsyncSessionLocal() as db:
+        user_id = await new_user(db)
+        for index in range(6):
+            await store.append(db, user_id, "window", f"question {index} " + "q" * 40, f"answer {index} " + "a" * 40)
+
+        request = await store.prepare(db, user_id, GenerateRequest(prompt="next", session_id="window"))
+    history = request.history or []
+    check("the window is bounded by the token budget", 0 < len(history) < 12)
+    check("the window starts on a question", history[0].role == "user")
+    check("the window ends on the newest answer", history[-1].content.startswith("answer 5"))
+    check("the window is oldest first", [turn.content.split()[1] for turn in history] == sorted(turn.content.split()[1] for turn in history))
+    check("the conversation reference covers every turn", request.conversation.turns == 12)
+
+
+async def test_summary_folding(store: ConversationStore, router: FakeRouter):
+    settings.conversation_window_tokens = 200
+    settings.conversation_summary_trigger_tokens = 150
+    async with AsyncSessionLocal() as db:
+        user_id = await new_user(db)
+        for index in range(8):
+            await store.append(db, user_id, "fold", f"question {index} " + "q" * 80, f"answer {index} " + "a" * 80)
+            await asyncio.gather(*store._tasks)
+
+        conversation = await store.get(db, user_id, "fold")
+        await db.refresh(conversation)
+        request = await store.prepare(db, user_id, GenerateRequest(prompt="next", session_id="fold"))
+    history = request.history or []
+    check("old turns were folded into a summary", router.summaries > 0 and conversation.summary is not None)
+    check("the fold ends on a whole exchange", conversation.summarized_turns % 2 == 0)
+    check("the summary comes first", history[0].role == "system" and "summary" in history[0].content)
+    check("verbatim turns start on a question after the summary", history[1].role == "user")
+    check("the newest exchange stays verbatim", history[-1].content.startswith("answer 7"))
+
+
+async def main():
+    await init_db()
+    router = FakeRouter()
+    store = ConversationStore()
+    store.bind_router(router)
+    await test_concurrent_turns(store)
+    await test_window_order(store)
+    await test_summary_folding(store, router)
+    await store.stop()
+    print(f"\n{failures} failure(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())